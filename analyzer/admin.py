@@ -1,19 +1,72 @@
 from django.contrib import admin
-from .models import Contract, RiskClause, Deadline
+from .detail_cache import invalidate_contract_details
+from .search import search_contracts
+from .models import Contract, RiskClause, Deadline, AnalysisJob, AnalysisCacheEntry, MetricCounter, StageTiming
 
 @admin.register(Contract)
 class ContractAdmin(admin.ModelAdmin):
     list_display = ['title', 'contract_type', 'risk_level', 'analyzed', 'uploaded_at']
     list_filter = ['contract_type', 'risk_level', 'analyzed', 'uploaded_at']
-    search_fields = ['title', 'parties', 'ai_analysis']
+    search_fields = ['title']
     readonly_fields = ['uploaded_at', 'analysis_date', 'extracted_text']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Le modifiche manuali invalidano la pagina di dettaglio in cache
+        if change:
+            invalidate_contract_details([obj.pk])
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Usa l'indice full-text invece di scansioni icontains sui TextField
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        ids = [contract_id for contract_id, _ in search_contracts(search_term, limit=1000)]
+        return queryset.filter(pk__in=ids), False
+
+class ContractDetailInvalidationMixin:
+    """Le modifiche a clausole e scadenze invalidano la pagina di dettaglio del contratto"""
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_contract_details([obj.contract_id])
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_contract_details([obj.contract_id])
+    
+    def delete_queryset(self, request, queryset):
+        contract_ids = set(queryset.values_list('contract_id', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_contract_details(contract_ids)
 
 @admin.register(RiskClause)
-class RiskClauseAdmin(admin.ModelAdmin):
-    list_display = ['contract', 'severity', 'risk_description']
-    list_filter = ['severity', 'contract__contract_type']
+class RiskClauseAdmin(ContractDetailInvalidationMixin, admin.ModelAdmin):
+    list_display = ['contract', 'severity', 'source', 'risk_description']
+    list_filter = ['severity', 'source', 'contract__contract_type']
 
 @admin.register(Deadline)
-class DeadlineAdmin(admin.ModelAdmin):
+class DeadlineAdmin(ContractDetailInvalidationMixin, admin.ModelAdmin):
     list_display = ['contract', 'description', 'date']
-    list_filter = ['date', 'contract__contract_type']
\ No newline at end of file
+    list_filter = ['date', 'contract__contract_type']
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ['contract', 'status', 'attempts', 'run_after', 'worker', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'last_error']
+
+@admin.register(AnalysisCacheEntry)
+class AnalysisCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['key', 'model_name', 'prompt_version', 'size', 'hit_count', 'last_used_at']
+    list_filter = ['model_name', 'prompt_version']
+    readonly_fields = ['created_at', 'last_used_at', 'hit_count']
+
+@admin.register(MetricCounter)
+class MetricCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value']
+
+@admin.register(StageTiming)
+class StageTimingAdmin(admin.ModelAdmin):
+    list_display = ['contract', 'stage', 'seconds', 'prompt_tokens', 'completion_tokens', 'recorded_at']
+    list_filter = ['stage']
+    readonly_fields = ['recorded_at']
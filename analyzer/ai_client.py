@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+from types import SimpleNamespace
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class ContractAIError(Exception):
+    """Errore nella chiamata al servizio AI"""
+
+
+def add_usage(usage, reported):
+    """Somma in usage i token riportati da una risposta del modello"""
+    if usage is None or not reported:
+        return
+    for field in ('prompt_tokens', 'completion_tokens'):
+        usage[field] = usage.get(field, 0) + (reported.get(field) or 0)
+
+
+class TokenBucket:
+    """Token bucket asincrono con ricarica continua (capacità espressa al minuto)"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        # Una singola richiesta più grande del bucket attende il bucket pieno
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+                self.updated = now
+
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+
+                await asyncio.sleep((amount - self.tokens) * 60 / self.capacity)
+
+
+class OpenAIClient:
+    """Client asincrono per le Chat Completions con sessione HTTP persistente,
+    timeout, rate limiting (richieste e token al minuto) e retry con backoff"""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key, api_base, connect_timeout, read_timeout,
+                 requests_per_minute, tokens_per_minute, max_retries, max_concurrency):
+        self.api_key = api_key
+        self.api_base = api_base.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+
+        self._states = weakref.WeakKeyDictionary()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            api_key=settings.OPENAI_API_KEY,
+            api_base=settings.OPENAI_API_BASE,
+            connect_timeout=settings.AI_CONNECT_TIMEOUT,
+            read_timeout=settings.AI_READ_TIMEOUT,
+            requests_per_minute=settings.AI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.AI_TOKENS_PER_MINUTE,
+            max_retries=settings.AI_MAX_RETRIES,
+            max_concurrency=settings.AI_MAX_CONCURRENCY,
+        )
+
+    def _get_state(self):
+        """Sessione e limitatori del loop corrente: gli oggetti asyncio sono legati al loop che li usa.
+        Il codice sincrono passa sempre dal loop di background, che condivide quindi un unico stato."""
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None or state.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            state = SimpleNamespace(
+                session=aiohttp.ClientSession(connector=connector, timeout=self.timeout),
+                request_bucket=TokenBucket(self.requests_per_minute),
+                token_bucket=TokenBucket(self.tokens_per_minute),
+                semaphore=asyncio.Semaphore(self.max_concurrency),
+            )
+            self._states[loop] = state
+        return state
+
+    @staticmethod
+    def estimate_tokens(messages, max_tokens):
+        return sum(len(message['content']) for message in messages) // 4 + max_tokens
+
+    def _retry_delay(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(2 ** attempt, 60) + random.uniform(0, 1)
+
+    async def chat(self, messages, model, max_tokens=2000, temperature=0.3):
+        """Esegue una Chat Completion e restituisce la risposta JSON completa (incluso 'usage')"""
+        state = self._get_state()
+        payload = {
+            'model': model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+        }
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+
+        await state.request_bucket.acquire()
+        await state.token_bucket.acquire(self.estimate_tokens(messages, max_tokens))
+
+        async with state.semaphore:
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(delay)
+
+                try:
+                    async with state.session.post(f'{self.api_base}/chat/completions', json=payload, headers=headers) as response:
+                        if response.status in self.RETRY_STATUSES:
+                            last_error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                            delay = self._retry_delay(attempt, response.headers.get('Retry-After'))
+                            logger.warning(f"Risposta {response.status} dal servizio AI, nuovo tentativo tra {delay:.1f}s")
+                            continue
+                        if response.status >= 400:
+                            raise ContractAIError(f"HTTP {response.status}: {(await response.text())[:500]}")
+                        return await response.json()
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error = str(e) or e.__class__.__name__
+                    delay = self._retry_delay(attempt)
+                    logger.warning(f"Errore di connessione al servizio AI ({last_error}), nuovo tentativo tra {delay:.1f}s")
+
+        raise ContractAIError(f"Servizio AI non disponibile dopo {self.max_retries + 1} tentativi: {last_error}")
+
+    async def chat_stream(self, messages, model, max_tokens=2000, temperature=0.3, usage=None):
+        """Chat Completion in streaming (server-sent events): restituisce i frammenti di testo
+        man mano che arrivano. I tentativi ripetuti sono possibili solo prima del primo frammento.
+        I token consumati, inviati nell'ultimo evento, vengono sommati in usage."""
+        state = self._get_state()
+        payload = {
+            'model': model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'stream': True,
+            'stream_options': {'include_usage': True},
+        }
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+
+        await state.request_bucket.acquire()
+        await state.token_bucket.acquire(self.estimate_tokens(messages, max_tokens))
+
+        async with state.semaphore:
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(delay)
+
+                received = False
+                try:
+                    async with state.session.post(f'{self.api_base}/chat/completions', json=payload, headers=headers) as response:
+                        if response.status in self.RETRY_STATUSES:
+                            last_error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                            delay = self._retry_delay(attempt, response.headers.get('Retry-After'))
+                            logger.warning(f"Risposta {response.status} dal servizio AI, nuovo tentativo tra {delay:.1f}s")
+                            continue
+                        if response.status >= 400:
+                            raise ContractAIError(f"HTTP {response.status}: {(await response.text())[:500]}")
+
+                        async for line in response.content:
+                            line = line.strip()
+                            if not line.startswith(b'data:'):
+                                continue
+                            data = line[5:].strip()
+                            if data == b'[DONE]':
+                                return
+                            try:
+                                event = json.loads(data)
+                            except ValueError:
+                                continue
+                            add_usage(usage, event.get('usage'))
+                            if not event.get('choices'):
+                                continue
+                            content = (event['choices'][0].get('delta') or {}).get('content')
+                            if content:
+                                received = True
+                                yield content
+                        return
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error = str(e) or e.__class__.__name__
+                    if received:
+                        raise ContractAIError(f"Streaming della risposta AI interrotto: {last_error}")
+                    delay = self._retry_delay(attempt)
+                    logger.warning(f"Errore di connessione al servizio AI ({last_error}), nuovo tentativo tra {delay:.1f}s")
+
+        raise ContractAIError(f"Servizio AI non disponibile dopo {self.max_retries + 1} tentativi: {last_error}")
+
+    async def close(self):
+        """Chiude la sessione HTTP del loop corrente"""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is not None and not state.session.closed:
+            await state.session.close()
+
+    def _get_loop(self):
+        """Event loop di background condiviso da tutti i thread del processo"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='ai-client-loop', daemon=True).start()
+            return self._loop
+
+    def run_sync(self, coro):
+        """Esegue una coroutine sul loop del client da codice sincrono (view, worker)"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_ai_client():
+    """Client AI condiviso del processo: una sola sessione e un solo rate limit"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAIClient.from_settings()
+        return _client
+
+def reset_ai_client():
+    """Scarta il client condiviso: il successivo get_ai_client() rilegge le impostazioni (es. nei benchmark)"""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None and client._loop is not None:
+        client.run_sync(client.close())
+        client._loop.call_soon_threadsafe(client._loop.stop)
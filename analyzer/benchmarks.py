@@ -0,0 +1,1051 @@
+"""Scenari di benchmark eseguibili con: python manage.py bench <scenario>
+
+Ogni scenario restituisce un dizionario di risultati. Le scritture sul database
+avvengono in una transazione annullata al termine, quindi i benchmark possono
+girare anche su un database con dati reali.
+"""
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from docx import Document
+
+from .ai_client import reset_ai_client
+from .clause_library import find_similar, index_clauses, sign_clauses
+from .classifier import CONTRACT_TYPE_KEYWORDS, ContractTypeClassifier, contract_type_classifier
+from .deadlines import extract_deadlines
+from .detail_cache import CONTENT_KEY, TEMPLATE_VERSION, detail_cache_stats
+from .fake_openai import start_fake_server
+from .models import AnalysisCacheEntry, Contract, Deadline, MetricCounter, RiskClause
+from .pagination import encode_cursor, paginate_by_cursor
+from .prescreen import prescreen_text
+from .services import ContractAIService
+from .storage import ContentAddressedStorage
+from .tasks import analyze_contract_ai, save_analysis_results
+from .utils import clean_text, extract_text_from_file, hash_chunks, iter_clean_text, iter_text_from_docx
+from .views import ContractDetailView, ContractListView
+
+SCENARIOS = {}
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+@contextmanager
+def rolled_back():
+    """Esegue il blocco in una transazione che viene sempre annullata"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+@contextmanager
+def cleaned_up(contract_ids):
+    """Per gli scenari che scrivono da altri thread e non possono usare rolled_back: al termine
+    rimuove i contratti indicati (con clausole, scadenze, tempi e indice di ricerca), le voci della
+    cache analisi create nel frattempo e riporta i contatori ai valori iniziali"""
+    counters = dict(MetricCounter.objects.values_list('name', 'value'))
+    last_cache_entry = AnalysisCacheEntry.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    try:
+        yield
+    finally:
+        Contract.objects.filter(pk__in=contract_ids).delete()
+        AnalysisCacheEntry.objects.filter(pk__gt=last_cache_entry).delete()
+        MetricCounter.objects.exclude(name__in=counters).delete()
+        for name, value in counters.items():
+            MetricCounter.objects.filter(name=name).update(value=value)
+
+def measure(func, runs):
+    """Tempo medio (ms) e query per esecuzione di func()"""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(runs):
+            func()
+        elapsed = time.perf_counter() - started
+    return {
+        'ms_per_run': round(elapsed * 1000 / runs, 3),
+        'queries_per_run': len(queries.captured_queries) / runs,
+    }
+
+def peak_memory(func):
+    """Picco di memoria Python (KB) allocata durante func()"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+def _legacy_persist(contract, clauses, deadlines):
+    # Persistenza riga per riga, come prima dell'introduzione di save_analysis_results
+    for clause in clauses:
+        RiskClause.objects.create(
+            contract=contract,
+            clause_text=clause.clause_text,
+            risk_description=clause.risk_description,
+            severity=clause.severity,
+            recommendation=clause.recommendation,
+        )
+    for deadline in deadlines:
+        Deadline.objects.create(contract=contract, description=deadline.description)
+    contract.save()
+
+@scenario('persistence')
+def bench_persistence(runs=20, size=20):
+    """Query e latenza per salvare un'analisi con `size` clausole e size/2 scadenze"""
+    results = {}
+    with rolled_back():
+        contract = Contract.objects.create(title='Benchmark persistenza', extracted_text='testo')
+
+        def build():
+            clauses = [
+                RiskClause(contract=contract, clause_text=f"Clausola {i}", risk_description="Rischio",
+                           severity='high', recommendation="Raccomandazione")
+                for i in range(size)
+            ]
+            deadlines = [Deadline(contract=contract, description=f"Scadenza {i}") for i in range(size // 2)]
+            return clauses, deadlines
+
+        def legacy():
+            _legacy_persist(contract, *build())
+
+        def batched():
+            save_analysis_results(contract, *build())
+
+        results['per_row'] = measure(legacy, runs)
+        results['batched'] = measure(batched, runs)
+
+    results['clauses'] = size
+    results['deadlines'] = size // 2
+    return results
+
+@scenario('contract_list')
+def bench_contract_list(runs=20, size=10000):
+    """Latenza e memoria dell'elenco contratti con `size` contratti (testo ~20 KB ciascuno)"""
+    text = "Il conduttore si obbliga a corrispondere il canone pattuito. " * 330
+    analysis = '{"parties": "Locatore S.r.l., Conduttore S.p.A."}' * 40
+    results = {}
+    with rolled_back():
+        Contract.objects.bulk_create(
+            [
+                Contract(
+                    title=f"Contratto {i}", file=f"contracts/bench_{i}.pdf", extracted_text=text,
+                    ai_analysis=analysis, analyzed=True, risk_level='medium', contract_type='rental',
+                    parties="Locatore S.r.l. con sede in Milano e Conduttore S.p.A. con sede in Roma",
+                    parties_summary="Locatore S.r.l. con sede in Milano e Conduttore …",
+                )
+                for i in range(size)
+            ],
+            batch_size=500,
+        )
+        factory = RequestFactory()
+        view = ContractListView.as_view()
+
+        page_size = ContractListView.paginate_by
+        # L'elenco pagina per cursore (il parametro page è ignorato): l'ultima pagina si raggiunge
+        # dal cursore dell'ultimo elemento della penultima
+        tail = Contract.objects.order_by('-uploaded_at', '-id').only('uploaded_at')[size - page_size - 1]
+        tail_cursor = encode_cursor(tail)
+
+        def render_page(cursor=None):
+            params = {'cursor': cursor} if cursor else {}
+            return lambda: view(factory.get('/contracts/', params)).render()
+
+        for label, queryset in (('full_rows', Contract.objects.all()),
+                                ('deferred', Contract.objects.only(*Contract.LIST_FIELDS))):
+            first_page = lambda qs=queryset: list(qs.order_by('-uploaded_at')[:10])
+            all_rows = lambda qs=queryset: list(qs.iterator(chunk_size=2000))
+            results[label] = {
+                'page_query': measure(first_page, runs),
+                'page_peak_kb': peak_memory(first_page),
+                'scan_all': measure(all_rows, 1),
+                'scan_all_peak_kb': peak_memory(all_rows),
+            }
+
+        results['list_view'] = {
+            'first_page': measure(render_page(), runs),
+            'last_page': measure(render_page(tail_cursor), runs),
+            'peak_kb': peak_memory(render_page()),
+        }
+
+    results['contracts'] = size
+    return results
+
+@scenario('pagination')
+def bench_pagination(runs=20, size=50000):
+    """Costo di una pagina in testa e in coda all'elenco: OFFSET + COUNT contro cursore"""
+    results = {}
+    with rolled_back():
+        Contract.objects.bulk_create(
+            [Contract(title=f"Contratto {i}", file=f"contracts/bench_{i}.pdf") for i in range(size)],
+            batch_size=1000,
+        )
+        queryset = Contract.objects.only(*Contract.LIST_FIELDS).order_by('-uploaded_at', '-id')
+        page_size = 10
+        last_page = size // page_size
+
+        # Cursore sull'ultimo elemento della penultima pagina
+        tail_cursor = encode_cursor(queryset[size - page_size - 1])
+
+        def offset_page(number):
+            return lambda: list(Paginator(queryset, page_size).page(number))
+
+        def cursor_page(cursor):
+            return lambda: list(paginate_by_cursor(queryset, cursor, page_size))
+
+        results['offset'] = {
+            'first_page': measure(offset_page(1), runs),
+            'last_page': measure(offset_page(last_page), runs),
+        }
+        results['cursor'] = {
+            'first_page': measure(cursor_page(None), runs),
+            'last_page': measure(cursor_page(tail_cursor), runs),
+        }
+
+    results['contracts'] = size
+    return results
+
+def _legacy_contract_type(text):
+    # Classificazione a scansioni successive, come prima di classifier.py
+    text_lower = text.lower()
+    if any(word in text_lower for word in ['compravendita', 'vendita', 'acquisto']):
+        return 'purchase'
+    elif any(word in text_lower for word in ['prestazione', 'servizio', 'consulenza', 'informatici', 'software', 'sviluppo', 'manutenzione']):
+        return 'service'
+    elif any(word in text_lower for word in ['lavoro', 'dipendente', 'assunzione']):
+        return 'employment'
+    elif any(word in text_lower for word in ['locazione', 'affitto', 'noleggio']):
+        return 'rental'
+    elif any(word in text_lower for word in ['riservatezza', 'confidenzialità', 'nda']):
+        return 'nda'
+    elif any(word in text_lower for word in ['partnership', 'collaborazione', 'joint']):
+        return 'partnership'
+    elif any(word in text_lower for word in ['licenza', 'concessione', 'diritti']):
+        return 'license'
+    return 'other'
+
+FILLER_WORDS = (
+    "le parti convengono che il presente accordo sia regolato dalla legge italiana ogni "
+    "controversia sarà devoluta al foro competente salvo quanto diversamente previsto "
+    "dalle disposizioni che seguono e dagli allegati che ne costituiscono parte integrante"
+).split()
+
+def synthetic_contract(contract_type, words, rng):
+    """Testo sintetico di circa `words` parole con qualche parola chiave del tipo indicato"""
+    keywords = list(CONTRACT_TYPE_KEYWORDS.get(contract_type, {}))
+    tokens = [rng.choice(FILLER_WORDS) for _ in range(words)]
+    for _ in range(max(words // 400, 1) if keywords else 0):
+        tokens.insert(rng.randrange(len(tokens)), rng.choice(keywords))
+    return ' '.join(tokens)
+
+@scenario('classifier')
+def bench_classifier(runs=3, size=200):
+    """Throughput (MB/s) e accuratezza della classificazione su `size` contratti sintetici da ~5000
+    e ~20000 parole. full_text legge sempre l'intero documento: il motore re è più lento delle
+    ricerche letterali delle scansioni sequenziali, per questo il classificatore legge prima solo
+    l'apertura del contratto (speedup_vs_linear deve restare sopra 1)"""
+    rng = random.Random(42)
+    types = [contract_type for contract_type, _ in Contract.CONTRACT_TYPES]
+    full_text = ContractTypeClassifier(CONTRACT_TYPE_KEYWORDS, prefix_chars=sys.maxsize)
+
+    results = {'contracts': size}
+    for words in (5000, 20000):
+        labels = [rng.choice(types) for _ in range(size)]
+        corpus = [synthetic_contract(contract_type, words, rng) for contract_type in labels]
+        megabytes = sum(len(text.encode()) for text in corpus) / 1024 / 1024
+
+        length_results = {'corpus_mb': round(megabytes, 2)}
+        for label, classify_many in (
+            ('linear_scans', lambda: [_legacy_contract_type(text) for text in corpus]),
+            ('full_text', lambda: full_text.classify_many(corpus)),
+            ('compiled', lambda: contract_type_classifier.classify_many(corpus)),
+        ):
+            started = time.perf_counter()
+            for _ in range(runs):
+                predicted = classify_many()
+            elapsed = (time.perf_counter() - started) / runs
+            length_results[label] = {
+                'seconds': round(elapsed, 3),
+                'mb_per_s': round(megabytes / elapsed, 1),
+                'accuracy': sum(a == b for a, b in zip(predicted, labels)) / size,
+            }
+        length_results['speedup_vs_linear'] = round(
+            length_results['compiled']['mb_per_s'] / length_results['linear_scans']['mb_per_s'], 2
+        )
+        results[f'{words}_words'] = length_results
+    return results
+
+def _legacy_clean_text(text):
+    # Due passaggi regex non precompilati, come prima di iter_clean_text
+    text = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def synthetic_pages(megabytes, rng):
+    """Pagine di testo "estratto" con a capo, tabulazioni, spazi multipli e caratteri di controllo"""
+    lines = [
+        "Art. {n} - Obblighi delle parti",
+        "Il conduttore  si obbliga a corrispondere il canone\tpattuito entro il giorno {n}",
+        "di ogni mese; in caso di ritardo\x00 si applica una penale pari al {n}% del",
+        "canone dovuto.   Le parti convengono che il presente contratto è regolato",
+        "",
+    ]
+    pages, size, n = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        n += 1
+        page = "\r\n".join(rng.choice(lines).format(n=n) for _ in range(45)) + "\x0c"
+        pages.append(page)
+        size += len(page)
+    return pages
+
+@scenario('clean_text')
+def bench_clean_text(runs=3, size=8):
+    """Throughput (MB/s) e memoria della normalizzazione su un testo sintetico di `size` MB"""
+    pages = synthetic_pages(size, random.Random(42))
+    text = ''.join(pages)
+    megabytes = len(text) / 1024 / 1024
+
+    variants = (
+        ('legacy', lambda: _legacy_clean_text(text)),
+        ('flat', lambda: clean_text(text)),
+        ('structure', lambda: clean_text(text, preserve_structure=True)),
+        ('flat_streaming', lambda: ''.join(iter_clean_text(iter(pages)))),
+        ('structure_streaming', lambda: ''.join(iter_clean_text(iter(pages), preserve_structure=True))),
+    )
+    results = {'input_mb': round(megabytes, 2)}
+    for label, func in variants:
+        started = time.perf_counter()
+        for _ in range(runs):
+            func()
+        elapsed = (time.perf_counter() - started) / runs
+        results[label] = {'mb_per_s': round(megabytes / elapsed, 1), 'peak_kb': peak_memory(func)}
+    return results
+
+RISKY_SENTENCES = [
+    "In caso di ritardo si applica una penale pari al 20% del corrispettivo per ogni giorno.",
+    "Il fornitore può recedere in qualsiasi momento senza preavviso.",
+    "Il fornitore esclude ogni responsabilità per danni diretti e indiretti.",
+    "I dati potranno essere oggetto di trasferimento verso paesi terzi.",
+]
+
+@scenario('prescreen')
+def bench_prescreen(runs=3, size=200):
+    """Throughput del pre-screening e quota di contratti che eviterebbero la chiamata AI (metà a rischio)"""
+    rng = random.Random(42)
+    types = [contract_type for contract_type, _ in Contract.CONTRACT_TYPES]
+    corpus = []
+    for i in range(size):
+        text = synthetic_contract(rng.choice(types), 5000, rng)
+        if i % 2:
+            sentences = text.split('. ')
+            for sentence in rng.sample(RISKY_SENTENCES, 2):
+                sentences.insert(rng.randrange(len(sentences)), sentence)
+            text = '. '.join(sentences)
+        corpus.append(text)
+    megabytes = sum(len(text.encode()) for text in corpus) / 1024 / 1024
+
+    started = time.perf_counter()
+    for _ in range(runs):
+        screenings = [prescreen_text(text) for text in corpus]
+    elapsed = (time.perf_counter() - started) / runs
+
+    skipped = sum(1 for screening in screenings if screening.is_low_risk())
+    flagged = [screening for screening in screenings if screening.findings]
+    focused_chars = sum(len(screening.excerpt(2000)) for screening in flagged)
+    return {
+        'corpus_mb': round(megabytes, 2),
+        'contracts': size,
+        'mb_per_s': round(megabytes / elapsed, 1),
+        'ms_per_contract': round(elapsed * 1000 / size, 2),
+        'skip_mode': {'llm_skipped': skipped, 'skip_ratio': round(skipped / size, 3)},
+        'focus_mode': {
+            'llm_skipped': size - len(flagged),
+            'chars_sent_ratio': round(focused_chars / sum(len(screening.text) for screening in screenings), 3),
+        },
+    }
+
+DEADLINE_SENTENCES = [
+    "Il contratto ha efficacia dal 1° gennaio 2026 e scade il 31/12/2027.",
+    "Ciascuna parte può recedere con preavviso scritto di 60 (sessanta) giorni.",
+    "I lavori dovranno essere completati entro tre mesi dalla firma del presente contratto.",
+    "Il pagamento dovrà avvenire entro 30 giorni dal ricevimento della fattura.",
+]
+
+@scenario('deadlines')
+def bench_deadlines(runs=3, size=200):
+    """Throughput dell'estrazione locale di date e termini (quattro scadenze per contratto)"""
+    rng = random.Random(42)
+    types = [contract_type for contract_type, _ in Contract.CONTRACT_TYPES]
+    corpus = []
+    for _ in range(size):
+        sentences = synthetic_contract(rng.choice(types), 5000, rng).split('. ')
+        for sentence in DEADLINE_SENTENCES:
+            sentences.insert(rng.randrange(len(sentences)), sentence)
+        corpus.append('. '.join(sentences))
+    megabytes = sum(len(text.encode()) for text in corpus) / 1024 / 1024
+    reference_date = date(2025, 6, 1)
+
+    started = time.perf_counter()
+    for _ in range(runs):
+        results = [extract_deadlines(text, reference_date) for text in corpus]
+    elapsed = (time.perf_counter() - started) / runs
+
+    found = sum(len(deadlines) for deadlines in results)
+    return {
+        'corpus_mb': round(megabytes, 2),
+        'contracts': size,
+        'mb_per_s': round(megabytes / elapsed, 1),
+        'ms_per_contract': round(elapsed * 1000 / size, 2),
+        'deadlines_per_contract': round(found / size, 2),
+        'dated': sum(1 for deadlines in results for deadline in deadlines if deadline['date']),
+        'with_notice': sum(1 for deadlines in results for deadline in deadlines if deadline['days_notice']),
+    }
+
+PIPELINE_AI_LATENCY = 0.1  # secondi di latenza del server OpenAI locale
+PIPELINE_WORDS_PER_PAGE = 350
+
+def synthetic_document_pages(pages, rng):
+    """Pagine di un contratto sintetico in italiano: paragrafi con clausole a rischio e scadenze"""
+    types = [contract_type for contract_type, _ in Contract.CONTRACT_TYPES]
+    contract_type = rng.choice(types)
+    result = []
+    for number in range(1, pages + 1):
+        paragraphs = [f"Art. {number} - Disposizioni"]
+        for _ in range(4):
+            sentences = synthetic_contract(contract_type, PIPELINE_WORDS_PER_PAGE // 4, rng).split('. ')
+            sentences.insert(rng.randrange(len(sentences) + 1), rng.choice(RISKY_SENTENCES + DEADLINE_SENTENCES))
+            paragraphs.append('. '.join(sentences))
+        result.append(paragraphs)
+    return result
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_pdf(path, pages):
+    """PDF minimale con una pagina di testo (Helvetica, WinAnsi per le lettere accentate) per pagina"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            ' '.join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages))).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, paragraphs in enumerate(pages):
+        lines = []
+        for paragraph in paragraphs:
+            lines.extend(textwrap.wrap(paragraph, 95))
+            lines.append('')
+        content = "BT /F1 9 Tf 40 760 Td 11 TL " + ' '.join(f"({_pdf_string(line)}) '" for line in lines) + " ET"
+        stream = content.encode('cp1252', errors='replace')
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        ).encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += b''.join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, 'wb') as f:
+        f.write(output)
+
+def write_docx(path, pages):
+    """DOCX con un paragrafo per capoverso e un'interruzione di pagina tra le pagine"""
+    document = Document()
+    for i, paragraphs in enumerate(pages):
+        if i:
+            document.add_page_break()
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+def _legacy_docx_paragraphs(path):
+    # Albero completo di python-docx e soli paragrafi del corpo, come prima dell'estrazione
+    # in streaming (tabelle, intestazioni e note non venivano lette)
+    for paragraph in Document(path).paragraphs:
+        yield f"{paragraph.text}\n"
+
+# Crescita del picco di memoria residente durante l'estrazione, misurata in un processo separato:
+# a differenza di tracemalloc include la memoria allocata da lxml per l'albero di python-docx.
+# Si legge VmHWM (Linux) perché ru_maxrss conserva il picco del processo padre dopo l'exec
+RSS_PROBE = """
+import re, sys
+{imports}
+def peak_kb():
+    with open('/proc/self/status') as f:
+        return int(re.search(r'VmHWM:\\s+(\\d+)', f.read()).group(1))
+before = peak_kb()
+for paragraph in {paragraphs}:
+    pass
+print(peak_kb() - before)
+"""
+DOCX_RSS_VARIANTS = {
+    'legacy': ('from docx import Document', '(p.text for p in Document(sys.argv[1]).paragraphs)'),
+    'streaming': ('from analyzer.docx_text import iter_docx_paragraphs', 'iter_docx_paragraphs(sys.argv[1])'),
+}
+
+def rss_growth_kb(variant, path):
+    imports, paragraphs = DOCX_RSS_VARIANTS[variant]
+    completed = subprocess.run(
+        [sys.executable, '-c', RSS_PROBE.format(imports=imports, paragraphs=paragraphs), path],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    return int(completed.stdout.strip())
+
+def write_docx_with_tables(path, pages, rng):
+    """DOCX come write_docx, con intestazione, piè di pagina e una tabella di penali per pagina"""
+    document = Document()
+    document.sections[0].header.paragraphs[0].text = "Contratto di prova - riservato"
+    document.sections[0].footer.paragraphs[0].text = "Documento generato per il benchmark"
+    for i, paragraphs in enumerate(pages):
+        if i:
+            document.add_page_break()
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+        table = document.add_table(rows=4, cols=3)
+        for row in table.rows:
+            days = rng.randint(1, 90)
+            for cell, value in zip(row.cells, (f"Ritardo oltre {days} giorni", f"Penale {rng.randint(1, 20)}%", "Art. 1382 c.c.")):
+                cell.text = value
+    document.save(path)
+
+@scenario('docx_extract')
+def bench_docx_extract(runs=3, size=200):
+    """Tempo, memoria di picco e testo estratto da un DOCX di `size` pagine con tabelle:
+    albero python-docx (legacy) e lettura in streaming dell'XML"""
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'contratto.docx')
+        write_docx_with_tables(path, synthetic_document_pages(size, rng), rng)
+        results = {'pages': size, 'file_kb': round(os.path.getsize(path) / 1024, 1)}
+
+        variants = (
+            ('legacy', lambda: _legacy_docx_paragraphs(path)),
+            ('streaming', lambda: iter_text_from_docx(path)),
+        )
+        for label, paragraphs in variants:
+            started = time.perf_counter()
+            for _ in range(runs):
+                text = ''.join(paragraphs())
+            elapsed = (time.perf_counter() - started) / runs
+            results[label] = {
+                'ms': round(elapsed * 1000, 1),
+                # Memoria durante la lettura dei paragrafi, senza comporre il testo completo
+                'peak_memory_kb': peak_memory(lambda: all(True for _ in paragraphs())),
+                'rss_growth_kb': rss_growth_kb(label, path),
+                'text_kb': round(len(text.encode()) / 1024, 1),
+                'table_rows': text.count('Penale '),
+            }
+
+    results['rss_ratio'] = round(results['legacy']['rss_growth_kb'] / max(results['streaming']['rss_growth_kb'], 1), 1)
+    return results
+
+def percentiles(values):
+    """Mediana e 95° percentile (ms) di una serie di durate in secondi"""
+    ordered = sorted(values)
+    def pick(fraction):
+        return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1000, 2)
+    return {'p50_ms': pick(0.5), 'p95_ms': pick(0.95)}
+
+@contextmanager
+def count_queries():
+    """Conta le query di tutte le connessioni, comprese quelle aperte da altri thread
+    (il salvataggio delle clausole in streaming avviene sul thread del client AI)"""
+    counter = [0]
+    wrapped = []
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    def attach(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+        wrapped.append(connection)
+
+    attach(None, connection)
+    connection_created.connect(attach)
+    try:
+        yield counter
+    finally:
+        connection_created.disconnect(attach)
+        for wrapped_connection in wrapped:
+            if wrapper in wrapped_connection.execute_wrappers:
+                wrapped_connection.execute_wrappers.remove(wrapper)
+
+@contextmanager
+def fake_ai_endpoint(latency):
+    """Server OpenAI locale con client AI ricreato per puntarvi; i limiti al minuto del
+    fornitore reale non si applicano, altrimenti si misurerebbe il rate limiter"""
+    server, api_base = start_fake_server(latency=latency)
+    reset_ai_client()
+    try:
+        with override_settings(OPENAI_API_BASE=api_base, AI_REQUESTS_PER_MINUTE=10 ** 6, AI_TOKENS_PER_MINUTE=10 ** 9):
+            yield api_base
+    finally:
+        reset_ai_client()
+        server.shutdown()
+        server.server_close()
+
+@scenario('pipeline')
+def bench_pipeline(runs=5, size=20):
+    """Pipeline completa su `runs` contratti PDF e DOCX di `size` pagine: estrazione, pulizia,
+    classificazione e analisi AI (server locale), con latenze p50/p95, memoria e query"""
+    rng = random.Random(42)
+    results = {
+        'documents_per_format': runs,
+        'pages': size,
+        'ai_latency_s': PIPELINE_AI_LATENCY,
+        'ai_streaming': settings.AI_STREAM_RESPONSES,
+    }
+    writers = {'pdf': write_pdf, 'docx': write_docx}
+
+    with tempfile.TemporaryDirectory() as directory, fake_ai_endpoint(PIPELINE_AI_LATENCY):
+        for extension, writer in writers.items():
+            paths = []
+            for i in range(runs):
+                path = os.path.join(directory, f"contratto_{i}.{extension}")
+                writer(path, synthetic_document_pages(size, rng))
+                paths.append(path)
+
+            timings = {stage: [] for stage in ('extract', 'clean', 'classify', 'analyze', 'total')}
+            text_bytes = 0
+            created = []
+            with cleaned_up(created):
+                with count_queries() as queries:
+                    for path in paths:
+                        started = time.perf_counter()
+                        raw = extract_text_from_file(path)
+                        extracted = time.perf_counter()
+                        text = clean_text(raw, preserve_structure=settings.TEXT_PRESERVE_STRUCTURE)
+                        cleaned = time.perf_counter()
+                        contract_type = ContractAIService.extract_contract_type(text)
+                        classified = time.perf_counter()
+
+                        contract = Contract.objects.create(
+                            title=f"Benchmark {os.path.basename(path)}", extracted_text=text,
+                            extraction_status='done', contract_type=contract_type,
+                        )
+                        created.append(contract.pk)
+                        analyze_contract_ai(contract.pk, use_cache=False)
+                        finished = time.perf_counter()
+
+                        timings['extract'].append(extracted - started)
+                        timings['clean'].append(cleaned - extracted)
+                        timings['classify'].append(classified - cleaned)
+                        timings['analyze'].append(finished - classified)
+                        timings['total'].append(finished - started)
+                        text_bytes += len(text.encode())
+
+                analyzed = Contract.objects.filter(pk__in=created, analyzed=True).exclude(ai_analysis__startswith='Errore').count()
+
+            megabytes = text_bytes / 1024 / 1024
+            format_results = {
+                'file_kb': round(sum(os.path.getsize(path) for path in paths) / len(paths) / 1024, 1),
+                'text_kb': round(text_bytes / len(paths) / 1024, 1),
+                'analyzed': analyzed,
+                'queries_per_contract': round(queries[0] / len(paths), 1),
+                'peak_memory_kb': peak_memory(lambda: clean_text(extract_text_from_file(paths[0]))),
+            }
+            for stage, values in timings.items():
+                format_results[stage] = percentiles(values)
+                if stage in ('extract', 'clean', 'classify'):
+                    format_results[stage]['mb_per_s'] = round(megabytes / sum(values), 2)
+            format_results['total']['contracts_per_s'] = round(len(paths) / sum(timings['total']), 2)
+            results[extension] = format_results
+
+    return results
+
+
+STORAGE_FILE_KB = 512
+STORAGE_UPLOAD_MB = 8
+
+def _disk_usage_kb(directory):
+    return round(sum(
+        os.path.getsize(os.path.join(dirpath, filename))
+        for dirpath, _, filenames in os.walk(directory) for filename in filenames
+    ) / 1024, 1)
+
+@scenario('storage')
+def bench_storage(runs=3, size=40):
+    """Spazio su disco e throughput per `size` upload (un quarto dei contenuti distinti) con
+    FileSystemStorage e archiviazione per contenuto; memoria di un upload multipart al variare
+    di FILE_UPLOAD_MAX_MEMORY_SIZE"""
+    rng = random.Random(42)
+    contents = [rng.randbytes(STORAGE_FILE_KB * 1024) for _ in range(max(size // 4, 1))]
+    uploads = [contents[i % len(contents)] for i in range(size)]
+    megabytes = len(uploads) * STORAGE_FILE_KB / 1024
+    results = {'uploads': size, 'distinct_files': len(contents), 'file_kb': STORAGE_FILE_KB}
+
+    def legacy_save(storage, uploaded):
+        # Percorso precedente: impronta calcolata dalla view in un passaggio separato, poi un nuovo file per upload
+        hash_chunks(uploaded.chunks())
+        storage.save('contracts/contratto.pdf', uploaded)
+
+    def content_addressed_save(storage, uploaded):
+        storage.save('contracts/contratto.pdf', uploaded)
+
+    variants = (
+        ('legacy', FileSystemStorage, legacy_save),
+        ('content_addressed', ContentAddressedStorage, content_addressed_save),
+    )
+    for label, storage_class, save in variants:
+        elapsed = 0.0
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory() as directory:
+                storage = storage_class(location=directory)
+                started = time.perf_counter()
+                for i, content in enumerate(uploads):
+                    save(storage, SimpleUploadedFile(f'contratto_{i}.pdf', content))
+                elapsed += time.perf_counter() - started
+                disk_kb = _disk_usage_kb(directory)
+        results[label] = {'mb_per_s': round(megabytes * runs / elapsed, 1), 'disk_kb': disk_kb}
+
+    # Upload multipart di un contratto grande: la richiesta viene costruita prima della misura,
+    # che comprende solo la lettura dei file caricati e il salvataggio
+    body = rng.randbytes(STORAGE_UPLOAD_MB * 1024 * 1024)
+    for label, max_memory in (('upload_memory_10mb', 10 * 1024 * 1024), ('upload_memory_256kb', 256 * 1024)):
+        with tempfile.TemporaryDirectory() as directory, override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=max_memory):
+            storage = ContentAddressedStorage(location=directory)
+            request = RequestFactory().post('/upload/', {'file': SimpleUploadedFile('contratto.pdf', body)})
+
+            def upload():
+                uploaded = request.FILES['file']
+                storage.save('contracts/contratto.pdf', uploaded)
+                uploaded.close()
+            results[label] = {'peak_kb': peak_memory(upload)}
+    results['upload_mb'] = STORAGE_UPLOAD_MB
+    return results
+
+LIBRARY_CLAUSE_WORDS = 30
+LIBRARY_QUERIES = 200
+LIBRARY_BATCH = 5000
+# Clausole standard (foro competente, limitazione di responsabilità...) e quota della libreria
+# composta da loro varianti
+LIBRARY_STANDARD_CLAUSES = 20
+LIBRARY_STANDARD_SHARE = 0.05
+
+def synthetic_clause(vocabulary, rng):
+    """Clausola sintetica di LIBRARY_CLAUSE_WORDS parole con un importo"""
+    words = [rng.choice(vocabulary) for _ in range(LIBRARY_CLAUSE_WORDS)]
+    words.insert(rng.randrange(len(words)), f"{rng.randrange(1, 100)}%")
+    return ' '.join(words) + '.'
+
+def edited_clause(text, vocabulary, rng, edits=2):
+    """Variante della clausola con `edits` parole sostituite (es. parti o importi diversi)"""
+    words = text.split()
+    for index in rng.sample(range(len(words)), edits):
+        words[index] = rng.choice(vocabulary)
+    return ' '.join(words)
+
+@scenario('clause_library')
+def bench_clause_library(runs=3, size=1000000):
+    """Ricerca nella libreria con `size` clausole indicizzate (default 1M, come l'obiettivo della
+    libreria): costo di firma e indicizzazione, latenza p50/p95 e query per ricerca, richiamo
+    sulle varianti di clausole note, falsi positivi su clausole nuove e latenza per le varianti
+    delle clausole standard ripetute in migliaia di contratti (bucket più affollati)"""
+    rng = random.Random(42)
+    syllables = ['ca', 'to', 're', 'mi', 'li', 'za', 'ne', 'so', 'ter', 'gio', 'pro', 'ven']
+    vocabulary = FILLER_WORDS + [
+        ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(2000)
+    ]
+    standard = [synthetic_clause(vocabulary, rng) for _ in range(LIBRARY_STANDARD_CLAUSES)]
+    standard_copies = int(size * LIBRARY_STANDARD_SHARE)
+    results = {
+        'library_clauses': size, 'clause_words': LIBRARY_CLAUSE_WORDS, 'edited_words': 2,
+        'standard_clauses': LIBRARY_STANDARD_CLAUSES, 'standard_copies': standard_copies,
+    }
+
+    def library_clause(index):
+        # Le prime standard_copies clausole sono varianti delle clausole standard
+        if index < standard_copies:
+            return edited_clause(standard[index % len(standard)], vocabulary, rng)
+        return synthetic_clause(vocabulary, rng)
+
+    with rolled_back():
+        library = Contract.objects.create(title='Benchmark libreria', extracted_text='testo')
+        sampled = {}
+        sample_every = max((size - standard_copies) // LIBRARY_QUERIES, 1)
+        signing = indexing = 0.0
+        for offset in range(0, size, LIBRARY_BATCH):
+            clauses = [
+                RiskClause(contract=library, clause_text=library_clause(index), risk_description="Rischio",
+                           severity='high', recommendation="Raccomandazione", source='ai')
+                for index in range(offset, min(offset + LIBRARY_BATCH, size))
+            ]
+            started = time.perf_counter()
+            sign_clauses(clauses)
+            signing += time.perf_counter() - started
+            started = time.perf_counter()
+            RiskClause.objects.bulk_create(clauses, batch_size=500)
+            index_clauses(clauses)
+            indexing += time.perf_counter() - started
+            for i in range(max(standard_copies - offset, 0), len(clauses), sample_every):
+                sampled[clauses[i].pk] = clauses[i].clause_text
+        results['signature_us'] = round(signing * 1e6 / size, 1)
+        results['index_clauses_per_s'] = round(size / indexing)
+
+        contract = Contract.objects.create(title='Benchmark ricerca', extracted_text='testo')
+        known = [(pk, edited_clause(text, vocabulary, rng)) for pk, text in list(sampled.items())[:LIBRARY_QUERIES]]
+        novel = [synthetic_clause(vocabulary, rng) for _ in range(LIBRARY_QUERIES)]
+        variants = [edited_clause(rng.choice(standard), vocabulary, rng) for _ in range(LIBRARY_QUERIES)]
+
+        durations = []
+        standard_durations = []
+        found = false_positives = standard_found = 0
+        # Il log delle query di CaptureQueriesContext è già pieno dopo gli inserimenti
+        with count_queries() as queries:
+            for _ in range(runs):
+                for expected, text in known:
+                    started = time.perf_counter()
+                    match, _ = find_similar(text, exclude_contract_id=contract.pk)
+                    durations.append(time.perf_counter() - started)
+                    found += match is not None and match.pk == expected
+                for text in novel:
+                    started = time.perf_counter()
+                    match, _ = find_similar(text, exclude_contract_id=contract.pk)
+                    durations.append(time.perf_counter() - started)
+                    false_positives += match is not None
+        if standard_copies:
+            for _ in range(runs):
+                for text in variants:
+                    started = time.perf_counter()
+                    match, _ = find_similar(text, exclude_contract_id=contract.pk)
+                    standard_durations.append(time.perf_counter() - started)
+                    standard_found += match is not None
+
+    results['lookup'] = {**percentiles(durations), 'queries_per_lookup': round(queries[0] / len(durations), 2)}
+    results['recall'] = round(found / (len(known) * runs), 3)
+    results['false_positive_rate'] = round(false_positives / (len(novel) * runs), 3)
+    if standard_durations:
+        results['standard_lookup'] = {
+            **percentiles(standard_durations), 'recall': round(standard_found / len(standard_durations), 3),
+        }
+    return results
+
+# Processo di carico: 'upload' invia i file assegnati alla view di upload e apre la pagina di
+# dettaglio, 'analysis' esegue i job in coda come run_analysis_workers finché, terminati gli
+# upload (file UPLOADS_DONE creato dal processo padre), la coda è vuota. Gli errori "database is locked" sono contati anche quando la view o run_job
+# li intercettano e li registrano nel log.
+STRESS_WORKER = """
+import json, logging, os, sys, time
+import django
+django.setup()
+from django.db import OperationalError, close_old_connections
+from django.test import Client, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from analyzer.jobs import claim_next_job, run_job
+from analyzer.models import AnalysisJob
+
+role, media_root = sys.argv[1], sys.argv[2]
+paths = sys.argv[3:]
+stats = {'locked': 0, 'errors': 0, 'done': 0, 'durations': []}
+
+class LockCounter(logging.Handler):
+    def emit(self, record):
+        stats['locked'] += 'database is locked' in record.getMessage()
+
+logging.getLogger().addHandler(LockCounter())
+with override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=['*']):
+    if role == 'upload':
+        client = Client()
+        for path in paths:
+            started = time.perf_counter()
+            try:
+                with open(path, 'rb') as f:
+                    upload = SimpleUploadedFile(path.rsplit('/', 1)[-1], f.read())
+                response = client.post('/upload/', {'title': upload.name, 'file': upload})
+                client.get(response.url)
+                stats['done'] += response.status_code == 302
+            except OperationalError as e:
+                stats['locked'] += 'database is locked' in str(e)
+                stats['errors'] += 1
+            stats['durations'].append(time.perf_counter() - started)
+    else:
+        deadline = time.monotonic() + 600
+        while time.monotonic() < deadline:
+            close_old_connections()
+            try:
+                job = claim_next_job(f'stress-{role}')
+                if job is None:
+                    uploads_done = os.path.exists(os.path.join(media_root, 'UPLOADS_DONE'))
+                    if uploads_done and not AnalysisJob.objects.filter(status__in=['queued', 'running']).exists():
+                        break
+                    time.sleep(0.05)
+                    continue
+                started = time.perf_counter()
+                stats['done'] += run_job(job) and job.stage == 'analyze'
+                stats['durations'].append(time.perf_counter() - started)
+            except OperationalError as e:
+                stats['locked'] += 'database is locked' in str(e)
+                stats['errors'] += 1
+print(json.dumps(stats))
+"""
+
+def stress_database(database_url, paths, processes, api_base, overrides):
+    """Upload e analisi concorrenti su un database appena migrato: `processes` processi per ruolo"""
+    env = {
+        **os.environ,
+        **overrides,
+        'DJANGO_SETTINGS_MODULE': 'contract_analyzer.settings',
+        'DATABASE_URL': database_url,
+        'OPENAI_API_BASE': api_base,
+        'AI_REQUESTS_PER_MINUTE': str(10 ** 6),
+        'AI_TOKENS_PER_MINUTE': str(10 ** 9),
+        'ANALYSIS_JOB_RETRY_DELAY': '1',
+        'ANALYSIS_JOB_MAX_RETRY_DELAY': '1',
+    }
+    manage = [sys.executable, 'manage.py']
+    subprocess.run([*manage, 'migrate', '-v0'], cwd=settings.BASE_DIR, env=env, check=True, capture_output=True)
+    try:
+        with tempfile.TemporaryDirectory() as media_root:
+            started = time.perf_counter()
+            workers = [
+                subprocess.Popen(
+                    [sys.executable, '-c', STRESS_WORKER, role, media_root, *paths[i::processes]],
+                    cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                )
+                for role in ('upload', 'analysis') for i in range(processes)
+            ]
+            outputs = []
+            for i, worker in enumerate(workers):
+                stdout, _ = worker.communicate()
+                if worker.returncode:
+                    raise RuntimeError(f"Processo di carico terminato con codice {worker.returncode}")
+                outputs.append(json.loads(stdout.strip().splitlines()[-1]))
+                if i == processes - 1:
+                    open(os.path.join(media_root, 'UPLOADS_DONE'), 'w').close()
+            elapsed = time.perf_counter() - started
+    finally:
+        if not database_url.startswith('sqlite'):
+            subprocess.run([*manage, 'flush', '--no-input'], cwd=settings.BASE_DIR, env=env, check=True, capture_output=True)
+
+    uploads, analyses = outputs[:processes], outputs[processes:]
+    return {
+        'uploads': sum(stats['done'] for stats in uploads),
+        'analyses': sum(stats['done'] for stats in analyses),
+        'lock_errors': sum(stats['locked'] for stats in outputs),
+        'failed_operations': sum(stats['errors'] for stats in outputs),
+        'elapsed_s': round(elapsed, 2),
+        'contracts_per_s': round(sum(stats['done'] for stats in analyses) / elapsed, 2),
+        'upload': percentiles([duration for stats in uploads for duration in stats['durations']]),
+        'job': percentiles([duration for stats in analyses for duration in stats['durations']]),
+    }
+
+@scenario('db_concurrency')
+def bench_db_concurrency(runs=4, size=100):
+    """Stress del database: `size` contratti DOCX caricati da `runs` processi web mentre altri `runs`
+    processi li analizzano (server AI locale); SQLite con le impostazioni predefinite di Django e con
+    WAL/IMMEDIATE, più il database di BENCH_DATABASE_URL (es. Postgres) se impostato"""
+    rng = random.Random(42)
+    results = {'contracts': size, 'processes_per_role': runs}
+    with tempfile.TemporaryDirectory() as directory, fake_ai_endpoint(PIPELINE_AI_LATENCY) as api_base:
+        paths = []
+        for i in range(size):
+            paths.append(os.path.join(directory, f'contratto_{i}.docx'))
+            write_docx(paths[-1], synthetic_document_pages(2, rng))
+
+        # Impostazioni precedenti: journal DELETE, BEGIN differito, timeout di 5 s e una connessione per richiesta
+        variants = {
+            'sqlite_default': (
+                f'sqlite:///{directory}/default.sqlite3'
+                '?journal_mode=delete&synchronous=full&transaction_mode=deferred&timeout=5',
+                {'DB_CONN_MAX_AGE': '0', 'DB_CONN_HEALTH_CHECKS': 'False'},
+            ),
+            'sqlite_tuned': (f'sqlite:///{directory}/tuned.sqlite3', {}),
+        }
+        if os.environ.get('BENCH_DATABASE_URL'):
+            variants['external'] = (os.environ['BENCH_DATABASE_URL'], {})
+        for label, (database_url, overrides) in variants.items():
+            results[label] = stress_database(database_url, paths, runs, api_base, overrides)
+    return results
+
+DETAIL_CONTRACTS = 20
+DETAIL_REANALYSIS_EVERY = 25  # visualizzazioni tra due rianalisi nella simulazione del traffico
+DETAIL_CONDITIONAL_SHARE = 0.3  # quota di visite con ETag già in possesso del browser
+
+@scenario('contract_detail')
+def bench_contract_detail(runs=50, size=30):
+    """Latenza e query della pagina di dettaglio con `size` clausole: generata, dalla cache e 304;
+    quota di richieste senza rendering su un traffico simulato con rianalisi periodiche"""
+    rng = random.Random(42)
+    results = {'clauses': size, 'deadlines': size // 2}
+    factory = RequestFactory()
+    view = ContractDetailView.as_view()
+
+    def build(contract):
+        clauses = [
+            RiskClause(contract=contract, clause_text=f"Clausola {i}: {rng.choice(RISKY_SENTENCES)}",
+                       risk_description="Rischio", severity=rng.choice(['low', 'medium', 'high']),
+                       recommendation="Raccomandazione", source='prescreen')
+            for i in range(size)
+        ]
+        deadlines = [Deadline(contract=contract, description=rng.choice(DEADLINE_SENTENCES)) for _ in range(size // 2)]
+        return clauses, deadlines
+
+    def get(contract, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        response = view(factory.get(f'/contracts/{contract.pk}/', **headers), pk=contract.pk)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    with rolled_back():
+        contracts = []
+        for i in range(DETAIL_CONTRACTS):
+            contract = Contract.objects.create(title=f"Benchmark dettaglio {i}", extracted_text='testo')
+            save_analysis_results(contract, *build(contract))
+            contracts.append(contract)
+
+        contract = contracts[0]
+        etag = get(contract)['ETag']
+        content_key = CONTENT_KEY.format(pk=contract.pk, version=contract.analysis_version, template=TEMPLATE_VERSION)
+
+        def rendered():
+            cache.delete(content_key)
+            get(contract)
+
+        results['rendered'] = measure(rendered, runs)
+        results['cached'] = measure(lambda: get(contract), runs)
+        results['not_modified'] = measure(lambda: get(contract, etag), runs)
+
+        # Traffico: pochi contratti molto visitati, revalidazioni del browser e rianalisi
+        before = detail_cache_stats()
+        known_etags = {}
+        weights = [1 / (i + 1) for i in range(len(contracts))]
+        for view_number in range(1, runs * 20 + 1):
+            contract = rng.choices(contracts, weights)[0]
+            etag = known_etags.get(contract.pk) if rng.random() < DETAIL_CONDITIONAL_SHARE else None
+            known_etags[contract.pk] = get(contract, etag)['ETag']
+            if view_number % DETAIL_REANALYSIS_EVERY == 0:
+                reanalyzed = rng.choice(contracts)
+                save_analysis_results(reanalyzed, *build(reanalyzed))
+        after = detail_cache_stats()
+
+    traffic = {result: after[result] - before[result] for result in ('hit', 'miss', 'not_modified')}
+    traffic['hit_ratio'] = round((traffic['hit'] + traffic['not_modified']) / sum(traffic.values()), 3)
+    results['traffic'] = {'views': runs * 20, 'reanalysis_every': DETAIL_REANALYSIS_EVERY, **traffic}
+    return results
@@ -0,0 +1,135 @@
+"""Classificazione del tipo di contratto per parole chiave.
+
+Le tabelle di parole chiave (con peso) di ogni tipo in Contract.CONTRACT_TYPES sono
+compilate una sola volta in un'unica espressione regolare: il testo viene letto in un
+solo passaggio, le corrispondenze rispettano i confini di parola ("nda" non corrisponde
+dentro "azienda") e vince il tipo con il punteggio totale più alto.
+
+Il tipo è dichiarato nel titolo e nelle premesse: si leggono i primi PREFIX_CHARS caratteri
+e il resto del documento solo se lì non compare nessuna parola chiave. Il motore re scorre
+il testo a circa 30 MB/s, meno delle ricerche letterali con `in`: leggere l'intero documento
+sarebbe più lento delle scansioni sequenziali sostituite (vedi `manage.py bench classifier`).
+"""
+import re
+from collections import Counter
+
+from .models import Contract
+
+# Pesi: 4-5 termini che identificano il tipo da soli, 2-3 termini tipici, 1 termini generici
+CONTRACT_TYPE_KEYWORDS = {
+    'purchase': {
+        'compravendita': 5, 'contratto di vendita': 4, 'prezzo di acquisto': 3,
+        'trasferimento della proprietà': 3, 'venditore': 2, 'acquirente': 2,
+        'vendita': 2, 'acquisto': 2,
+    },
+    'service': {
+        'contratto di servizi': 4, 'contratto di servizio': 4, 'prestazione di servizi': 4,
+        'livelli di servizio': 3, 'sviluppo software': 3, 'consulenza': 2, 'manutenzione': 2,
+        'committente': 2, 'prestazione': 1, 'servizio': 1, 'servizi': 1, 'informatici': 1,
+        'software': 1, 'sviluppo': 1,
+    },
+    'employment': {
+        'contratto di lavoro': 4, 'rapporto di lavoro': 4, 'datore di lavoro': 4,
+        'lavoratore': 3, 'lavoratrice': 3, 'assunzione': 3, 'ccnl': 3, 'periodo di prova': 2,
+        'retribuzione': 2, 'mansioni': 2, 'dipendente': 2, 'lavoro': 1,
+    },
+    'rental': {
+        'locazione': 4, 'affitto': 3, 'noleggio': 3, 'locatore': 3, 'conduttore': 3,
+        'deposito cauzionale': 2, 'canone': 2,
+    },
+    'nda': {
+        'accordo di riservatezza': 5, 'non divulgazione': 4, 'nda': 4,
+        'informazioni riservate': 3, 'informazioni confidenziali': 3,
+        'riservatezza': 3, 'confidenzialità': 3,
+    },
+    'partnership': {
+        'joint venture': 4, 'associazione in partecipazione': 4, 'partnership': 4,
+        'ripartizione degli utili': 3, 'collaborazione': 2, 'partner': 2, 'joint': 2,
+    },
+    'license': {
+        'licenziante': 4, 'licenziatario': 4, 'royalties': 3, 'royalty': 3, 'licenza': 3,
+        'diritti di utilizzo': 3, 'proprietà intellettuale': 2, 'concessione': 2, 'diritti': 1,
+    },
+}
+
+DEFAULT_CONTRACT_TYPE = 'other'
+
+# Caratteri letti prima di ricorrere all'intero documento (titolo, premesse e primi articoli)
+PREFIX_CHARS = 8000
+
+def _normalize(phrase):
+    return ' '.join(phrase.lower().split())
+
+def _trie_pattern(phrases):
+    """Regex equivalente all'alternanza delle frasi, fattorizzata per prefissi comuni.
+
+    Il motore re di Python prova le alternative una per una: con un trie ogni posizione
+    del testo scarta in un solo confronto tutte le frasi che non iniziano con quel carattere.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [
+            (r'\s+' if char == ' ' else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Fine di una frase che è anche prefisso di altre: il resto è opzionale (greedy, vince la più lunga)
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return build(trie)
+
+
+class ContractTypeClassifier:
+    """Classificatore a punteggio compilato da una tabella {tipo: {parola chiave: peso}}"""
+    
+    def __init__(self, keywords, default=DEFAULT_CONTRACT_TYPE, prefix_chars=PREFIX_CHARS):
+        self.default = default
+        self.prefix_chars = prefix_chars
+        self.weights = {}
+        for contract_type, phrases in keywords.items():
+            for phrase, weight in phrases.items():
+                self.weights[_normalize(phrase)] = (contract_type, weight)
+        
+        # In caso di parità prevale l'ordine di Contract.CONTRACT_TYPES
+        self.priority = {contract_type: i for i, (contract_type, _) in enumerate(Contract.CONTRACT_TYPES)}
+        
+        self.pattern = re.compile(r'\b' + _trie_pattern(self.weights) + r'\b')
+    
+    def scores(self, text):
+        """Punteggio totale per tipo di contratto"""
+        scores = Counter()
+        for match in self.pattern.finditer(text.lower()):
+            contract_type, weight = self.weights[_normalize(match.group())]
+            scores[contract_type] += weight
+        return scores
+    
+    def classify(self, text):
+        if len(text) <= self.prefix_chars:
+            scores = self.scores(text)
+        else:
+            # Taglio su uno spazio, per non creare corrispondenze con parole troncate
+            end = text.rfind(' ', 0, self.prefix_chars)
+            scores = self.scores(text[:end if end > 0 else self.prefix_chars])
+            if not scores:
+                scores = self.scores(text)
+        if not scores:
+            return self.default
+        return max(scores, key=lambda contract_type: (scores[contract_type], -self.priority[contract_type]))
+    
+    def classify_many(self, texts):
+        """Classifica una sequenza di testi; restituisce i tipi nello stesso ordine"""
+        return [self.classify(text) for text in texts]
+
+
+contract_type_classifier = ContractTypeClassifier(CONTRACT_TYPE_KEYWORDS)
+
+def classify_contract_type(text):
+    return contract_type_classifier.classify(text)
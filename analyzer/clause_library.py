@@ -0,0 +1,119 @@
+"""Libreria delle clausole rischiose già valutate dall'AI.
+
+Le clausole con origine 'ai' vengono firmate (analyzer.minhash) al salvataggio e registrate
+nella tabella LSH ClauseBucket, una riga per banda della firma. Per un passaggio di un nuovo
+contratto la ricerca conta nel database le bande condivise con ogni clausola (indice coprente),
+confronta le firme dei candidati con più bande e restituisce la clausola più simile oltre
+CLAUSE_LIBRARY_THRESHOLD: rischio, gravità e raccomandazione vengono riutilizzati e il
+passaggio non viene più inviato al modello.
+
+I passaggi cercati sono quelli segnalati dal pre-screening: con PRESCREEN_MODE='off' la
+libreria è disattivata e le clausole non vengono né firmate né indicizzate.
+"""
+from django.conf import settings
+from django.db.models import Count
+
+from .minhash import band_keys, signature, similarity
+from .models import ClauseBucket, MetricCounter, RiskClause
+
+# Candidati confrontati per ricerca: limita il costo per le clausole standard ripetute in
+# migliaia di contratti
+MAX_CANDIDATES = 20
+
+COUNTER_LOOKUPS = 'clause_library.lookups'
+COUNTER_HITS = 'clause_library.hits'
+
+
+def library_enabled():
+    """La libreria serve solo con il pre-screening attivo: senza ricerche firmare e indicizzare
+    le clausole sarebbe solo un costo di scrittura"""
+    return settings.CLAUSE_LIBRARY_ENABLED and settings.PRESCREEN_MODE != 'off'
+
+def sign_clauses(clauses):
+    """Calcola la firma delle clausole valutate dall'AI che non ne hanno una"""
+    for clause in clauses:
+        if clause.source == 'ai' and clause.signature is None:
+            clause.signature = signature(clause.clause_text)
+
+def index_clauses(clauses, batch_size=2000):
+    """Registra nella tabella LSH le clausole salvate (con chiave primaria) che hanno una firma"""
+    ClauseBucket.objects.bulk_create(
+        [
+            ClauseBucket(key=key, risk_clause_id=clause.pk)
+            for clause in clauses if clause.signature
+            for key in band_keys(bytes(clause.signature))
+        ],
+        batch_size=batch_size,
+    )
+
+def find_similar(text, exclude_contract_id=None, threshold=None):
+    """Clausola della libreria più simile al testo e similarità stimata, o (None, 0.0)"""
+    threshold = settings.CLAUSE_LIBRARY_THRESHOLD if threshold is None else threshold
+    packed = signature(text)
+    if packed is None:
+        return None, 0.0
+
+    rows = ClauseBucket.objects.filter(key__in=band_keys(packed))
+    if exclude_contract_id is not None:
+        rows = rows.exclude(risk_clause__in=RiskClause.objects.filter(contract_id=exclude_contract_id).values('pk'))
+    # I candidati che condividono più bande sono i più simili: le bande vengono contate nel
+    # database, a parità di bande prevalgono le clausole valutate più di recente
+    shared = rows.values('risk_clause_id').annotate(bands=Count('id')).order_by('-bands', '-risk_clause_id')
+    candidates = [row['risk_clause_id'] for row in shared[:MAX_CANDIDATES]]
+    if not candidates:
+        return None, 0.0
+
+    clauses = RiskClause.objects.filter(pk__in=candidates).order_by('-pk').only(
+        'id', 'contract_id', 'clause_text', 'risk_description', 'severity', 'recommendation', 'signature',
+    )
+
+    best, best_score = None, 0.0
+    for clause in clauses:
+        score = similarity(packed, bytes(clause.signature))
+        if score >= threshold and score > best_score:
+            best, best_score = clause, score
+    return best, best_score
+
+def reuse_assessments(contract, screening):
+    """Clausole della libreria per i passaggi segnalati dal pre-screening.
+
+    I passaggi riconosciuti vengono tolti dal risultato del pre-screening: non entrano
+    nell'estratto inviato al modello né tra i candidati del pre-screening.
+    """
+    reused = []
+    remaining = []
+    for finding in screening.findings:
+        match, _ = find_similar(finding['clause'], exclude_contract_id=contract.pk)
+        if match is None:
+            remaining.append(finding)
+            continue
+        reused.append(RiskClause(
+            contract=contract,
+            clause_text=finding['clause'],
+            risk_description=match.risk_description,
+            severity=match.severity,
+            recommendation=match.recommendation,
+            source='library',
+            start_offset=finding['start'],
+            end_offset=finding['end'],
+        ))
+
+    if screening.findings:
+        MetricCounter.increment(COUNTER_LOOKUPS, len(screening.findings))
+    if reused:
+        MetricCounter.increment(COUNTER_HITS, len(reused))
+    screening.findings = remaining
+    screening.reused = len(reused)
+    return reused
+
+def library_stats():
+    """Dimensione della libreria e quota di passaggi riconosciuti"""
+    lookups = MetricCounter.get_value(COUNTER_LOOKUPS)
+    hits = MetricCounter.get_value(COUNTER_HITS)
+    return {
+        'indexed_clauses': RiskClause.objects.filter(source='ai', signature__isnull=False).count(),
+        'buckets': ClauseBucket.objects.count(),
+        'lookups': lookups,
+        'hits': hits,
+        'hit_ratio': hits / lookups if lookups else 0.0,
+    }
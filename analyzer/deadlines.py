@@ -0,0 +1,150 @@
+"""Estrazione locale di date e termini dal testo dei contratti.
+
+Due scansioni del testo (date e unità di tempo) riconoscono:
+- date assolute ("31/12/2025", "31-12-25", "1° gennaio 2026");
+- termini e preavvisi ("entro 30 giorni", "preavviso di 60 (sessanta) giorni");
+- termini relativi alla firma ("tre mesi dalla firma"), convertiti in data a partire dalla
+  data di riferimento (la data di caricamento, in assenza della data di sottoscrizione).
+Le corrispondenze nella stessa frase formano una sola scadenza.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+
+from .utils import passage_bounds
+
+MONTHS = {
+    'gennaio': 1, 'febbraio': 2, 'marzo': 3, 'aprile': 4, 'maggio': 5, 'giugno': 6,
+    'luglio': 7, 'agosto': 8, 'settembre': 9, 'ottobre': 10, 'novembre': 11, 'dicembre': 12,
+}
+
+NUMBER_WORDS = {
+    'un': 1, 'uno': 1, 'una': 1, 'due': 2, 'tre': 3, 'quattro': 4, 'cinque': 5, 'sei': 6,
+    'sette': 7, 'otto': 8, 'nove': 9, 'dieci': 10, 'undici': 11, 'dodici': 12, 'quindici': 15,
+    'venti': 20, 'trenta': 30, 'quarantacinque': 45, 'sessanta': 60, 'novanta': 90,
+    'centoventi': 120, 'centottanta': 180, 'trecentosessantacinque': 365,
+}
+
+UNIT_DAYS = {'giorn': 1, 'settiman': 7, 'mes': 30, 'ann': 365}
+
+_NUMBER = '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True))
+_MONTH = '|'.join(MONTHS)
+
+# Data numerica (31/12/2025, 31-12-25, 31.12.2025) o in lettere (31 dicembre 2025, 1° gennaio 2026).
+# Con il punto l'anno deve avere quattro cifre: "5.2.30" è la numerazione di una clausola
+DATE_RE = re.compile(
+    r'(?<![\d.])(?P<day>[0-3]?\d)(?:'
+    r'(?P<sep>[/-])(?P<month>[01]?\d)(?P=sep)(?P<year>\d{4}|\d{2})\b'
+    r'|\.(?P<dmonth>[01]?\d)\.(?P<dyear>\d{4})\b'
+    r'|(?:°|º)?\s+(?P<tmonth>' + _MONTH + r')\s+(?P<tyear>\d{4})\b)',
+    re.IGNORECASE,
+)
+
+# Riferimenti a parti del contratto che precedono numeri simili a date (art. 12.3.2025)
+REFERENCE_RE = re.compile(r'\b(?:art|artt|articol[oi]|clausol[ae]|punt[oi]|comm[ai]|paragraf[oi]|par)\.?\s*$', re.IGNORECASE)
+REFERENCE_WINDOW = 15
+
+# Unità di tempo: ogni termine ne contiene una, il resto viene cercato attorno
+UNIT_RE = re.compile(r'(?:giorn[oi]|settiman[ae]|mes[ei]|ann[oi])\b', re.IGNORECASE)
+
+# Termine: entro / preavviso di / termine di ... N giorni|settimane|mesi|anni [dalla firma]
+TERM_RE = re.compile(
+    r'(?:\b(?P<kind>entro|preavviso(?:\s+scritto)?\s+di|termine\s+di|decorsi|non\s+oltre|nei)\s+'
+    r'(?:il\s+termine\s+di\s+)?(?:almeno\s+)?)?'
+    r'\b(?P<amount>\d{1,3}|' + _NUMBER + r')(?:\s*\([a-z]+\))?\s+'
+    r'(?P<unit>giorn[oi]|settiman[ae]|mes[ei]|ann[oi])\b'
+    r'(?P<anchor>\s+(?:lavorativi\s+)?(?:dalla|dal|dalle)\s+(?:data\s+(?:di|della)\s+)?'
+    r'(?:firma|sottoscrizione|stipula|conclusione|presente))?',
+    re.IGNORECASE,
+)
+TERM_WINDOW = 80
+
+def _add_months(start, months):
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+def _parse_date(day, month, year):
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+def _parse_term(match, reference_date):
+    """(giorni, data) di un termine; la data solo se il termine decorre dalla firma"""
+    amount = match.group('amount').lower()
+    amount = int(amount) if amount.isdigit() else NUMBER_WORDS[amount]
+    unit = match.group('unit').lower()[:-1]
+    days = amount * UNIT_DAYS[unit]
+
+    term_date = None
+    if match.group('anchor') and reference_date is not None:
+        if unit == 'mes':
+            term_date = _add_months(reference_date, amount)
+        elif unit == 'ann':
+            term_date = _add_months(reference_date, amount * 12)
+        else:
+            term_date = reference_date + timedelta(days=days)
+    return days, term_date
+
+def _iter_matches(text, reference_date):
+    """(inizio, fine, data, giorni) per ogni data o termine nel testo"""
+    for match in DATE_RE.finditer(text):
+        if match.group('tmonth') is None and REFERENCE_RE.search(text, max(match.start() - REFERENCE_WINDOW, 0), match.start()):
+            continue
+        if match.group('month'):
+            found_date = _parse_date(match.group('day'), match.group('month'), match.group('year'))
+        elif match.group('dmonth'):
+            found_date = _parse_date(match.group('day'), match.group('dmonth'), match.group('dyear'))
+        else:
+            found_date = _parse_date(match.group('day'), MONTHS[match.group('tmonth').lower()], match.group('tyear'))
+        if found_date is not None:
+            yield match.start(), match.end(), found_date, None
+
+    # Le espressioni regolari con prefissi opzionali sono lente sull'intero documento:
+    # si cercano le unità di tempo e il termine completo solo nella finestra attorno
+    for unit in UNIT_RE.finditer(text):
+        window_start = max(unit.start() - TERM_WINDOW, 0)
+        for match in TERM_RE.finditer(text, window_start, unit.end() + TERM_WINDOW):
+            if match.end('unit') != unit.end():
+                continue
+            # Durate senza "entro", "preavviso" o riferimento alla firma non sono scadenze
+            if match.group('kind') or match.group('anchor'):
+                days, found_date = _parse_term(match, reference_date)
+                yield match.start(), match.end(), found_date, days
+            break
+
+def extract_deadlines(text, reference_date=None):
+    """Scadenze trovate nel testo: [{'description', 'date', 'days_notice', 'start', 'end'}]"""
+    deadlines = {}
+    for match_start, match_end, found_date, days in sorted(_iter_matches(text, reference_date), key=lambda item: item[0]):
+        start, end = passage_bounds(text, match_start, match_end, max_chars=500)
+        deadline = deadlines.setdefault(start, {
+            'description': text[start:end],
+            'date': None,
+            'days_notice': None,
+            'start': start,
+            'end': end,
+        })
+        # Nella stessa frase vale la prima data e il primo termine trovati
+        if deadline['date'] is None:
+            deadline['date'] = found_date
+        if deadline['days_notice'] is None:
+            deadline['days_notice'] = days
+
+    # Le frasi ripetute (intestazioni, testo duplicato tra le pagine) producono una sola scadenza
+    unique = {}
+    for deadline in sorted(deadlines.values(), key=lambda deadline: deadline['start']):
+        unique.setdefault((deadline['description'], deadline['date'], deadline['days_notice']), deadline)
+    return list(unique.values())
+
+def parse_deadline_text(text, reference_date=None):
+    """Data e giorni di preavviso di una scadenza descritta a parole (es. dall'analisi AI)"""
+    found_date = days = None
+    for deadline in extract_deadlines(text, reference_date):
+        found_date = found_date or deadline['date']
+        days = days if days is not None else deadline['days_notice']
+    return found_date, days
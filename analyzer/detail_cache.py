@@ -0,0 +1,64 @@
+"""Cache della pagina di dettaglio dei contratti analizzati.
+
+Il contenuto della pagina (dati del contratto, clausole, scadenze) cambia solo quando
+vengono scritti i risultati dell'analisi: la chiave della cache e l'ETag includono
+Contract.analysis_version, incrementata da save_analysis_results, dagli errori definitivi,
+da extract_deadlines e dalle modifiche nell'admin. Le versioni superate non vengono
+eliminate ma scadono dopo CONTRACT_DETAIL_CACHE_TIMEOUT.
+
+I contatori di hit/miss/304 sono nella cache di Django e non nel database, per non
+aggiungere una scrittura a ogni visualizzazione; con la cache locale sono per processo.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.safestring import mark_safe
+
+from .models import Contract
+
+# Da incrementare quando cambia il template del contenuto, per non servire pagine con il markup precedente
+TEMPLATE_VERSION = 1
+
+CONTENT_KEY = 'analyzer:contract_detail:{pk}:{version}:{template}'
+COUNTER_KEY = 'analyzer:contract_detail_cache:{result}'
+RESULTS = ('hit', 'miss', 'not_modified')
+
+def record(result):
+    """Incrementa il contatore del risultato (hit, miss, not_modified)"""
+    key = COUNTER_KEY.format(result=result)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Contatore assente o scaduto; se un altro processo lo ha appena creato si incrementa quello
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+def detail_cache_stats():
+    """Contatori della cache del dettaglio e quota di richieste servite senza rendering"""
+    counts = cache.get_many([COUNTER_KEY.format(result=result) for result in RESULTS])
+    stats = {result: counts.get(COUNTER_KEY.format(result=result), 0) for result in RESULTS}
+    total = sum(stats.values())
+    stats['hit_ratio'] = (stats['hit'] + stats['not_modified']) / total if total else 0.0
+    return stats
+
+def detail_etag(contract):
+    """ETag della pagina di dettaglio di un contratto analizzato. Non si usa Last-Modified:
+    analysis_date non cambia con le modifiche nell'admin, che incrementano solo la versione"""
+    return f'"{contract.pk}-{contract.analysis_version}-{TEMPLATE_VERSION}"'
+
+def cached_detail_content(contract, render):
+    """Contenuto della pagina dalla cache, o prodotto da render() e salvato"""
+    key = CONTENT_KEY.format(pk=contract.pk, version=contract.analysis_version, template=TEMPLATE_VERSION)
+    content = cache.get(key)
+    if content is not None:
+        record('hit')
+        return mark_safe(content)
+
+    record('miss')
+    content = render()
+    cache.set(key, str(content), settings.CONTRACT_DETAIL_CACHE_TIMEOUT)
+    return content
+
+def invalidate_contract_details(contract_ids):
+    """Nuova versione della pagina di dettaglio dei contratti indicati"""
+    Contract.objects.filter(pk__in=contract_ids).update(analysis_version=F('analysis_version') + 1)
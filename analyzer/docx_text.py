@@ -0,0 +1,159 @@
+"""Estrazione del testo dai file DOCX in streaming, direttamente dall'archivio ZIP.
+
+Le parti XML del documento vengono lette con iterparse ed ogni blocco (paragrafo o
+tabella) viene scartato non appena il suo testo è stato prodotto: la memoria occupata
+dipende dal blocco più grande, non dalle dimensioni del documento. Oltre al corpo
+vengono estratti:
+- le tabelle, una riga per riga di tabella con le celle separate da " | ";
+- intestazioni e piè di pagina (una sola volta, anche se ripetuti per sezione);
+- note a piè di pagina e note di chiusura, dopo il corpo del documento;
+- le caselle di testo, ignorando la rappresentazione alternativa (mc:Fallback) che ne duplica il testo.
+"""
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+PARAGRAPH = W_NS + 'p'
+TABLE = W_NS + 'tbl'
+ROW = W_NS + 'tr'
+CELL = W_NS + 'tc'
+TEXT = W_NS + 't'
+BREAK = W_NS + 'br'
+# Elementi di una riga che python-docx rende come caratteri nel testo del paragrafo
+RUN_CHARS = {W_NS + 'tab': '\t', W_NS + 'cr': '\n', W_NS + 'noBreakHyphen': '-'}
+
+CELL_SEPARATOR = ' | '
+
+# Tipi di relazione delle parti lette oltre al corpo
+HEADER_PARTS = ('header',)
+NOTE_PARTS = ('footnotes', 'endnotes')
+FOOTER_PARTS = ('footer',)
+
+
+def _relationships(archive, part):
+    """{tipo: [parte di destinazione]} dalle relazioni di una parte del pacchetto"""
+    directory, name = posixpath.split(part)
+    rels_name = posixpath.join(directory, '_rels', f'{name}.rels')
+    if rels_name not in archive.namelist():
+        return {}
+
+    targets = {}
+    with archive.open(rels_name) as f:
+        for rel in ET.parse(f).getroot().iter(REL_NS + 'Relationship'):
+            if rel.get('TargetMode') == 'External':
+                continue
+            rel_type = rel.get('Type', '').rsplit('/', 1)[-1]
+            target = rel.get('Target', '')
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(directory, target))
+            targets.setdefault(rel_type, []).append(target)
+    return targets
+
+def _main_document_part(archive):
+    documents = _relationships(archive, '').get('officeDocument')
+    return documents[0] if documents else 'word/document.xml'
+
+def iter_part_paragraphs(stream):
+    """Paragrafi di una parte XML (corpo, intestazione, note) in ordine di lettura.
+
+    I paragrafi delle tabelle formano il testo delle celle; ogni riga di tabella viene
+    restituita come un unico paragrafo. Le tabelle annidate diventano testo della cella.
+    """
+    ancestors = []
+    paragraphs = []    # testo dei paragrafi aperti (più di uno nelle caselle di testo)
+    rows = []          # per ogni tabella aperta: celle della riga corrente
+    cells = []         # per ogni cella aperta: paragrafi della cella
+    fallback_depth = 0
+
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            ancestors.append(elem)
+            if tag == MC_FALLBACK:
+                fallback_depth += 1
+            elif fallback_depth:
+                continue
+            elif tag == PARAGRAPH:
+                paragraphs.append([])
+            elif tag == TABLE:
+                rows.append([])
+            elif tag == CELL:
+                cells.append([])
+            continue
+
+        ancestors.pop()
+        if tag == MC_FALLBACK:
+            fallback_depth -= 1
+            elem.clear()
+            continue
+        if fallback_depth:
+            continue
+
+        block = None
+        if tag == TEXT:
+            if paragraphs and elem.text:
+                paragraphs[-1].append(elem.text)
+        elif tag in RUN_CHARS:
+            if paragraphs:
+                paragraphs[-1].append(RUN_CHARS[tag])
+        elif tag == BREAK:
+            # Le interruzioni di pagina e di colonna non interrompono il testo del paragrafo
+            if paragraphs and elem.get(W_NS + 'type') in (None, 'textWrapping'):
+                paragraphs[-1].append('\n')
+        elif tag == PARAGRAPH:
+            block = ''.join(paragraphs.pop())
+        elif tag == CELL:
+            cell_text = ' '.join(text for text in cells.pop() if text)
+            if rows:
+                rows[-1].append(cell_text)
+        elif tag == ROW:
+            if rows:
+                block = CELL_SEPARATOR.join(rows[-1]) if any(rows[-1]) else ''
+                rows[-1] = []
+        elif tag == TABLE:
+            rows.pop()
+        else:
+            continue
+
+        if block is None:
+            continue
+        if cells:
+            # Paragrafo di una cella o riga di una tabella annidata: fa parte del testo della cella
+            cells[-1].append(block)
+            continue
+        # I paragrafi delle caselle di testo precedono quello che le contiene
+        yield block
+
+        # Blocco di primo livello completato: gli elementi già letti non servono più
+        if not paragraphs and ancestors:
+            ancestors[-1].clear()
+
+def iter_docx_paragraphs(file_path):
+    """Paragrafi del DOCX: intestazioni, corpo (con le tabelle), note e piè di pagina"""
+    with zipfile.ZipFile(file_path) as archive:
+        document_part = _main_document_part(archive)
+        related = _relationships(archive, document_part)
+        names = set(archive.namelist())
+
+        def iter_parts(rel_types, unique):
+            seen = set()
+            for rel_type in rel_types:
+                for part in related.get(rel_type, []):
+                    if part not in names:
+                        continue
+                    with archive.open(part) as stream:
+                        for paragraph in iter_part_paragraphs(stream):
+                            # Intestazioni, note e piè di pagina: senza righe vuote né ripetizioni
+                            if not paragraph.strip() or (unique and paragraph in seen):
+                                continue
+                            seen.add(paragraph)
+                            yield paragraph
+
+        yield from iter_parts(HEADER_PARTS, unique=True)
+        with archive.open(document_part) as stream:
+            yield from iter_part_paragraphs(stream)
+        yield from iter_parts(NOTE_PARTS, unique=False)
+        yield from iter_parts(FOOTER_PARTS, unique=True)
@@ -0,0 +1,155 @@
+"""Server locale compatibile con l'endpoint Chat Completions di OpenAI, per test e benchmark.
+
+Risponde con un'analisi JSON plausibile costruita dal testo del prompt, con latenza
+e tasso di errori (429/500) configurabili per verificare timeout, retry e rate limiting.
+Con "stream": true la risposta viene inviata come server-sent events, a frammenti.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Parole chiave che il server "riconosce" come clausole rischiose
+RISK_PATTERNS = [
+    (re.compile(r'[^.]*\bpenal[ei]\b[^.]*\.', re.IGNORECASE), 'high', "Penale potenzialmente eccessiva"),
+    (re.compile(r'[^.]*\brecesso\b[^.]*\.', re.IGNORECASE), 'medium', "Condizioni di recesso sbilanciate"),
+    (re.compile(r'[^.]*\bresponsabilit[àa]\b[^.]*\.', re.IGNORECASE), 'medium', "Limitazione di responsabilità"),
+]
+DEADLINE_RE = re.compile(r'entro\s+\d+\s+giorni[^.]*', re.IGNORECASE)
+STREAM_CHUNK_CHARS = 40
+
+
+def build_analysis(prompt):
+    """Costruisce una risposta nel formato richiesto dal prompt di analisi"""
+    text = prompt.split('TESTO DEL CONTRATTO:', 1)[-1]
+    clauses = []
+    for pattern, severity, risk in RISK_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            clauses.append({
+                'clause': match.group(0).strip()[:300],
+                'risk': risk,
+                'severity': severity,
+                'recommendation': "Rinegoziare la clausola",
+            })
+
+    return {
+        'contract_type': "Contratto",
+        'parties': "Parte A e Parte B",
+        'duration': "12 mesi",
+        'key_obligations': "Obblighi reciproci delle parti",
+        'risk_level': 'high' if any(c['severity'] == 'high' for c in clauses) else 'low',
+        'risk_clauses': clauses,
+        'deadlines': [
+            {'description': match.group(0).strip()[:200], 'timeframe': match.group(0).strip()[:50]}
+            for match in DEADLINE_RE.finditer(text)
+        ][:5],
+        'summary': "Analisi generata dal server di test",
+    }
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model, content, usage=None):
+        """Invia il contenuto a frammenti come server-sent events, chiudendo la connessione al termine"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            event = {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion.chunk',
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': content[start:start + STREAM_CHUNK_CHARS]}, 'finish_reason': None}],
+            }
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+        if usage is not None:
+            event = {'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'model': model, 'choices': [], 'usage': usage}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        server = self.server
+        time.sleep(server.latency)
+
+        if random.random() < server.error_rate:
+            status = random.choice([429, 500])
+            self._send_json(status, {'error': {'message': f'Errore simulato {status}'}})
+            return
+
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        content = json.dumps(build_analysis(prompt), ensure_ascii=False)
+        prompt_tokens = sum(len(m.get('content', '')) for m in request.get('messages', [])) // 4
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': prompt_tokens + len(content) // 4,
+        }
+
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage')
+            self._send_stream(request.get('model', 'fake'), content, usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        })
+
+
+def make_fake_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, chunk_delay=0.0):
+    """Crea il server (porta 0 = porta libera scelta dal sistema)"""
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.chunk_delay = chunk_delay
+    return server
+
+
+def api_base_for(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}/v1'
+
+
+def start_fake_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, chunk_delay=0.0):
+    """Avvia il server in un thread e restituisce (server, api_base)"""
+    server = make_fake_server(host, port, latency, error_rate, chunk_delay)
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return server, api_base_for(server)
@@ -0,0 +1,120 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import record_job_error
+from .models import AnalysisJob
+from .tasks import (
+    run_contract_analysis, record_analysis_failure,
+    run_text_extraction, record_extraction_failure,
+)
+
+logger = logging.getLogger(__name__)
+
+def enqueue_extraction(contract):
+    """Accoda l'estrazione del testo; al termine il worker accoda l'analisi AI"""
+    job = AnalysisJob.objects.filter(contract=contract, stage='extract', status='queued').first()
+    if job is None:
+        job = AnalysisJob.objects.create(
+            contract=contract,
+            stage='extract',
+            max_attempts=settings.ANALYSIS_JOB_MAX_ATTEMPTS,
+        )
+    return job
+
+def enqueue_analysis(contract, use_cache=True):
+    """Accoda l'analisi AI del contratto, riutilizzando un job già in coda"""
+    job = AnalysisJob.objects.filter(contract=contract, stage='analyze', status='queued').first()
+    if job is None:
+        job = AnalysisJob.objects.create(
+            contract=contract,
+            stage='analyze',
+            max_attempts=settings.ANALYSIS_JOB_MAX_ATTEMPTS,
+            use_cache=use_cache,
+        )
+    elif job.use_cache and not use_cache:
+        AnalysisJob.objects.filter(pk=job.pk).update(use_cache=False)
+        job.use_cache = False
+    return job
+
+def claim_next_job(worker_name):
+    """Prenota il prossimo job eseguibile; restituisce None se la coda è vuota"""
+    now = timezone.now()
+    candidates = list(
+        AnalysisJob.objects
+        .filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:10]
+    )
+
+    for job_id in candidates:
+        # L'UPDATE condizionale è atomico sia su SQLite che su Postgres:
+        # se un altro worker ha già preso il job non viene aggiornata nessuna riga
+        claimed = AnalysisJob.objects.filter(pk=job_id, status='queued').update(
+            status='running',
+            worker=worker_name,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return AnalysisJob.objects.select_related('contract').get(pk=job_id)
+
+    return None
+
+def record_failure(stage, contract_id, error):
+    """Registra sul contratto il fallimento definitivo della fase indicata"""
+    if stage == 'extract':
+        record_extraction_failure(contract_id, error)
+    else:
+        record_analysis_failure(contract_id, error)
+
+def retry_delay(attempts):
+    """Backoff esponenziale (in secondi) prima del tentativo successivo"""
+    delay = settings.ANALYSIS_JOB_RETRY_DELAY * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.ANALYSIS_JOB_MAX_RETRY_DELAY)
+
+def run_job(job):
+    """Esegue un job prenotato e ne aggiorna lo stato"""
+    jobs = AnalysisJob.objects.filter(pk=job.pk)
+
+    try:
+        if job.stage == 'extract':
+            contract = run_text_extraction(job.contract_id)
+            enqueue_analysis(contract)
+        else:
+            run_contract_analysis(job.contract_id, use_cache=job.use_cache)
+    except Exception as e:
+        now = timezone.now()
+        record_job_error(job.stage)
+        if job.attempts >= job.max_attempts:
+            logger.error(f"Job {job.pk} ({job.stage}) del contratto {job.contract_id} fallito definitivamente: {str(e)}")
+            jobs.update(status='failed', finished_at=now, last_error=str(e))
+            record_failure(job.stage, job.contract_id, e)
+        else:
+            delay = retry_delay(job.attempts)
+            logger.warning(f"Job {job.pk}: tentativo {job.attempts} fallito, nuovo tentativo tra {delay}s: {str(e)}")
+            jobs.update(status='queued', run_after=now + timedelta(seconds=delay), last_error=str(e))
+        return False
+
+    jobs.update(status='done', finished_at=timezone.now(), last_error='')
+    return True
+
+def requeue_stale_jobs():
+    """Rimette in coda i job rimasti 'running' oltre il timeout (es. worker terminato)"""
+    cutoff = timezone.now() - timedelta(seconds=settings.ANALYSIS_JOB_TIMEOUT)
+    stale = AnalysisJob.objects.filter(status='running', started_at__lt=cutoff)
+
+    exhausted = list(stale.filter(attempts__gte=F('max_attempts')).values_list('id', 'stage', 'contract_id'))
+    for job_id, stage, contract_id in exhausted:
+        AnalysisJob.objects.filter(pk=job_id, status='running').update(
+            status='failed', finished_at=timezone.now(), last_error='Timeout del worker'
+        )
+        record_failure(stage, contract_id, 'Timeout del worker')
+
+    requeued = stale.update(status='queued', run_after=timezone.now(), last_error='Timeout del worker')
+
+    if exhausted or requeued:
+        logger.warning(f"Job bloccati: {requeued} rimessi in coda, {len(exhausted)} falliti")
+    return requeued
@@ -0,0 +1,24 @@
+import json
+from django.core.management.base import BaseCommand
+
+from analyzer.response_parser import parse_stats
+
+
+class Command(BaseCommand):
+    help = "Statistiche di interpretazione delle risposte del modello AI"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help="Stampa le statistiche in formato JSON")
+
+    def handle(self, *args, **options):
+        stats = parse_stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+
+        self.stdout.write(f"Risposte del modello:  {stats['responses']}")
+        self.stdout.write(f"JSON valido:           {stats['parsed']}")
+        self.stdout.write(f"Riparate:              {stats['repaired']}")
+        self.stdout.write(f"Non interpretabili:    {stats['failed']}")
+        self.stdout.write(f"Tasso di successo:     {stats['success_ratio']:.1%}")
@@ -0,0 +1,29 @@
+import json
+from django.core.management.base import BaseCommand
+
+from analyzer.services import AnalysisCache
+
+
+class Command(BaseCommand):
+    help = "Statistiche e manutenzione della cache delle analisi AI"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict', action='store_true', help="Applica la politica di eviction")
+        parser.add_argument('--clear', action='store_true', help="Svuota completamente la cache")
+        parser.add_argument('--json', action='store_true', help="Stampa le statistiche in formato JSON")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f"Voci eliminate: {AnalysisCache.clear()}")
+        elif options['evict']:
+            self.stdout.write(f"Voci rimosse: {AnalysisCache.evict()}")
+
+        stats = AnalysisCache.stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+
+        self.stdout.write(f"Voci in cache:      {stats['entries']} ({stats['size_bytes'] / 1024:.1f} KB)")
+        self.stdout.write(f"Hit / miss:         {stats['hits']} / {stats['misses']} (hit ratio {stats['hit_ratio']:.1%})")
+        self.stdout.write(f"Tempo risparmiato:  {stats['saved_seconds']} s di chiamate AI")
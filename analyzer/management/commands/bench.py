@@ -0,0 +1,81 @@
+import json
+import platform
+from django.core.management.base import BaseCommand, CommandError
+
+from django.utils import timezone
+
+from analyzer.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Esegue i benchmark della pipeline di analisi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', nargs='?', help="Scenario da eseguire (vuoto = elenco scenari)")
+        parser.add_argument('--runs', type=int, help="Numero di ripetizioni")
+        parser.add_argument('--size', type=int, help="Dimensione dell'input (dipende dallo scenario)")
+        parser.add_argument('--json', action='store_true', help="Stampa i risultati in formato JSON")
+        parser.add_argument('--output', help="Salva i risultati in un file JSON, per confrontarli con le esecuzioni successive")
+        parser.add_argument('--compare', help="File JSON di un'esecuzione precedente: stampa le variazioni")
+
+    def handle(self, *args, **options):
+        name = options['scenario']
+        if not name:
+            for scenario_name, func in sorted(SCENARIOS.items()):
+                self.stdout.write(f"{scenario_name:<15} {(func.__doc__ or '').strip()}")
+            return
+
+        if name not in SCENARIOS:
+            raise CommandError(f"Scenario sconosciuto: {name} (disponibili: {', '.join(sorted(SCENARIOS))})")
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Impossibile leggere {options['compare']}: {e}")
+            if baseline.get('scenario') != name:
+                raise CommandError(f"Il file {options['compare']} contiene lo scenario {baseline.get('scenario')}, non {name}")
+
+        params = {key: options[key] for key in ('runs', 'size') if options[key] is not None}
+        results = SCENARIOS[name](**params)
+        report = {
+            'scenario': name,
+            'params': params,
+            'recorded_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'results': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif baseline is not None:
+            self.print_comparison(results, baseline.get('results', {}))
+        else:
+            self.print_results(results)
+
+    def print_results(self, results, indent=0):
+        for key, value in results.items():
+            if isinstance(value, dict):
+                self.stdout.write(f"{' ' * indent}{key}:")
+                self.print_results(value, indent + 2)
+            else:
+                self.stdout.write(f"{' ' * indent}{key}: {value}")
+
+    def print_comparison(self, results, baseline, indent=0):
+        """Valori attuali affiancati a quelli dell'esecuzione precedente, con la variazione percentuale"""
+        for key, value in results.items():
+            previous = baseline.get(key) if isinstance(baseline, dict) else None
+            if isinstance(value, dict):
+                self.stdout.write(f"{' ' * indent}{key}:")
+                self.print_comparison(value, previous or {}, indent + 2)
+            elif isinstance(value, (int, float)) and isinstance(previous, (int, float)) and not isinstance(value, bool):
+                change = f"{(value - previous) / previous * 100:+.1f}%" if previous else "n/d"
+                self.stdout.write(f"{' ' * indent}{key}: {value} (prima {previous}, {change})")
+            else:
+                self.stdout.write(f"{' ' * indent}{key}: {value}")
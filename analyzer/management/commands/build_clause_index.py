@@ -0,0 +1,75 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analyzer.clause_library import index_clauses, library_stats
+from analyzer.minhash import signature
+from analyzer.models import ClauseBucket, RiskClause
+
+
+class Command(BaseCommand):
+    help = "Firma e indicizza le clausole valutate dall'AI nella libreria delle clausole (MinHash/LSH)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Clausole per transazione")
+        parser.add_argument(
+            '--workers', type=int, default=settings.EXTRACTION_WORKERS,
+            help="Processi paralleli per il calcolo delle firme (1 = nel processo corrente)"
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Ricalcola firme e bucket di tutte le clausole (es. dopo una modifica dei parametri MinHash)"
+        )
+
+    def handle(self, *args, **options):
+        clauses = RiskClause.objects.filter(source='ai').only('id', 'clause_text').order_by('id')
+        if options['rebuild']:
+            ClauseBucket.objects.all().delete()
+        else:
+            clauses = clauses.filter(signature__isnull=True)
+
+        self.indexed = 0
+        started = time.monotonic()
+        executor = None
+        if options['workers'] > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+
+        try:
+            batch = []
+            for clause in clauses.iterator(chunk_size=options['batch_size']):
+                batch.append(clause)
+                if len(batch) >= options['batch_size']:
+                    self.index_batch(batch, executor)
+                    batch = []
+            if batch:
+                self.index_batch(batch, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        stats = library_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.indexed} clausole indicizzate in {elapsed:.1f}s ({self.indexed / elapsed:.0f} clausole/s); "
+            f"libreria: {stats['indexed_clauses']} clausole, {stats['buckets']} bucket"
+        ))
+
+    def index_batch(self, clauses, executor):
+        # I processi del pool importano solo analyzer.minhash (nessun modello Django)
+        texts = [clause.clause_text for clause in clauses]
+        signatures = executor.map(signature, texts, chunksize=64) if executor else map(signature, texts)
+        for clause, packed in zip(clauses, signatures):
+            clause.signature = packed
+
+        with transaction.atomic():
+            RiskClause.objects.bulk_update(clauses, ['signature'], batch_size=500)
+            # Le clausole già indicizzate (ricostruzione parziale interrotta) non vengono duplicate
+            ClauseBucket.objects.filter(risk_clause__in=clauses).delete()
+            index_clauses(clauses)
+        self.indexed += len(clauses)
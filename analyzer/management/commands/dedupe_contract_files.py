@@ -0,0 +1,70 @@
+import os
+from django.core.management.base import BaseCommand
+
+from analyzer.models import Contract
+from analyzer.storage import content_hash, written_recently
+
+
+class Command(BaseCommand):
+    help = "Sposta i file dei contratti caricati prima dell'archiviazione per contenuto, unendo i duplicati"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Mostra solo quanti file verrebbero spostati")
+        parser.add_argument(
+            '--remove-orphans', action='store_true',
+            help="Rimuove i file archiviati non più usati da alcun contratto (es. dopo eliminazioni in blocco), "
+                 "esclusi quelli scritti negli ultimi CONTRACT_FILE_GRACE_PERIOD secondi"
+        )
+
+    def handle(self, *args, **options):
+        storage = Contract._meta.get_field('file').storage
+        names = (
+            Contract.objects.exclude(file='').order_by('file')
+            .values_list('file', flat=True).distinct()
+        )
+        legacy = [name for name in names.iterator() if content_hash(name) is None]
+        if options['dry_run']:
+            self.stdout.write(f"File da spostare: {len(legacy)}")
+            return
+
+        moved = missing = freed = 0
+        for name in legacy:
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f"File mancante: {name}")
+                continue
+
+            size = storage.size(name)
+            with storage.open(name, 'rb') as f:
+                stored_name = storage.save(name, f)
+            # Contenuto già archiviato per un altro contratto: il vecchio file era un duplicato
+            if Contract.objects.filter(file=stored_name).exists():
+                freed += size
+
+            contracts = Contract.objects.filter(file=name)
+            contracts.filter(original_filename='').update(original_filename=os.path.basename(name)[:255])
+            contracts.update(file=stored_name, file_hash=content_hash(stored_name))
+            Contract.release_file(name)
+            moved += 1
+
+        self.stdout.write(f"File spostati: {moved}, mancanti: {missing}, spazio liberato dai duplicati: {freed / 1024:.1f} KB")
+
+        if options['remove_orphans']:
+            self.remove_orphans(storage)
+
+    def remove_orphans(self, storage):
+        upload_to = Contract._meta.get_field('file').upload_to.rstrip('/')
+        removed = freed = 0
+        prefixes, _ = storage.listdir(upload_to)
+        for prefix in prefixes:
+            directory = f"{upload_to}/{prefix}"
+            _, filenames = storage.listdir(directory)
+            names = [f"{directory}/{filename}" for filename in filenames if content_hash(f"{directory}/{filename}")]
+            used = set(Contract.objects.filter(file__in=names).values_list('file', flat=True))
+            for name in names:
+                # I file appena scritti possono appartenere a un caricamento non ancora salvato
+                if name not in used and not written_recently(storage, name):
+                    freed += storage.size(name)
+                    storage.delete(name)
+                    removed += 1
+        self.stdout.write(f"File orfani rimossi: {removed} ({freed / 1024:.1f} KB)")
@@ -0,0 +1,99 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analyzer.deadlines import extract_deadlines, parse_deadline_text
+from analyzer.detail_cache import invalidate_contract_details
+from analyzer.models import Contract, Deadline
+from analyzer.tasks import deadline_reference_date
+
+
+class Command(BaseCommand):
+    help = "Estrae date e termini dal testo di tutti i contratti e completa le scadenze dell'analisi AI"
+
+    def add_arguments(self, parser):
+        parser.add_argument('contract_ids', nargs='*', type=int, help="Contratti da elaborare (vuoto = tutti)")
+        parser.add_argument('--batch-size', type=int, default=200, help="Contratti per transazione")
+        parser.add_argument(
+            '--workers', type=int, default=settings.EXTRACTION_WORKERS,
+            help="Processi paralleli per l'estrazione (1 = nel processo corrente)"
+        )
+
+    def handle(self, *args, **options):
+        contracts = Contract.objects.exclude(extracted_text='').only('id', 'uploaded_at', 'extracted_text').order_by('id')
+        if options['contract_ids']:
+            contracts = contracts.filter(id__in=options['contract_ids'])
+
+        self.stats = {'contracts': 0, 'created': 0, 'completed': 0, 'chars': 0}
+        self.started = time.monotonic()
+        executor = None
+        if options['workers'] > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+
+        try:
+            batch = []
+            for contract in contracts.iterator(chunk_size=options['batch_size']):
+                batch.append(contract)
+                if len(batch) >= options['batch_size']:
+                    self.process_batch(batch, executor)
+                    batch = []
+            if batch:
+                self.process_batch(batch, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.stats['contracts']} contratti in {elapsed:.1f}s "
+            f"({self.stats['contracts'] / elapsed:.1f} contratti/s, {self.stats['chars'] / elapsed / 1024 / 1024:.2f} MB/s): "
+            f"{self.stats['created']} scadenze estratte, {self.stats['completed']} scadenze AI completate"
+        ))
+
+    def process_batch(self, contracts, executor):
+        """Sostituisce le scadenze estratte dal testo e completa data/preavviso di quelle dell'analisi AI"""
+        # I processi del pool importano solo analyzer.deadlines (nessun modello Django)
+        references = {contract.id: deadline_reference_date(contract) for contract in contracts}
+        texts = [contract.extracted_text for contract in contracts]
+        dates = [references[contract.id] for contract in contracts]
+        results = executor.map(extract_deadlines, texts, dates, chunksize=8) if executor else map(extract_deadlines, texts, dates)
+
+        new_deadlines = []
+        for contract, found in zip(contracts, results):
+            new_deadlines.extend(
+                Deadline(
+                    contract=contract,
+                    description=deadline['description'][:500],
+                    date=deadline['date'],
+                    days_notice=deadline['days_notice'],
+                    source='text',
+                )
+                for deadline in found
+            )
+            self.stats['chars'] += len(contract.extracted_text)
+
+        ai_deadlines = list(Deadline.objects.filter(
+            contract_id__in=references, source='ai', date__isnull=True, days_notice__isnull=True,
+        ))
+        completed = []
+        for deadline in ai_deadlines:
+            deadline.date, deadline.days_notice = parse_deadline_text(deadline.description, references[deadline.contract_id])
+            if deadline.date is not None or deadline.days_notice is not None:
+                completed.append(deadline)
+
+        with transaction.atomic():
+            Deadline.objects.filter(contract_id__in=references, source='text').delete()
+            Deadline.objects.bulk_create(new_deadlines, batch_size=500)
+            Deadline.objects.bulk_update(completed, ['date', 'days_notice'], batch_size=500)
+            # Le scadenze fanno parte della pagina di dettaglio in cache
+            invalidate_contract_details(references)
+
+        self.stats['contracts'] += len(contracts)
+        self.stats['created'] += len(new_deadlines)
+        self.stats['completed'] += len(completed)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.fake_openai import make_fake_server, api_base_for
+
+
+class Command(BaseCommand):
+    help = "Avvia un server locale compatibile con le Chat Completions di OpenAI (test e benchmark)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency', type=float, default=0.5, help="Latenza simulata per richiesta (s)")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Frazione di risposte 429/500")
+        parser.add_argument('--chunk-delay', type=float, default=0.0, help="Pausa tra i frammenti in streaming (s)")
+
+    def handle(self, *args, **options):
+        server = make_fake_server(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            chunk_delay=options['chunk_delay'],
+        )
+        self.stdout.write(f"Server OpenAI di test in ascolto: OPENAI_API_BASE={api_base_for(server)}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
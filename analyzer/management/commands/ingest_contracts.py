@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analyzer.models import Contract, AnalysisJob
+from analyzer.search import index_contracts
+from analyzer.stats import invalidate_dashboard_stats
+from analyzer.utils import hash_chunks, extract_clean_text
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = "Importa in blocco i contratti PDF/DOCX di una directory o di un archivio ZIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Directory o file .zip da importare")
+        parser.add_argument('--batch-size', type=int, default=200, help="Contratti creati per ogni bulk_create")
+        parser.add_argument(
+            '--workers', type=int, default=settings.EXTRACTION_WORKERS,
+            help="Processi paralleli per l'estrazione del testo"
+        )
+        parser.add_argument(
+            '--defer-extraction', action='store_true',
+            help="Non estrarre il testo durante l'import: accoda job di estrazione per i worker"
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                self.ingest(self.iter_zip(archive), options)
+        elif os.path.isdir(path):
+            self.ingest(self.iter_directory(path), options)
+        else:
+            raise CommandError(f"{path} non è una directory né un archivio ZIP")
+
+    def ingest(self, sources, options):
+        self.stats = {'seen': 0, 'created': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+        self.started = time.monotonic()
+        self.executor = None
+        if not options['defer_extraction']:
+            self.executor = ProcessPoolExecutor(
+                max_workers=max(options['workers'], 1),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+
+        try:
+            batch = []
+            for source in sources:
+                batch.append(source)
+                if len(batch) >= options['batch_size']:
+                    self.ingest_batch(batch)
+                    batch = []
+            if batch:
+                self.ingest_batch(batch)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+
+        self.report(final=True)
+
+    def iter_directory(self, root):
+        """Genera (nome, apertura) per i file supportati, in ordine stabile"""
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    file_path = os.path.join(dirpath, filename)
+                    yield filename, (lambda p=file_path: open(p, 'rb'))
+
+    def iter_zip(self, archive):
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.basename(info.filename), (lambda i=info: archive.open(i))
+
+    def ingest_batch(self, batch):
+        """Salva i file nuovi di un blocco, crea i contratti con bulk_create ed avvia l'elaborazione"""
+        hashed = []
+        for name, opener in batch:
+            self.stats['seen'] += 1
+            try:
+                with opener() as fobj:
+                    hashed.append((name, opener, hash_chunks(iter(lambda: fobj.read(READ_CHUNK_SIZE), b''))))
+            except Exception as e:
+                self.stats['failed'] += 1
+                self.stderr.write(f"Impossibile leggere {name}: {e}")
+
+        # Ripresa: i file già importati (anche in esecuzioni precedenti) sono riconosciuti dall'hash
+        known = set(
+            Contract.objects.filter(file_hash__in=[file_hash for _, _, file_hash in hashed])
+            .values_list('file_hash', flat=True)
+        )
+
+        contracts = []
+        for name, opener, file_hash in hashed:
+            if file_hash in known:
+                self.stats['skipped'] += 1
+                continue
+            known.add(file_hash)
+
+            with opener() as fobj:
+                stored_name = default_storage.save(f"contracts/{name}", File(fobj, name=name))
+            self.stats['bytes'] += default_storage.size(stored_name)
+            contracts.append(Contract(
+                title=os.path.splitext(name)[0][:200],
+                file=stored_name,
+                file_hash=file_hash,
+                original_filename=name[:255],
+            ))
+
+        if not contracts:
+            self.report()
+            return
+
+        contracts = Contract.objects.bulk_create(contracts)
+        self.stats['created'] += len(contracts)
+        invalidate_dashboard_stats()
+
+        if self.executor is None:
+            index_contracts(contracts)
+            AnalysisJob.objects.bulk_create([
+                AnalysisJob(contract=contract, stage='extract', max_attempts=settings.ANALYSIS_JOB_MAX_ATTEMPTS)
+                for contract in contracts
+            ])
+        else:
+            self.extract_batch(contracts)
+
+        self.report()
+
+    def extract_batch(self, contracts):
+        """Estrae il testo in parallelo e accoda l'analisi AI dei contratti riusciti"""
+        futures = [
+            (contract, self.executor.submit(extract_clean_text, contract.file.path))
+            for contract in contracts
+        ]
+
+        extracted = []
+        for contract, future in futures:
+            contract.extraction_finished_at = timezone.now()
+            try:
+                contract.extracted_text, contract.extraction_seconds = future.result()
+                contract.extraction_status = 'done'
+                extracted.append(contract)
+            except Exception as e:
+                contract.extraction_status = 'failed'
+                contract.extraction_error = str(e)
+                self.stats['failed'] += 1
+
+        Contract.objects.bulk_update(contracts, [
+            'extracted_text', 'extraction_status', 'extraction_seconds',
+            'extraction_error', 'extraction_finished_at',
+        ])
+        # bulk_create/bulk_update non emettono segnali: l'indice di ricerca va aggiornato qui
+        index_contracts(contracts)
+        AnalysisJob.objects.bulk_create([
+            AnalysisJob(contract=contract, stage='analyze', max_attempts=settings.ANALYSIS_JOB_MAX_ATTEMPTS)
+            for contract in extracted
+        ])
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        stats = self.stats
+        line = (
+            f"{stats['seen']} file letti, {stats['created']} importati, {stats['skipped']} già presenti, "
+            f"{stats['failed']} errori - {stats['seen'] / elapsed:.1f} file/s, "
+            f"{stats['bytes'] / elapsed / 1024 / 1024:.2f} MB/s"
+        )
+        if final:
+            self.stdout.write(self.style.SUCCESS(f"Import completato in {elapsed:.1f}s: {line}"))
+        else:
+            self.stdout.write(line)
@@ -0,0 +1,26 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analyzer.prescreen import prescreen_stats
+
+
+class Command(BaseCommand):
+    help = "Statistiche del pre-screening locale: analisi AI evitate o ridotte"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help="Stampa le statistiche in formato JSON")
+
+    def handle(self, *args, **options):
+        stats = prescreen_stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+
+        self.stdout.write(f"Modalità:               {settings.PRESCREEN_MODE}")
+        self.stdout.write(f"Contratti controllati:  {stats['screened']}")
+        self.stdout.write(f"Analisi AI evitate:     {stats['llm_skipped']} ({stats['skip_ratio']:.1%})")
+        self.stdout.write(f"Analisi AI su estratti: {stats['llm_focused']}")
+        self.stdout.write(f"Analisi AI complete:    {stats['llm_full']}")
+        self.stdout.write(f"Caratteri non inviati:  {stats['chars_saved']}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Ricostruisce l'indice di ricerca full-text di tutti i contratti"
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Contratti indicizzati: {count}"))
@@ -0,0 +1,87 @@
+import os
+import signal
+import socket
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from analyzer.jobs import claim_next_job, run_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Avvia i worker che elaborano la coda di estrazione testo e analisi AI"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.ANALYSIS_WORKERS,
+            help="Numero di worker concorrenti"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.ANALYSIS_JOB_POLL_INTERVAL,
+            help="Secondi di attesa quando la coda è vuota"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Svuota la coda ed esce invece di restare in ascolto"
+        )
+
+    def handle(self, *args, **options):
+        self.stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: self.stop_event.set())
+
+        requeue_stale_jobs()
+
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=self.worker_loop,
+                args=(f"{prefix}-{i}", options['poll_interval'], options['once']),
+                daemon=True,
+            )
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+
+        self.stdout.write(f"Avviati {len(threads)} worker di analisi")
+
+        last_check = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                if self.stop_event.wait(1):
+                    break
+                # Recupera periodicamente i job abbandonati da worker terminati
+                if time.monotonic() - last_check >= settings.ANALYSIS_JOB_TIMEOUT / 2:
+                    requeue_stale_jobs()
+                    close_old_connections()
+                    last_check = time.monotonic()
+        except KeyboardInterrupt:
+            self.stop_event.set()
+
+        self.stop_event.set()
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(self.style.SUCCESS("Worker di analisi terminati"))
+
+    def worker_loop(self, worker_name, poll_interval, once):
+        """Ciclo di un singolo worker: prenota ed esegue job finché non viene fermato"""
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                job = claim_next_job(worker_name)
+
+                if job is None:
+                    if once:
+                        break
+                    self.stop_event.wait(poll_interval)
+                    continue
+
+                if run_job(job):
+                    self.stdout.write(f"[{worker_name}] Contratto {job.contract_id}: {job.get_stage_display()} completata")
+                else:
+                    self.stderr.write(f"[{worker_name}] Contratto {job.contract_id}: {job.get_stage_display()} non riuscita")
+        finally:
+            connection.close()
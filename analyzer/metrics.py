@@ -0,0 +1,129 @@
+"""Tempi per fase dell'elaborazione dei contratti e metriche in formato Prometheus.
+
+StageTimer misura le fasi di un contratto (lettura del file, normalizzazione,
+pre-screening, analisi AI, salvataggio) e le registra come righe StageTiming;
+render_prometheus() le aggrega in istogrammi di latenza per l'endpoint /metrics,
+insieme ai token consumati, alla coda dei job e ai contatori condivisi.
+"""
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from .detail_cache import detail_cache_stats
+from .models import AnalysisJob, MetricCounter, StageTiming
+
+# Contatori degli errori dei job, per fase: jobs.errors.extract, jobs.errors.analyze
+JOB_ERRORS_PREFIX = 'jobs.errors.'
+
+
+class StageTimer:
+    """Durate delle fasi di un contratto, salvate insieme al termine dell'elaborazione"""
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.timings = {}
+        # Token consumati dalle chiamate AI, aggiornati dal servizio di analisi
+        self.usage = {}
+
+    def add(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def timed_iter(self, stage, iterable):
+        """Itera misurando solo il tempo speso a produrre gli elementi (es. le pagine di un PDF)"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - started)
+                return
+            self.add(stage, time.perf_counter() - started)
+            yield item
+
+    def save(self):
+        StageTiming.objects.bulk_create([
+            StageTiming(
+                contract=self.contract,
+                stage=stage,
+                seconds=round(seconds, 6),
+                prompt_tokens=self.usage.get('prompt_tokens') if stage == 'ai' else None,
+                completion_tokens=self.usage.get('completion_tokens') if stage == 'ai' else None,
+            )
+            for stage, seconds in self.timings.items()
+        ])
+
+
+def record_job_error(stage):
+    MetricCounter.increment(f'{JOB_ERRORS_PREFIX}{stage}')
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _metric(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+def render_prometheus():
+    """Metriche nel formato testuale di Prometheus (una query aggregata per famiglia)"""
+    lines = []
+    buckets = settings.METRICS_LATENCY_BUCKETS
+
+    stages = StageTiming.objects.values('stage').annotate(
+        count=Count('id'),
+        total=Sum('seconds'),
+        prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+        **{f'le_{i}': Count('id', filter=Q(seconds__lte=bound)) for i, bound in enumerate(buckets)},
+    ).order_by('stage')
+
+    _metric(lines, 'contract_stage_duration_seconds', 'histogram', "Durata delle fasi di elaborazione dei contratti")
+    for row in stages:
+        stage = _label(row['stage'])
+        for i, bound in enumerate(buckets):
+            lines.append(f'contract_stage_duration_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {row[f"le_{i}"]}')
+        lines.append(f'contract_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {row["count"]}')
+        lines.append(f'contract_stage_duration_seconds_sum{{stage="{stage}"}} {row["total"] or 0:.6f}')
+        lines.append(f'contract_stage_duration_seconds_count{{stage="{stage}"}} {row["count"]}')
+
+    _metric(lines, 'contract_ai_tokens_total', 'counter', "Token consumati dalle analisi AI")
+    ai = next((row for row in stages if row['stage'] == 'ai'), {})
+    for kind in ('prompt', 'completion'):
+        lines.append(f'contract_ai_tokens_total{{type="{kind}"}} {ai.get(f"{kind}_tokens") or 0}')
+
+    _metric(lines, 'contract_analysis_jobs', 'gauge', "Job di elaborazione per fase e stato")
+    jobs = AnalysisJob.objects.values('stage', 'status').annotate(count=Count('id')).order_by('stage', 'status')
+    for row in jobs:
+        lines.append(f'contract_analysis_jobs{{stage="{_label(row["stage"])}",status="{_label(row["status"])}"}} {row["count"]}')
+
+    _metric(lines, 'contract_analysis_queue_oldest_seconds', 'gauge', "Attesa del job in coda più vecchio")
+    oldest = AnalysisJob.objects.filter(status='queued', run_after__lte=timezone.now()).aggregate(oldest=Min('run_after'))['oldest']
+    lines.append(f'contract_analysis_queue_oldest_seconds {(timezone.now() - oldest).total_seconds() if oldest else 0:.3f}')
+
+    counters = list(MetricCounter.objects.order_by('name').values_list('name', 'value'))
+    _metric(lines, 'contract_analysis_job_errors_total', 'counter', "Tentativi di job falliti, per fase")
+    for name, value in counters:
+        if name.startswith(JOB_ERRORS_PREFIX):
+            lines.append(f'contract_analysis_job_errors_total{{stage="{_label(name[len(JOB_ERRORS_PREFIX):])}"}} {value}')
+
+    _metric(lines, 'contract_analyzer_counter_total', 'counter', "Contatori applicativi (cache, pre-screening, risposte AI)")
+    for name, value in counters:
+        if not name.startswith(JOB_ERRORS_PREFIX):
+            lines.append(f'contract_analyzer_counter_total{{name="{_label(name)}"}} {value}')
+
+    _metric(lines, 'contract_detail_cache_requests_total', 'counter', "Pagine di dettaglio dalla cache, generate o non modificate (304)")
+    for result, value in detail_cache_stats().items():
+        if result != 'hit_ratio':
+            lines.append(f'contract_detail_cache_requests_total{{result="{result}"}} {value}')
+
+    return '\n'.join(lines) + '\n'
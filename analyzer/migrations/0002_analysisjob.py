@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'In coda'), ('running', 'In esecuzione'), ('done', 'Completato'), ('failed', 'Fallito')], default='queued', max_length=10, verbose_name='Stato')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativi')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='Tentativi Massimi')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Esegui Dopo')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('last_error', models.TextField(blank=True, verbose_name='Ultimo Errore')),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='analyzer.contract')),
+            ],
+            options={
+                'verbose_name': 'Job di Analisi',
+                'verbose_name_plural': 'Job di Analisi',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='analyzer_an_status_3d6450_idx')],
+            },
+        ),
+    ]
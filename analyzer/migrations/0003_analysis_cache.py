@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_analysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Chiave SHA-256')),
+                ('model_name', models.CharField(max_length=50, verbose_name='Modello')),
+                ('prompt_version', models.CharField(max_length=20, verbose_name='Versione Prompt')),
+                ('response', models.TextField(verbose_name='Risposta AI')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Dimensione (byte)')),
+                ('analysis_seconds', models.FloatField(default=0, verbose_name='Durata Analisi Originale')),
+                ('hit_count', models.PositiveIntegerField(default=0, verbose_name='Riutilizzi')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Analisi in Cache',
+                'verbose_name_plural': 'Analisi in Cache',
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contatore',
+                'verbose_name_plural': 'Contatori',
+            },
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='use_cache',
+            field=models.BooleanField(default=True, verbose_name='Usa Cache Analisi'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+def mark_existing_extractions(apps, schema_editor):
+    # I contratti caricati prima di questa migrazione hanno già il testo estratto
+    Contract = apps.get_model('analyzer', 'Contract')
+    Contract.objects.exclude(extracted_text='').update(extraction_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='stage',
+            field=models.CharField(choices=[('extract', 'Estrazione Testo'), ('analyze', 'Analisi AI')], default='analyze', max_length=10, verbose_name='Fase'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='extraction_error',
+            field=models.TextField(blank=True, verbose_name='Errore Estrazione'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='extraction_finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='extraction_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='Durata Estrazione (s)'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='extraction_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'In attesa'), ('running', 'In corso'), ('done', 'Completata'), ('failed', 'Fallita')], default='pending', max_length=10, verbose_name='Stato Estrazione'),
+        ),
+        migrations.RunPython(mark_existing_extractions, migrations.RunPython.noop),
+    ]
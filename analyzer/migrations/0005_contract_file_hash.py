@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_extraction_stage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='SHA-256 File'),
+        ),
+    ]
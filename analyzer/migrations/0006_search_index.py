@@ -0,0 +1,107 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from analyzer.search import _document_fields
+
+BACKFILL_BATCH_SIZE = 500
+
+
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE analyzer_contractsearch_fts USING fts5(
+        title, parties, clauses, body,
+        content='analyzer_contractsearchdocument', content_rowid='contract_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER analyzer_contractsearch_ai AFTER INSERT ON analyzer_contractsearchdocument BEGIN
+        INSERT INTO analyzer_contractsearch_fts(rowid, title, parties, clauses, body)
+        VALUES (new.contract_id, new.title, new.parties, new.clauses, new.body);
+    END""",
+    """CREATE TRIGGER analyzer_contractsearch_ad AFTER DELETE ON analyzer_contractsearchdocument BEGIN
+        INSERT INTO analyzer_contractsearch_fts(analyzer_contractsearch_fts, rowid, title, parties, clauses, body)
+        VALUES ('delete', old.contract_id, old.title, old.parties, old.clauses, old.body);
+    END""",
+    """CREATE TRIGGER analyzer_contractsearch_au AFTER UPDATE ON analyzer_contractsearchdocument BEGIN
+        INSERT INTO analyzer_contractsearch_fts(analyzer_contractsearch_fts, rowid, title, parties, clauses, body)
+        VALUES ('delete', old.contract_id, old.title, old.parties, old.clauses, old.body);
+        INSERT INTO analyzer_contractsearch_fts(rowid, title, parties, clauses, body)
+        VALUES (new.contract_id, new.title, new.parties, new.clauses, new.body);
+    END""",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS analyzer_contractsearch_au",
+    "DROP TRIGGER IF EXISTS analyzer_contractsearch_ad",
+    "DROP TRIGGER IF EXISTS analyzer_contractsearch_ai",
+    "DROP TABLE IF EXISTS analyzer_contractsearch_fts",
+]
+
+# Stessa espressione di analyzer.search.PG_VECTOR_SQL
+POSTGRES_FORWARD = [
+    """CREATE INDEX analyzer_contractsearch_gin ON analyzer_contractsearchdocument USING GIN ((
+        setweight(to_tsvector('italian', title), 'A') ||
+        setweight(to_tsvector('italian', parties), 'B') ||
+        setweight(to_tsvector('italian', clauses), 'B') ||
+        setweight(to_tsvector('italian', body), 'C')
+    ))""",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS analyzer_contractsearch_gin",
+]
+
+
+def _run(schema_editor, statements_by_vendor):
+    for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD})
+
+
+def backfill_search_index(apps, schema_editor):
+    """Indicizza i contratti già presenti (modelli storici: lo schema attuale può avere altri campi)"""
+    Contract = apps.get_model('analyzer', 'Contract')
+    ContractSearchDocument = apps.get_model('analyzer', 'ContractSearchDocument')
+    contracts = (
+        Contract.objects.using(schema_editor.connection.alias)
+        .only('title', 'parties', 'extracted_text').prefetch_related('risk_clauses')
+    )
+    documents = []
+    for contract in contracts.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        clause_texts = [clause.clause_text for clause in contract.risk_clauses.all()]
+        documents.append(ContractSearchDocument(contract=contract, **_document_fields(contract, clause_texts)))
+        if len(documents) == BACKFILL_BATCH_SIZE:
+            ContractSearchDocument.objects.using(schema_editor.connection.alias).bulk_create(documents)
+            documents = []
+    ContractSearchDocument.objects.using(schema_editor.connection.alias).bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_contract_file_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractSearchDocument',
+            fields=[
+                ('contract', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='analyzer.contract')),
+                ('title', models.TextField(blank=True)),
+                ('parties', models.TextField(blank=True)),
+                ('clauses', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Documento di Ricerca',
+                'verbose_name_plural': 'Documenti di Ricerca',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='analyzed',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='contract_type',
+            field=models.CharField(blank=True, choices=[('purchase', 'Contratto di Compravendita'), ('service', 'Contratto di Servizio'), ('employment', 'Contratto di Lavoro'), ('rental', 'Contratto di Locazione'), ('nda', 'Accordo di Riservatezza'), ('partnership', 'Contratto di Partnership'), ('license', 'Contratto di Licenza'), ('other', 'Altro')], db_index=True, max_length=20, verbose_name='Tipo Contratto'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='risk_level',
+            field=models.CharField(blank=True, choices=[('low', 'Basso'), ('medium', 'Medio'), ('high', 'Alto'), ('critical', 'Critico')], db_index=True, max_length=10, verbose_name='Livello di Rischio'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='uploaded_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
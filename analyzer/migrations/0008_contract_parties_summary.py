@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:07
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_parties_summary(apps, schema_editor):
+    # Sintesi delle parti per i contratti già analizzati (stessa regola di Contract.save)
+    Contract = apps.get_model('analyzer', 'Contract')
+    contracts = list(Contract.objects.exclude(parties='').only('id', 'parties'))
+    for contract in contracts:
+        contract.parties_summary = Truncator(contract.parties).words(8, truncate=' …')[:255]
+    Contract.objects.bulk_update(contracts, ['parties_summary'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0007_contract_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='parties_summary',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Parti (sintesi)'),
+        ),
+        migrations.RunPython(fill_parties_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0008_contract_parties_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='riskclause',
+            name='end_offset',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='riskclause',
+            name='source',
+            field=models.CharField(choices=[('ai', 'Analisi AI'), ('prescreen', 'Pre-screening locale')], default='ai', max_length=10, verbose_name='Origine'),
+        ),
+        migrations.AddField(
+            model_name='riskclause',
+            name='start_offset',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0009_riskclause_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deadline',
+            name='source',
+            field=models.CharField(choices=[('ai', 'Analisi AI'), ('text', 'Estratta dal testo')], default='ai', max_length=10, verbose_name='Origine'),
+        ),
+        migrations.AlterField(
+            model_name='deadline',
+            name='date',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='Data Scadenza'),
+        ),
+    ]
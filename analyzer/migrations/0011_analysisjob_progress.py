@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0010_deadline_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='progress',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Avanzamento'),
+        ),
+    ]
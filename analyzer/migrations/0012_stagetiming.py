@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0011_analysisjob_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('extract', 'Lettura File'), ('clean', 'Normalizzazione Testo'), ('prescreen', 'Pre-screening'), ('ai', 'Analisi AI'), ('persist', 'Salvataggio Risultati')], max_length=10, verbose_name='Fase')),
+                ('seconds', models.FloatField(verbose_name='Durata (s)')),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='Token Prompt')),
+                ('completion_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='Token Risposta')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Registrato il')),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_timings', to='analyzer.contract')),
+            ],
+            options={
+                'verbose_name': 'Tempo di Elaborazione',
+                'verbose_name_plural': 'Tempi di Elaborazione',
+                'ordering': ['recorded_at'],
+                'indexes': [models.Index(fields=['stage', 'seconds'], name='analyzer_st_stage_4c8dc1_idx')],
+            },
+        ),
+    ]
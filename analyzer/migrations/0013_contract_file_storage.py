@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:43
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0012_stagetiming'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='original_filename',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Nome File Originale'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='file',
+            field=models.FileField(db_index=True, upload_to='contracts/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf', 'docx'])], verbose_name='File Contratto'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0013_contract_file_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='riskclause',
+            name='signature',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='riskclause',
+            name='source',
+            field=models.CharField(choices=[('ai', 'Analisi AI'), ('prescreen', 'Pre-screening locale'), ('library', 'Libreria clausole')], default='ai', max_length=10, verbose_name='Origine'),
+        ),
+        migrations.AlterField(
+            model_name='stagetiming',
+            name='stage',
+            field=models.CharField(choices=[('extract', 'Lettura File'), ('clean', 'Normalizzazione Testo'), ('prescreen', 'Pre-screening'), ('library', 'Libreria Clausole'), ('ai', 'Analisi AI'), ('persist', 'Salvataggio Risultati')], max_length=10, verbose_name='Fase'),
+        ),
+        migrations.CreateModel(
+            name='ClauseBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('risk_clause', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='analyzer.riskclause')),
+            ],
+            options={
+                'verbose_name': 'Bucket Clausola',
+                'verbose_name_plural': 'Bucket Clausole',
+            },
+        ),
+    ]
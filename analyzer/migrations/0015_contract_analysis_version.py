@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0014_clause_library'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='analysis_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versione Analisi'),
+        ),
+    ]
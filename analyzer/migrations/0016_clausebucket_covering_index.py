@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0015_contract_analysis_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='clausebucket',
+            name='key',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='clausebucket',
+            index=models.Index(fields=['key', 'risk_clause'], name='analyzer_cl_key_aca66a_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+"""Firme MinHash e chiavi LSH per riconoscere clausole quasi identiche.
+
+Il testo della clausola viene ridotto a shingle di parole (sequenze di SHINGLE_SIZE parole
+normalizzate); la firma stima la similarità di Jaccard tra gli insiemi di shingle.
+Si usa il MinHash a permutazione singola con densificazione: ogni shingle viene hashato
+una sola volta e assegnato a uno dei NUM_HASHES bin, di cui si conserva il minimo; i bin
+vuoti prendono il valore del primo bin pieno successivo. Il costo è lineare nel numero di
+shingle invece che in shingle × permutazioni.
+
+La firma è divisa in BANDS bande di ROWS valori: due clausole con similarità s
+condividono almeno una banda con probabilità 1 - (1 - s^ROWS)^BANDS (circa 0,98 per
+s = 0,6 e 0,016 per s = 0,1), quindi la ricerca dei candidati usa solo le chiavi delle bande.
+
+Il modulo non importa i modelli: le firme possono essere calcolate da processi separati.
+"""
+import re
+import struct
+import zlib
+
+SHINGLE_SIZE = 2
+NUM_HASHES = 48
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+WORD_RE = re.compile(r'\w+')
+ACCENTS = str.maketrans('àáâäèéêëìíîïòóôöùúûü', 'aaaaeeeeiiiioooouuuu')
+SIGNATURE_FORMAT = f'<{NUM_HASHES}I'
+VALUE_MASK = 0xFFFFFFFF
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+# Scostamento applicato ai valori presi in prestito dai bin vicini (densificazione)
+DENSIFY_OFFSET = 0x9E3779B1
+
+
+def normalize_words(text):
+    """Parole in minuscolo e senza accenti: le varianti grafiche non cambiano gli shingle"""
+    text = text.lower()
+    return WORD_RE.findall(text if text.isascii() else text.translate(ACCENTS))
+
+def shingles(text):
+    """Insieme degli shingle di parole; i testi più corti di uno shingle formano un unico elemento"""
+    words = normalize_words(text)
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(shingle) for shingle in zip(*(words[i:] for i in range(SHINGLE_SIZE)))}
+
+def _hash64(data, seed=0):
+    """CRC32 (stabile tra processi, a differenza di hash()) distribuito su 64 bit con un
+    moltiplicatore di Fibonacci: la CRC da sola è lineare e correlerebbe i bin"""
+    value = ((zlib.crc32(data, seed) + 1) * 0x9E3779B97F4A7C15) & MASK_64
+    return value ^ (value >> 29)
+
+def signature(text):
+    """Firma MinHash del testo come bytes (NUM_HASHES interi a 32 bit), None se il testo non ha parole"""
+    bins = [None] * NUM_HASHES
+    for shingle in shingles(text):
+        hashed = _hash64(shingle.encode())
+        index, value = hashed % NUM_HASHES, (hashed >> 32) & VALUE_MASK
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    if all(value is None for value in bins):
+        return None
+    values = []
+    for index in range(NUM_HASHES):
+        distance = 0
+        while bins[(index + distance) % NUM_HASHES] is None:
+            distance += 1
+        values.append((bins[(index + distance) % NUM_HASHES] + distance * DENSIFY_OFFSET) & VALUE_MASK)
+    return struct.pack(SIGNATURE_FORMAT, *values)
+
+def similarity(first, second):
+    """Stima della similarità di Jaccard tra due firme"""
+    first, second = struct.unpack(SIGNATURE_FORMAT, first), struct.unpack(SIGNATURE_FORMAT, second)
+    return sum(a == b for a, b in zip(first, second)) / NUM_HASHES
+
+def band_keys(packed):
+    """Chiavi LSH (interi a 64 bit con segno, come le colonne BigInteger) delle bande della firma"""
+    size = ROWS * 4
+    keys = []
+    for band in range(BANDS):
+        key = _hash64(packed[band * size:(band + 1) * size], seed=band)
+        keys.append(key - (1 << 64) if key >= 1 << 63 else key)
+    return keys
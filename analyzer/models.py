@@ -1,7 +1,10 @@
-import os
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.core.validators import FileExtensionValidator
 from django.utils import timezone
+from django.utils.text import Truncator
+
+from .storage import content_hash, written_recently
 
 class Contract(models.Model):
     CONTRACT_TYPES = [
@@ -15,6 +18,13 @@ class Contract(models.Model):
         ('other', 'Altro'),
     ]
     
+    EXTRACTION_STATUSES = [
+        ('pending', 'In attesa'),
+        ('running', 'In corso'),
+        ('done', 'Completata'),
+        ('failed', 'Fallita'),
+    ]
+    
     RISK_LEVELS = [
         ('low', 'Basso'),
         ('medium', 'Medio'),
@@ -23,49 +33,103 @@ class Contract(models.Model):
     ]
     
     title = models.CharField(max_length=200, verbose_name="Titolo Contratto")
+    # Archiviato per contenuto (analyzer.storage): contratti con lo stesso file condividono il nome
     file = models.FileField(
         upload_to='contracts/',
         validators=[FileExtensionValidator(allowed_extensions=['pdf', 'docx'])],
+        db_index=True,
         verbose_name="File Contratto"
     )
-    uploaded_at = models.DateTimeField(default=timezone.now)
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name="SHA-256 File")
+    original_filename = models.CharField(max_length=255, blank=True, verbose_name="Nome File Originale")
+    uploaded_at = models.DateTimeField(default=timezone.now, db_index=True)
     
     # Risultati analisi AI
     contract_type = models.CharField(
         max_length=20, 
         choices=CONTRACT_TYPES, 
         blank=True,
+        db_index=True,
         verbose_name="Tipo Contratto"
     )
     parties = models.TextField(blank=True, verbose_name="Parti Coinvolte")
+    parties_summary = models.CharField(max_length=255, blank=True, editable=False, verbose_name="Parti (sintesi)")
     duration = models.CharField(max_length=500, blank=True, verbose_name="Durata")
     key_obligations = models.TextField(blank=True, verbose_name="Obblighi Principali")
     risk_level = models.CharField(
         max_length=10, 
         choices=RISK_LEVELS, 
         blank=True,
+        db_index=True,
         verbose_name="Livello di Rischio"
     )
     extracted_text = models.TextField(blank=True)
+    
+    # Estrazione del testo (eseguita dai worker, fuori dalla richiesta di upload)
+    extraction_status = models.CharField(
+        max_length=10,
+        choices=EXTRACTION_STATUSES,
+        default='pending',
+        verbose_name="Stato Estrazione"
+    )
+    extraction_started_at = models.DateTimeField(null=True, blank=True)
+    extraction_finished_at = models.DateTimeField(null=True, blank=True)
+    extraction_seconds = models.FloatField(null=True, blank=True, verbose_name="Durata Estrazione (s)")
+    extraction_error = models.TextField(blank=True, verbose_name="Errore Estrazione")
     ai_analysis = models.TextField(blank=True, verbose_name="Analisi AI")
     
     # Metadata
-    analyzed = models.BooleanField(default=False)
+    analyzed = models.BooleanField(default=False, db_index=True)
     analysis_date = models.DateTimeField(null=True, blank=True)
+    # Incrementata a ogni scrittura dei risultati: chiave della cache e ETag della pagina di dettaglio
+    analysis_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Versione Analisi")
     
     class Meta:
         ordering = ['-uploaded_at']
         verbose_name = "Contratto"
         verbose_name_plural = "Contratti"
     
+    # Colonne usate da elenchi e dashboard: i campi di testo pesanti restano differiti
+    LIST_FIELDS = (
+        'id', 'title', 'uploaded_at', 'contract_type', 'risk_level', 'analyzed', 'parties_summary',
+    )
+    PARTIES_SUMMARY_WORDS = 8
+    
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            # Il file viene salvato prima della riga: lo storage ne calcola l'impronta durante la scrittura
+            self.original_filename = self.original_filename or self.file.name[:255]
+            self.file.save(self.file.name, self.file.file, save=False)
+            self.file_hash = content_hash(self.file.name) or self.file_hash
+        # parties_summary segue sempre parties (se il campo è stato caricato)
+        if 'parties' not in self.get_deferred_fields():
+            self.parties_summary = Truncator(self.parties).words(self.PARTIES_SUMMARY_WORDS, truncate=' …')[:255]
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'parties' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'parties_summary'}
+        super().save(*args, **kwargs)
+    
     def delete(self, *args, **kwargs):
-        if self.file:
-            if os.path.isfile(self.file.path):
-                os.remove(self.file.path)
-        super().delete(*args, **kwargs)
+        name = self.file.name
+        result = super().delete(*args, **kwargs)
+        # Dopo il commit: se l'eliminazione viene annullata il file serve ancora
+        transaction.on_commit(lambda: self.release_file(name))
+        return result
+    
+    @classmethod
+    def release_file(cls, name):
+        """Rimuove il file archiviato se nessun contratto lo usa più e non è stato appena scritto:
+        un caricamento identico salva il file prima di inserire la propria riga"""
+        if not name or cls.objects.filter(file=name).exists():
+            return False
+        storage = cls._meta.get_field('file').storage
+        if written_recently(storage, name):
+            return False
+        storage.delete(name)
+        return True
 
 
 class RiskClause(models.Model):
@@ -82,18 +146,173 @@ class RiskClause(models.Model):
     severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES, verbose_name="Gravità")
     recommendation = models.TextField(verbose_name="Raccomandazione")
     
+    # Origine della clausola e posizione nel testo estratto (se individuata)
+    SOURCE_CHOICES = [
+        ('ai', 'Analisi AI'),
+        ('prescreen', 'Pre-screening locale'),
+        ('library', 'Libreria clausole'),
+    ]
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='ai', verbose_name="Origine")
+    start_offset = models.PositiveIntegerField(null=True, blank=True)
+    end_offset = models.PositiveIntegerField(null=True, blank=True)
+    # Firma MinHash del testo (analyzer.minhash), solo per le clausole valutate dall'AI
+    signature = models.BinaryField(null=True, blank=True, editable=False)
+    
     class Meta:
         verbose_name = "Clausola Rischiosa"
         verbose_name_plural = "Clausole Rischiose"
 
 
+class ClauseBucket(models.Model):
+    """Chiave LSH di una banda della firma di una clausola: le clausole quasi identiche
+    condividono almeno una chiave (libreria delle clausole, analyzer.clause_library)"""
+    key = models.BigIntegerField()
+    risk_clause = models.ForeignKey(RiskClause, on_delete=models.CASCADE, related_name='buckets')
+    
+    class Meta:
+        # Indice coprente: le bande condivise si contano senza leggere la tabella
+        indexes = [models.Index(fields=['key', 'risk_clause'])]
+        verbose_name = "Bucket Clausola"
+        verbose_name_plural = "Bucket Clausole"
+
+
 class Deadline(models.Model):
     contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='deadlines')
+    SOURCE_CHOICES = [
+        ('ai', 'Analisi AI'),
+        ('text', 'Estratta dal testo'),
+    ]
+    
     description = models.CharField(max_length=500, verbose_name="Descrizione Scadenza")
-    date = models.DateField(null=True, blank=True, verbose_name="Data Scadenza")
+    date = models.DateField(null=True, blank=True, db_index=True, verbose_name="Data Scadenza")
     days_notice = models.IntegerField(null=True, blank=True, verbose_name="Giorni di Preavviso")
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='ai', verbose_name="Origine")
     
     class Meta:
         ordering = ['date']
         verbose_name = "Scadenza"
-        verbose_name_plural = "Scadenze"
\ No newline at end of file
+        verbose_name_plural = "Scadenze"
+
+class ContractSearchDocument(models.Model):
+    """Testo indicizzato per la ricerca full-text (FTS5 su SQLite, tsvector/GIN su Postgres).
+    L'indice vero e proprio è creato dalla migrazione in base al database in uso."""
+    contract = models.OneToOneField(
+        Contract, on_delete=models.CASCADE, primary_key=True, related_name='search_document'
+    )
+    title = models.TextField(blank=True)
+    parties = models.TextField(blank=True)
+    clauses = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    
+    class Meta:
+        verbose_name = "Documento di Ricerca"
+        verbose_name_plural = "Documenti di Ricerca"
+
+
+class AnalysisJob(models.Model):
+    STAGE_CHOICES = [
+        ('extract', 'Estrazione Testo'),
+        ('analyze', 'Analisi AI'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'In coda'),
+        ('running', 'In esecuzione'),
+        ('done', 'Completato'),
+        ('failed', 'Fallito'),
+    ]
+    
+    contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='analysis_jobs')
+    stage = models.CharField(max_length=10, choices=STAGE_CHOICES, default='analyze', verbose_name="Fase")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="Stato")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativi")
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name="Tentativi Massimi")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Esegui Dopo")
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    use_cache = models.BooleanField(default=True, verbose_name="Usa Cache Analisi")
+    last_error = models.TextField(blank=True, verbose_name="Ultimo Errore")
+    # Parti analizzate e clausole trovate finora, mostrate in tempo reale nella pagina di dettaglio
+    progress = models.JSONField(default=dict, blank=True, verbose_name="Avanzamento")
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        verbose_name = "Job di Analisi"
+        verbose_name_plural = "Job di Analisi"
+    
+    def __str__(self):
+        return f"{self.contract} - {self.get_stage_display()} ({self.get_status_display()})"
+
+
+
+class AnalysisCacheEntry(models.Model):
+    """Risposta AI memorizzata per hash del testo + versione prompt/modello"""
+    key = models.CharField(max_length=64, unique=True, verbose_name="Chiave SHA-256")
+    model_name = models.CharField(max_length=50, verbose_name="Modello")
+    prompt_version = models.CharField(max_length=20, verbose_name="Versione Prompt")
+    response = models.TextField(verbose_name="Risposta AI")
+    size = models.PositiveIntegerField(default=0, verbose_name="Dimensione (byte)")
+    analysis_seconds = models.FloatField(default=0, verbose_name="Durata Analisi Originale")
+    hit_count = models.PositiveIntegerField(default=0, verbose_name="Riutilizzi")
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        verbose_name = "Analisi in Cache"
+        verbose_name_plural = "Analisi in Cache"
+    
+    def __str__(self):
+        return f"{self.key[:12]} ({self.model_name}, v{self.prompt_version})"
+
+
+class MetricCounter(models.Model):
+    """Contatore persistente condiviso tra processi web e worker"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Contatore"
+        verbose_name_plural = "Contatori"
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+    
+    @classmethod
+    def increment(cls, name, amount=1):
+        if not cls.objects.filter(name=name).update(value=F('value') + amount):
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(value=F('value') + amount)
+    
+    @classmethod
+    def get_value(cls, name):
+        return cls.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+class StageTiming(models.Model):
+    """Durata di una fase dell'elaborazione di un contratto, aggregata dall'endpoint /metrics"""
+    STAGE_CHOICES = [
+        ('extract', 'Lettura File'),
+        ('clean', 'Normalizzazione Testo'),
+        ('prescreen', 'Pre-screening'),
+        ('library', 'Libreria Clausole'),
+        ('ai', 'Analisi AI'),
+        ('persist', 'Salvataggio Risultati'),
+    ]
+    
+    contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='stage_timings')
+    stage = models.CharField(max_length=10, choices=STAGE_CHOICES, verbose_name="Fase")
+    seconds = models.FloatField(verbose_name="Durata (s)")
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Token Prompt")
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Token Risposta")
+    recorded_at = models.DateTimeField(default=timezone.now, verbose_name="Registrato il")
+    
+    class Meta:
+        ordering = ['recorded_at']
+        indexes = [models.Index(fields=['stage', 'seconds'])]
+        verbose_name = "Tempo di Elaborazione"
+        verbose_name_plural = "Tempi di Elaborazione"
+    
+    def __str__(self):
+        return f"{self.contract_id} - {self.get_stage_display()}: {self.seconds:.3f}s"
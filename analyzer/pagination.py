@@ -0,0 +1,84 @@
+"""Paginazione a cursore (keyset) sui contratti, ordinati dal più recente.
+
+Il cursore codifica la chiave (uploaded_at, id) dell'ultimo elemento visto: ogni pagina
+è una query con WHERE sulla chiave + LIMIT, senza OFFSET né COUNT(*), quindi il costo
+resta costante anche scorrendo l'intero archivio.
+"""
+import base64
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.object_list = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(contract, backwards=False):
+    payload = json.dumps([contract.uploaded_at.isoformat(), contract.pk, int(backwards)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Restituisce (uploaded_at, id, backwards) o solleva InvalidCursor"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        uploaded_at, pk, backwards = json.loads(payload)
+        uploaded_at = parse_datetime(uploaded_at)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Cursore non valido")
+    if uploaded_at is None or not isinstance(pk, int):
+        raise InvalidCursor("Cursore non valido")
+    return uploaded_at, pk, bool(backwards)
+
+
+def paginate_by_cursor(queryset, cursor=None, page_size=10):
+    """Una pagina di queryset in ordine (-uploaded_at, -id) a partire dal cursore"""
+    backwards = False
+    if cursor:
+        uploaded_at, pk, backwards = decode_cursor(cursor)
+        # La condizione di intervallo ridondante su uploaded_at permette l'uso dell'indice
+        if backwards:
+            queryset = queryset.filter(
+                Q(uploaded_at__gt=uploaded_at) | Q(pk__gt=pk), uploaded_at__gte=uploaded_at
+            )
+        else:
+            queryset = queryset.filter(
+                Q(uploaded_at__lt=uploaded_at) | Q(pk__lt=pk), uploaded_at__lte=uploaded_at
+            )
+
+    ordering = ('uploaded_at', 'pk') if backwards else ('-uploaded_at', '-pk')
+    # Un elemento in più dice se esiste una pagina successiva senza contare le righe
+    items = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(items) > page_size
+    items = items[:page_size]
+
+    if backwards:
+        items.reverse()
+        next_cursor = encode_cursor(items[-1]) if items else None
+        previous_cursor = encode_cursor(items[0], backwards=True) if has_more else None
+    else:
+        next_cursor = encode_cursor(items[-1]) if has_more else None
+        previous_cursor = encode_cursor(items[0], backwards=True) if cursor and items else None
+    return CursorPage(items, next_cursor, previous_cursor)
@@ -0,0 +1,191 @@
+"""Pre-screening locale dei rischi, eseguito prima dell'analisi AI.
+
+Un insieme di regole (espressioni regolari precompilate) cerca nel testo le famiglie di
+rischio elencate nel prompt di analisi: clausole penali, vessatorie, recesso,
+responsabilità e garanzie, GDPR. Ogni corrispondenza individua il passaggio (frase o
+paragrafo) che la contiene, con le posizioni nel testo estratto.
+
+In base a PRESCREEN_MODE il risultato serve a:
+- 'skip': non chiamare il modello per i documenti senza rischi rilevanti;
+- 'focus': inviare al modello solo l'intestazione e i passaggi segnalati
+  (senza passaggi segnalati il modello non viene chiamato);
+- 'off': nessun pre-screening.
+"""
+import json
+import re
+
+from .classifier import classify_contract_type
+from .models import MetricCounter
+from .utils import passage_bounds
+
+SEVERITY_ORDER = ['low', 'medium', 'high', 'critical']
+
+# (famiglia, gravità, termini, pattern, descrizione del rischio, raccomandazione): il pattern
+# viene applicato solo se nel testo compare almeno uno dei termini (filtro rapido con `in`)
+RISK_RULES = [
+    ('penali', 'high', ('penal',),
+     r'penal[ei]\b[^.;]{0,80}?(?:\b\d{2,}(?:[.,]\d+)?\s*%|per ogni giorno)',
+     "Penale di importo elevato o commisurata ai giorni di ritardo",
+     "Verificare la proporzionalità della penale e valutarne la riduzione (art. 1384 c.c.)"),
+    ('penali', 'medium', ('penal',),
+     r'\bclausola penale\b|\ba titolo di penale\b|\bpenal[ei]\b',
+     "Presenza di una clausola penale",
+     "Verificare importo, presupposti e cumulabilità con il risarcimento del danno"),
+    ('vessatorie', 'high', ('solve et repete', 'rinunci'),
+     r'\bsolve et repete\b|\brinunci\w* (?:a|ad) (?:eccepire|sollevare|proporre)\b',
+     "Limitazione della facoltà di opporre eccezioni",
+     "Clausola vessatoria: richiede approvazione specifica per iscritto (art. 1341 c.c.)"),
+    ('vessatorie', 'medium', ('1341', '1342', 'foro', 'tacit'),
+     r'\bartt?\.?\s*1341\b|\b1342 c\.?c\b|\bforo (?:competente )?esclusivo\b|'
+     r'\btacito rinnovo\b|\brinnov\w* tacitamente\b|\btacitamente rinnovat\w*',
+     "Clausole potenzialmente vessatorie (foro esclusivo, rinnovo tacito, approvazione specifica)",
+     "Verificare la doppia sottoscrizione e l'equilibrio della clausola"),
+    ('recesso', 'high', ('recedere', 'ad nutum'),
+     r'\brecedere\b[^.;]{0,80}?\b(?:in qualsiasi momento|senza preavviso|senza alcun preavviso)\b|\bad nutum\b',
+     "Recesso unilaterale senza preavviso o in qualsiasi momento",
+     "Negoziare un preavviso congruo e un indennizzo in caso di recesso"),
+    ('recesso', 'medium', ('recesso', 'recedere', 'preavviso'),
+     r'\bdiritto di recesso\b|\bfacoltà di recedere\b|\bpreavviso di (?:almeno )?\d+\s*(?:giorni|mesi)\b',
+     "Termini e condizioni di recesso",
+     "Verificare durata del preavviso e reciprocità del diritto di recesso"),
+    ('responsabilità', 'high', ('esclu', 'non risponde'),
+     r'\besclu\w+ (?:ogni |qualsiasi |qualunque )?(?:sua )?responsabilit\w*|\bnon risponde (?:in alcun caso|di alcun)',
+     "Esclusione di responsabilità",
+     "Le esclusioni per dolo o colpa grave sono nulle (art. 1229 c.c.): limitarne la portata"),
+    ('responsabilità', 'medium', ('limit', 'manlev', 'indenne'),
+     r'\blimit\w* (?:della |la )?responsabilit\w*|\bmanlev\w*|\btenere indenne\b',
+     "Limitazione di responsabilità o obbligo di manleva",
+     "Verificare massimali, esclusioni e reciprocità degli obblighi di manleva"),
+    ('gdpr', 'high', ('trasferiment',),
+     r'\btrasferiment\w*[^.;]{0,80}?\b(?:paesi terzi|extra[- ]?ue|al di fuori dell\'unione europea)',
+     "Trasferimento di dati personali fuori dall'Unione Europea",
+     "Verificare le garanzie previste dagli artt. 44-49 GDPR (clausole contrattuali standard)"),
+    ('gdpr', 'low', ('dati personali', 'gdpr', '2016/679', 'trattamento dei dati'),
+     r'\bdati personali\b|\bgdpr\b|\b(?:regolamento (?:\(ue\) |ue )?)?2016/679\b|\btrattamento dei dati\b',
+     "Trattamento di dati personali",
+     "Verificare la nomina del responsabile del trattamento (art. 28 GDPR) e le misure di sicurezza"),
+]
+
+COMPILED_RULES = [
+    (family, severity, triggers, re.compile(pattern, re.IGNORECASE), risk, recommendation)
+    for family, severity, triggers, pattern, risk, recommendation in RISK_RULES
+]
+
+# Passaggi conservati per famiglia di rischio (i più gravi): evita elenchi di clausole ripetitive
+MAX_FINDINGS_PER_FAMILY = 5
+
+COUNTER_SKIPPED = 'prescreen.llm_skipped'
+COUNTER_FOCUSED = 'prescreen.llm_focused'
+COUNTER_FULL = 'prescreen.llm_full'
+COUNTER_CHARS_SAVED = 'prescreen.chars_saved'
+
+def _severity_rank(severity):
+    return SEVERITY_ORDER.index(severity) if severity in SEVERITY_ORDER else 0
+
+
+class PrescreenResult:
+    def __init__(self, text, findings):
+        self.text = text
+        self.findings = findings
+        # Passaggi tolti dai risultati perché già valutati nella libreria delle clausole
+        self.reused = 0
+
+    @property
+    def max_severity(self):
+        if not self.findings:
+            return None
+        return max((finding['severity'] for finding in self.findings), key=_severity_rank)
+
+    def is_low_risk(self, max_severity='low'):
+        """Nessun passaggio oltre la gravità indicata"""
+        return all(_severity_rank(finding['severity']) <= _severity_rank(max_severity) for finding in self.findings)
+
+    def excerpt(self, head_chars):
+        """Intestazione del contratto (parti, oggetto, durata) più i passaggi segnalati, in ordine"""
+        spans = [(0, min(head_chars, len(self.text)))]
+        for finding in sorted(self.findings, key=lambda finding: finding['start']):
+            start, end = finding['start'], finding['end']
+            if start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+            else:
+                spans.append((start, end))
+        return '\n[...]\n'.join(self.text[start:end].strip() for start, end in spans)
+
+    def local_response(self):
+        """Risposta nel formato JSON dell'analisi AI, per i documenti non inviati al modello"""
+        return json.dumps({
+            'contract_type': classify_contract_type(self.text),
+            'parties': '',
+            'duration': '',
+            'key_obligations': '',
+            'risk_level': 'low',
+            'risk_clauses': [],
+            'deadlines': [],
+            'summary': (
+                "Analisi AI non eseguita: il pre-screening locale non ha rilevato clausole a rischio "
+                f"({len(self.findings)} passaggi a basso rischio"
+                + (f", {self.reused} riconosciuti nella libreria delle clausole già valutate" if self.reused else "")
+                + ")."
+            ),
+        }, ensure_ascii=False)
+
+
+def prescreen_text(text):
+    """Applica le regole al testo: un risultato per passaggio, con la gravità più alta trovata"""
+    lowered = text.lower()
+    passages = {}
+
+    for family, severity, triggers, pattern, risk, recommendation in COMPILED_RULES:
+        if not any(trigger in lowered for trigger in triggers):
+            continue
+        for match in pattern.finditer(text):
+            start, end = passage_bounds(text, match.start(), match.end())
+            previous = passages.get(start)
+            if previous is not None and _severity_rank(previous['severity']) >= _severity_rank(severity):
+                continue
+            passages[start] = {
+                'family': family,
+                'severity': severity,
+                'start': start,
+                'end': end,
+                'clause': text[start:end],
+                'risk': risk,
+                'recommendation': recommendation,
+            }
+
+    by_family = {}
+    seen = set()
+    for finding in sorted(passages.values(), key=lambda finding: (-_severity_rank(finding['severity']), finding['start'])):
+        # Passaggi identici (testi ripetuti) vengono segnalati una sola volta
+        key = (finding['family'], ' '.join(finding['clause'].lower().split()))
+        family_findings = by_family.setdefault(finding['family'], [])
+        if key in seen or len(family_findings) >= MAX_FINDINGS_PER_FAMILY:
+            continue
+        seen.add(key)
+        family_findings.append(finding)
+
+    findings = sorted(
+        (finding for family_findings in by_family.values() for finding in family_findings),
+        key=lambda finding: finding['start'],
+    )
+    return PrescreenResult(text, findings)
+
+def record_outcome(counter, chars_saved=0):
+    MetricCounter.increment(counter)
+    if chars_saved:
+        MetricCounter.increment(COUNTER_CHARS_SAVED, chars_saved)
+
+def prescreen_stats():
+    """Quante analisi hanno evitato o ridotto la chiamata al modello"""
+    skipped = MetricCounter.get_value(COUNTER_SKIPPED)
+    focused = MetricCounter.get_value(COUNTER_FOCUSED)
+    full = MetricCounter.get_value(COUNTER_FULL)
+    total = skipped + focused + full
+    return {
+        'screened': total,
+        'llm_skipped': skipped,
+        'llm_focused': focused,
+        'llm_full': full,
+        'skip_ratio': skipped / total if total else 0.0,
+        'chars_saved': MetricCounter.get_value(COUNTER_CHARS_SAVED),
+    }
@@ -0,0 +1,335 @@
+"""Interpretazione tollerante delle risposte del modello AI.
+
+Le risposte dovrebbero contenere solo l'oggetto JSON richiesto dal prompt, ma spesso
+includono testo introduttivo, blocchi ```json, virgole finali o vengono troncate dal
+limite di token. Il parser:
+- individua l'oggetto JSON all'interno del testo;
+- ripara i difetti più comuni (virgole finali, a capo non escapati nelle stringhe,
+  letterali Python, stringhe e parentesi non chiuse);
+- normalizza il risultato secondo lo schema del prompt di analisi.
+
+IncrementalAnalysisParser consuma invece una risposta in streaming e restituisce
+ogni clausola rischiosa o scadenza non appena il relativo oggetto è completo.
+"""
+import json
+
+from .models import MetricCounter
+
+SEVERITY_ORDER = ['low', 'medium', 'high', 'critical']
+
+# Valori di gravità restituiti dal modello in italiano o con grafie diverse
+SEVERITY_ALIASES = {
+    'bassa': 'low', 'basso': 'low', 'lieve': 'low',
+    'media': 'medium', 'medio': 'medium', 'moderata': 'medium', 'moderato': 'medium',
+    'alta': 'high', 'alto': 'high', 'elevata': 'high', 'elevato': 'high', 'grave': 'high',
+    'critica': 'critical', 'critico': 'critical',
+}
+
+# Campi testuali di primo livello e campi degli elementi delle liste, come nel prompt
+TEXT_FIELDS = ('contract_type', 'parties', 'duration', 'key_obligations', 'summary')
+CLAUSE_FIELDS = ('clause', 'risk', 'recommendation')
+DEADLINE_FIELDS = ('description', 'timeframe')
+LIST_FIELDS = ('risk_clauses', 'deadlines')
+
+# Tentativi di troncamento all'ultimo elemento completo per le risposte interrotte
+MAX_TRUNCATION_ATTEMPTS = 20
+
+COUNTER_PARSED = 'ai_response.parsed'
+COUNTER_REPAIRED = 'ai_response.repaired'
+COUNTER_FAILED = 'ai_response.failed'
+
+
+class InvalidAIResponse(ValueError):
+    """Risposta AI non interpretabile come analisi"""
+
+
+def extract_json_object(text):
+    """Testo dell'oggetto JSON contenuto nella risposta: dalla prima '{' alla parentesi corrispondente
+    (o fino alla fine del testo, se la risposta è troncata)"""
+    start = text.find('{')
+    if start < 0:
+        raise InvalidAIResponse("Nessun oggetto JSON nella risposta")
+
+    depth = 0
+    in_string = escape = False
+    for position in range(start, len(text)):
+        char = text[position]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return text[start:position + 1]
+    return text[start:]
+
+def repair_json(candidate):
+    """Corregge i difetti più comuni del JSON generato dal modello.
+
+    Restituisce i testi candidati in ordine di preferenza. Per una risposta troncata si
+    preferisce fermarsi all'ultimo elemento completo piuttosto che chiudere a metà una
+    clausola; il testo con stringhe e parentesi chiuse resta l'ultima alternativa.
+    """
+    output = []
+    stack = []
+    cut_points = []
+    in_string = escape = False
+    position = 0
+    length = len(candidate)
+
+    while position < length:
+        char = candidate[position]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == '\n':
+                char = '\\n'
+            elif char == '\r':
+                char = '\\r'
+            elif char == '\t':
+                char = '\\t'
+            elif char < ' ':
+                char = ''
+            output.append(char)
+            position += 1
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            # Virgola finale prima della chiusura: {"a": 1,} -> {"a": 1}
+            while output and output[-1].isspace():
+                output.pop()
+            if output and output[-1] == ',':
+                output.pop()
+            if stack:
+                stack.pop()
+        elif char == ',':
+            # Indice nella lista degli elementi (non nella stringa): gli elementi precedenti
+            # non vengono più modificati, gli escape e i letterali occupano più caratteri
+            cut_points.append((len(output), ''.join(reversed(stack))))
+        elif char.isalpha():
+            # Letterali Python (True, False, None) al posto di quelli JSON
+            end = position
+            while end < length and candidate[end].isalpha():
+                end += 1
+            word = candidate[position:end]
+            output.append({'True': 'true', 'False': 'false', 'None': 'null'}.get(word, word))
+            position = end
+            continue
+        output.append(char)
+        position += 1
+
+    truncated = in_string or bool(stack)
+
+    # Risposta troncata: chiude la stringa aperta e le parentesi rimaste
+    if in_string:
+        if escape:
+            output.pop()
+        output.append('"')
+    while output and (output[-1].isspace() or output[-1] in ',:'):
+        output.pop()
+    output.append(''.join(reversed(stack)))
+
+    repaired = ''.join(output)
+    if not truncated:
+        return [repaired]
+    truncations = [
+        ''.join(output[:end]) + closing for end, closing in reversed(cut_points[-MAX_TRUNCATION_ATTEMPTS:])
+    ]
+    return truncations + [repaired]
+
+def load_json(text):
+    """Dizionario contenuto nella risposta e indicazione se è stato necessario ripararlo"""
+    stripped = text.strip()
+    try:
+        data = json.loads(stripped)
+    except json.JSONDecodeError:
+        pass
+    else:
+        if isinstance(data, dict):
+            return data, False
+
+    for candidate in repair_json(extract_json_object(stripped)):
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data, True
+    raise InvalidAIResponse("JSON non valido anche dopo la riparazione")
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return '\n'.join(_text(item) for item in value if item not in (None, ''))
+    if isinstance(value, dict):
+        return '; '.join(f"{key}: {_text(item)}" for key, item in value.items())
+    return str(value).strip()
+
+def normalize_severity(value, default='low'):
+    severity = _text(value).lower()
+    severity = SEVERITY_ALIASES.get(severity, severity)
+    return severity if severity in SEVERITY_ORDER else default
+
+def normalize_clause(data):
+    """Clausola rischiosa nel formato del prompt, o None se priva di testo"""
+    if isinstance(data, str):
+        data = {'clause': data}
+    if not isinstance(data, dict):
+        return None
+    clause = {field: _text(data.get(field)) for field in CLAUSE_FIELDS}
+    clause['severity'] = normalize_severity(data.get('severity'))
+    return clause if clause['clause'] else None
+
+def normalize_deadline(data):
+    """Scadenza nel formato del prompt, o None se priva di descrizione"""
+    if isinstance(data, str):
+        data = {'description': data}
+    if not isinstance(data, dict):
+        return None
+    deadline = {field: _text(data.get(field)) for field in DEADLINE_FIELDS}
+    return deadline if deadline['description'] else None
+
+NORMALIZERS = {'risk_clauses': normalize_clause, 'deadlines': normalize_deadline}
+
+def normalize_analysis(data):
+    """Analisi con tutte le chiavi del prompt e valori dei tipi attesi"""
+    analysis = {field: _text(data.get(field)) for field in TEXT_FIELDS}
+    analysis['risk_level'] = normalize_severity(data.get('risk_level'), default='medium')
+    for field, normalize in NORMALIZERS.items():
+        items = data.get(field) or []
+        if not isinstance(items, list):
+            items = [items]
+        analysis[field] = [item for item in map(normalize, items) if item is not None]
+    return analysis
+
+def parse_ai_response(ai_response):
+    """Converte la risposta AI nel dizionario dell'analisi (solleva InvalidAIResponse se non valida)"""
+    data, _ = load_json(ai_response)
+    return normalize_analysis(data)
+
+def record_parse_outcome(ai_response):
+    """Registra l'esito dell'interpretazione di una risposta del modello (pulita, riparata o non valida)"""
+    try:
+        _, repaired = load_json(ai_response)
+    except InvalidAIResponse:
+        MetricCounter.increment(COUNTER_FAILED)
+        return False
+    MetricCounter.increment(COUNTER_REPAIRED if repaired else COUNTER_PARSED)
+    return True
+
+def parse_stats():
+    """Quota di risposte del modello interpretate direttamente, dopo riparazione o non valide"""
+    parsed = MetricCounter.get_value(COUNTER_PARSED)
+    repaired = MetricCounter.get_value(COUNTER_REPAIRED)
+    failed = MetricCounter.get_value(COUNTER_FAILED)
+    total = parsed + repaired + failed
+    return {
+        'responses': total,
+        'parsed': parsed,
+        'repaired': repaired,
+        'failed': failed,
+        'success_ratio': round((parsed + repaired) / total, 4) if total else 0.0,
+    }
+
+
+class IncrementalAnalysisParser:
+    """Parser di una risposta in streaming: feed() restituisce le clausole rischiose e le
+    scadenze completate dal frammento ricevuto, come coppie (campo, elemento normalizzato)"""
+
+    def __init__(self):
+        self.chunks = []
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key_chars = None
+        self.last_string = None
+        self.key = None
+        self.list_field = None
+        self.item_chars = None
+
+    @property
+    def text(self):
+        return ''.join(self.chunks)
+
+    def feed(self, chunk):
+        self.chunks.append(chunk)
+        completed = []
+
+        for char in chunk:
+            if self.item_chars is not None:
+                self.item_chars.append(char)
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.key_chars is not None:
+                        self.last_string = ''.join(self.key_chars)
+                        self.key_chars = None
+                    continue
+                if self.key_chars is not None:
+                    self.key_chars.append(char)
+                continue
+
+            if not self.started:
+                # Testo che precede l'oggetto JSON (introduzione, ```json)
+                if char == '{':
+                    self.started = True
+                    self.depth = 1
+                continue
+
+            if char == '"':
+                self.in_string = True
+                # Solo le stringhe di primo livello possono essere chiavi rilevanti
+                self.key_chars = [] if self.depth == 1 else None
+            elif char == ':' and self.depth == 1:
+                self.key = self.last_string
+            elif char in '{[':
+                self.depth += 1
+                if char == '[' and self.depth == 2:
+                    self.list_field = self.key if self.key in LIST_FIELDS else None
+                elif char == '{' and self.depth == 3 and self.list_field:
+                    self.item_chars = ['{']
+            elif char in '}]':
+                self.depth -= 1
+                if char == '}' and self.depth == 2 and self.item_chars is not None:
+                    item = self._load_item(''.join(self.item_chars))
+                    if item is not None:
+                        completed.append((self.list_field, item))
+                    self.item_chars = None
+                elif self.depth == 1:
+                    self.list_field = None
+
+        return completed
+
+    def _load_item(self, text):
+        try:
+            data, _ = load_json(text)
+        except InvalidAIResponse:
+            return None
+        return NORMALIZERS[self.list_field](data)
+
+    def finish(self):
+        """Analisi completa dalla risposta accumulata (solleva InvalidAIResponse se non valida)"""
+        return parse_ai_response(self.text)
@@ -0,0 +1,138 @@
+"""Ricerca full-text sui contratti.
+
+L'indice copre titolo, parti, testo delle clausole rischiose e testo estratto:
+- SQLite: tabella virtuale FTS5 (analyzer_contractsearch_fts) sincronizzata da trigger;
+  lo stemming italiano è applicato in Python prima dell'indicizzazione e sulla query.
+- Postgres: indice GIN sull'espressione tsvector con configurazione 'italian'.
+Su altri database si ripiega su una ricerca icontains.
+"""
+import re
+import unicodedata
+from django.db import connection
+from django.db.models import Q
+
+from .models import Contract, ContractSearchDocument
+
+WORD_RE = re.compile(r'\w+')
+
+# Deve coincidere con l'espressione dell'indice GIN creato dalla migrazione
+PG_VECTOR_SQL = (
+    "setweight(to_tsvector('italian', title), 'A') || "
+    "setweight(to_tsvector('italian', parties), 'B') || "
+    "setweight(to_tsvector('italian', clauses), 'B') || "
+    "setweight(to_tsvector('italian', body), 'C')"
+)
+
+# Pesi bm25 delle colonne FTS5 (title, parties, clauses, body)
+FTS_WEIGHTS = (10.0, 5.0, 5.0, 1.0)
+
+
+def stem_italian(word):
+    """Stemmer leggero per l'italiano (J. Savoy): rimuove accenti e desinenze di genere e numero"""
+    word = ''.join(
+        char for char in unicodedata.normalize('NFD', word)
+        if unicodedata.category(char) != 'Mn'
+    )
+    if len(word) < 6:
+        return word
+
+    last, previous = word[-1], word[-2]
+    if last in 'ei' and previous in 'hi':
+        return word[:-2]
+    if last in 'ao' and previous == 'i':
+        return word[:-2]
+    if last in 'eiao':
+        return word[:-1]
+    return word
+
+
+def stem_text(text):
+    return ' '.join(stem_italian(word) for word in WORD_RE.findall(text.lower()))
+
+
+# Colonne del documento di ricerca
+DOCUMENT_COLUMNS = ('title', 'parties', 'clauses', 'body')
+
+
+def _document_fields(contract, clause_texts, columns=DOCUMENT_COLUMNS):
+    fields = {}
+    for column in columns:
+        if column == 'clauses':
+            fields[column] = '\n'.join(clause_texts)
+        elif column == 'body':
+            fields[column] = contract.extracted_text
+        else:
+            fields[column] = getattr(contract, column)
+    if connection.vendor == 'sqlite':
+        fields = {name: stem_text(value) for name, value in fields.items()}
+    return fields
+
+
+def index_contract(contract, columns=None):
+    """Aggiorna il documento di ricerca del contratto. Con columns vengono ricalcolate solo le
+    colonne indicate (il testo estratto, la parte costosa, solo se compare 'body')"""
+    clause_texts = contract.risk_clauses.values_list('clause_text', flat=True)
+    if columns is not None:
+        # Senza documento (contratto precedente all'indice) lo si crea completo
+        if ContractSearchDocument.objects.filter(contract=contract).update(**_document_fields(contract, clause_texts, columns)):
+            return
+    ContractSearchDocument.objects.update_or_create(
+        contract=contract,
+        defaults=_document_fields(contract, clause_texts),
+    )
+
+
+def index_contracts(contracts):
+    """Indicizza in blocco contratti appena creati (senza clausole, es. import massivo)"""
+    documents = [
+        ContractSearchDocument(contract=contract, **_document_fields(contract, []))
+        for contract in contracts
+    ]
+    ContractSearchDocument.objects.bulk_create(documents, ignore_conflicts=True)
+
+
+def rebuild_index(batch_size=500):
+    """Ricostruisce il documento di ricerca di tutti i contratti"""
+    count = 0
+    for contract in Contract.objects.prefetch_related('risk_clauses').iterator(chunk_size=batch_size):
+        ContractSearchDocument.objects.update_or_create(
+            contract=contract,
+            defaults=_document_fields(contract, [clause.clause_text for clause in contract.risk_clauses.all()]),
+        )
+        count += 1
+    return count
+
+
+def search_contracts(query, limit=100):
+    """Restituisce [(contract_id, rank)] in ordine di rilevanza decrescente"""
+    if not WORD_RE.search(query):
+        return []
+
+    if connection.vendor == 'sqlite':
+        # Ogni termine tra virgolette: la sintassi FTS5 dell'utente non viene interpretata
+        match = ' '.join(f'"{stem_italian(word)}"' for word in WORD_RE.findall(query.lower()))
+        sql = (
+            "SELECT rowid, bm25(analyzer_contractsearch_fts, %s, %s, %s, %s) AS rank "
+            "FROM analyzer_contractsearch_fts WHERE analyzer_contractsearch_fts MATCH %s "
+            "ORDER BY rank LIMIT %s"
+        )
+        params = [*FTS_WEIGHTS, match, limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # bm25 è negativo: valori più bassi indicano maggiore rilevanza
+            return [(contract_id, round(-rank, 6)) for contract_id, rank in cursor.fetchall()]
+
+    if connection.vendor == 'postgresql':
+        sql = (
+            f"SELECT contract_id, ts_rank({PG_VECTOR_SQL}, query) AS rank "
+            f"FROM analyzer_contractsearchdocument, websearch_to_tsquery('italian', %s) query "
+            f"WHERE ({PG_VECTOR_SQL}) @@ query ORDER BY rank DESC LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [query, limit])
+            return [(contract_id, round(rank, 6)) for contract_id, rank in cursor.fetchall()]
+
+    ids = Contract.objects.filter(
+        Q(title__icontains=query) | Q(parties__icontains=query) | Q(extracted_text__icontains=query)
+    ).values_list('id', flat=True)[:limit]
+    return [(contract_id, 1.0) for contract_id in ids]
@@ -1,20 +1,200 @@
-import openai
-from decouple import config
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .ai_client import ContractAIError, add_usage, get_ai_client
+from .classifier import classify_contract_type
+from .models import AnalysisCacheEntry, MetricCounter
+from .response_parser import IncrementalAnalysisParser, InvalidAIResponse, parse_ai_response, record_parse_outcome
+from .utils import split_into_chunks
+
+logger = logging.getLogger(__name__)
+
+# Modello e versione del prompt: entrambi fanno parte della chiave di cache,
+# incrementare PROMPT_VERSION a ogni modifica del prompt di analisi
+AI_MODEL = "gpt-3.5-turbo"
+PROMPT_VERSION = "2"
+
+SEVERITY_ORDER = ['low', 'medium', 'high', 'critical']
+
+def _severity_rank(severity):
+    return SEVERITY_ORDER.index(severity) if severity in SEVERITY_ORDER else 0
+
+def _dedup_key(value):
+    """Normalizza un testo per il riconoscimento dei duplicati tra parti diverse"""
+    return re.sub(r'\W+', ' ', str(value).lower()).strip()[:200]
+
+def merge_analyses(analyses):
+    """Unisce le analisi delle singole parti nel formato JSON di un'analisi completa"""
+    merged = {
+        'contract_type': '',
+        'parties': '',
+        'duration': '',
+        'key_obligations': '',
+        'risk_level': 'low',
+        'risk_clauses': [],
+        'deadlines': [],
+        'summary': '',
+    }
+    text_fields = {'duration': [], 'key_obligations': [], 'summary': []}
+    clauses = {}
+    deadlines = {}
+    
+    for analysis in analyses:
+        for field in ('contract_type', 'parties'):
+            if not merged[field] and analysis.get(field):
+                merged[field] = analysis[field]
+        
+        for field, values in text_fields.items():
+            value = str(analysis.get(field) or '').strip()
+            if value and value not in values:
+                values.append(value)
+        
+        if _severity_rank(analysis.get('risk_level')) > _severity_rank(merged['risk_level']):
+            merged['risk_level'] = analysis['risk_level']
+        
+        for clause in analysis.get('risk_clauses') or []:
+            key = _dedup_key(clause.get('clause', ''))
+            previous = clauses.get(key)
+            # In caso di duplicato si conserva la valutazione più grave
+            if previous is None or _severity_rank(clause.get('severity')) > _severity_rank(previous.get('severity')):
+                clauses[key] = clause
+        
+        for deadline in analysis.get('deadlines') or []:
+            deadlines.setdefault(_dedup_key(deadline.get('description', '')), deadline)
+    
+    for field, values in text_fields.items():
+        merged[field] = '\n'.join(values)
+    merged['risk_clauses'] = list(clauses.values())
+    merged['deadlines'] = list(deadlines.values())
+    
+    return merged
+
 
 class ContractAIService:
     
     @staticmethod
-    def analyze_contract(text):
-        """Analisi completa del contratto con AI"""
+    def analyze_contract(text, use_cache=True, excerpt=False, on_item=None, on_chunk=None, usage=None):
+        """Analisi completa del contratto con AI, riutilizzando i risultati in cache per testi identici.
+        Le coroutine on_item e on_chunk ricevono clausole e scadenze man mano che il modello le
+        completa e il numero di parti analizzate (fatte, totali); usage somma i token consumati."""
+        key = AnalysisCache.make_key(text, excerpt=excerpt)
         
-        # Configura OpenAI per la versione 0.28
-        openai.api_key = config('OPENAI_API_KEY')
+        if use_cache:
+            cached_response = AnalysisCache.get(key)
+            if cached_response is not None:
+                return cached_response
+        
+        started = time.monotonic()
+        ai_response = ContractAIService.request_analysis(
+            text, excerpt=excerpt, on_item=on_item, on_chunk=on_chunk, usage=usage,
+        )
+        AnalysisCache.set(key, ai_response, time.monotonic() - started)
+        
+        return ai_response
+    
+    @staticmethod
+    async def analyze_contract_async(text, use_cache=True):
+        """Versione asincrona di analyze_contract, per analizzare più contratti in parallelo"""
+        key = AnalysisCache.make_key(text)
         
-        prompt = f"""
-        Analizza questo contratto legale in italiano con la competenza di un avvocato specializzato in diritto civile e commerciale.
+        if use_cache:
+            cached_response = await sync_to_async(AnalysisCache.get)(key)
+            if cached_response is not None:
+                return cached_response
+        
+        started = time.monotonic()
+        ai_response = await ContractAIService.request_analysis_async(text)
+        await sync_to_async(AnalysisCache.set)(key, ai_response, time.monotonic() - started)
+        
+        return ai_response
+    
+    @staticmethod
+    def request_analysis(text, excerpt=False, on_item=None, on_chunk=None, usage=None):
+        """Chiamata sincrona al modello AI, eseguita sul loop del client condiviso dal processo"""
+        return get_ai_client().run_sync(ContractAIService.request_analysis_async(
+            text, excerpt=excerpt, on_item=on_item, on_chunk=on_chunk, usage=usage,
+        ))
+    
+    @staticmethod
+    async def request_analysis_async(text, excerpt=False, on_item=None, on_chunk=None, usage=None):
+        """Chiamata al modello AI: i contratti lunghi vengono divisi in parti analizzate in parallelo"""
+        chunks = split_into_chunks(text, settings.ANALYSIS_CHUNK_TOKENS)
+        
+        async def report_chunks(done):
+            if on_chunk is not None:
+                await on_chunk(done, max(len(chunks), 1))
+        
+        if len(chunks) <= 1:
+            await report_chunks(0)
+            response = await ContractAIService.complete(
+                ContractAIService.build_prompt(text, excerpt=excerpt), on_item=on_item, usage=usage,
+            )
+            await report_chunks(1)
+            return response
+        
+        prompts = [
+            ContractAIService.build_prompt(chunk, part=i, total=len(chunks))
+            for i, chunk in enumerate(chunks, start=1)
+        ]
+        
+        # Concorrenza limitata per documento: la latenza resta vicina a quella di una
+        # singola parte, mentre il client applica i limiti globali dell'API
+        semaphore = asyncio.Semaphore(settings.ANALYSIS_CHUNK_CONCURRENCY)
+        done = 0
+        await report_chunks(done)
+        
+        async def analyze_chunk(prompt):
+            nonlocal done
+            async with semaphore:
+                response = await ContractAIService.complete(prompt, on_item=on_item, usage=usage)
+            done += 1
+            await report_chunks(done)
+            return response
+        
+        responses = await asyncio.gather(*(analyze_chunk(prompt) for prompt in prompts))
+        
+        partial_analyses = []
+        for i, response in enumerate(responses, start=1):
+            try:
+                partial_analyses.append(parse_ai_response(response))
+            except InvalidAIResponse:
+                logger.warning(f"Risposta AI non valida per la parte {i}/{len(chunks)}, parte ignorata")
+        
+        if not partial_analyses:
+            return responses[0]
+        
+        return json.dumps(merge_analyses(partial_analyses), ensure_ascii=False)
+    
+    @staticmethod
+    def build_prompt(text, part=None, total=None, excerpt=False):
+        """Prompt di analisi per l'intero contratto, per una sua parte o per gli estratti del pre-screening"""
+        if excerpt:
+            scope = (
+                "Analizza gli estratti di un contratto legale (intestazione e passaggi segnalati "
+                "da un controllo automatico, separati da [...])"
+            )
+        elif part is None:
+            scope = "Analizza questo contratto legale"
+        else:
+            scope = (
+                f"Analizza la parte {part} di {total} di un contratto legale "
+                f"(le altre parti sono analizzate separatamente; riporta solo ciò che compare in questa parte)"
+            )
+        
+        return f"""
+        {scope} in italiano con la competenza di un avvocato specializzato in diritto civile e commerciale.
         
         TESTO DEL CONTRATTO:
-        {text[:4000]}
+        {text}
         
         Fornisci un'analisi strutturata in formato JSON con le seguenti chiavi:
         
@@ -50,41 +230,139 @@ class ContractAIService:
         - Responsabilità e garanzie
         - Compliance GDPR (se applicabile)
         """
+    
+    @staticmethod
+    async def complete(prompt, on_item=None, usage=None):
+        """Singola richiesta di completamento al modello, in streaming se AI_STREAM_RESPONSES è attivo"""
+        messages = [
+            {"role": "system", "content": "Sei un avvocato esperto in diritto civile e commerciale italiano. Analizza i contratti con precisione tecnica e linguaggio professionale ma accessibile."},
+            {"role": "user", "content": prompt}
+        ]
         
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Sei un avvocato esperto in diritto civile e commerciale italiano. Analizza i contratti con precisione tecnica e linguaggio professionale ma accessibile."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.3
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            return f"Errore nell'analisi AI: {str(e)}"
+        if settings.AI_STREAM_RESPONSES:
+            parser = IncrementalAnalysisParser()
+            async for delta in get_ai_client().chat_stream(
+                model=AI_MODEL, messages=messages, max_tokens=2000, temperature=0.3, usage=usage,
+            ):
+                for field, item in parser.feed(delta):
+                    if on_item is not None:
+                        await on_item(field, item)
+            content = parser.text
+        else:
+            response = await get_ai_client().chat(model=AI_MODEL, messages=messages, max_tokens=2000, temperature=0.3)
+            add_usage(usage, response.get('usage'))
+            try:
+                content = response['choices'][0]['message']['content']
+            except (KeyError, IndexError, TypeError):
+                content = None
+        
+        if not content:
+            raise ContractAIError("Risposta AI priva di contenuto")
+        await sync_to_async(record_parse_outcome)(content)
+        return content
     
     @staticmethod
     def extract_contract_type(text):
         """Identifica il tipo di contratto"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['compravendita', 'vendita', 'acquisto']):
-            return 'purchase'
-        elif any(word in text_lower for word in ['prestazione', 'servizio', 'consulenza', 'informatici', 'software', 'sviluppo', 'manutenzione']):
-            return 'service'
-        elif any(word in text_lower for word in ['lavoro', 'dipendente', 'assunzione']):
-            return 'employment'
-        elif any(word in text_lower for word in ['locazione', 'affitto', 'noleggio']):
-            return 'rental'
-        elif any(word in text_lower for word in ['riservatezza', 'confidenzialità', 'nda']):
-            return 'nda'
-        elif any(word in text_lower for word in ['partnership', 'collaborazione', 'joint']):
-            return 'partnership'
-        elif any(word in text_lower for word in ['licenza', 'concessione', 'diritti']):
-            return 'license'
-        else:
-            return 'other'
\ No newline at end of file
+        return classify_contract_type(text)
+
+
+class AnalysisCache:
+    """Cache su database delle risposte AI, indirizzata per contenuto"""
+    
+    HITS = 'analysis_cache.hits'
+    MISSES = 'analysis_cache.misses'
+    SAVED_MS = 'analysis_cache.saved_ms'
+    
+    @staticmethod
+    def make_key(text, excerpt=False):
+        """Il prompt dipende anche dalla divisione in parti e dalla modalità per estratti"""
+        payload = f"{PROMPT_VERSION}:{AI_MODEL}:{settings.ANALYSIS_CHUNK_TOKENS}:{int(excerpt)}\n{text}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _cutoff():
+        return timezone.now() - timedelta(days=settings.ANALYSIS_CACHE_MAX_AGE_DAYS)
+    
+    @staticmethod
+    def get(key):
+        """Restituisce la risposta in cache o None (conteggiando hit e miss)"""
+        entry = AnalysisCacheEntry.objects.filter(key=key, created_at__gte=AnalysisCache._cutoff()).first()
+        
+        if entry is None:
+            MetricCounter.increment(AnalysisCache.MISSES)
+            return None
+        
+        AnalysisCacheEntry.objects.filter(pk=entry.pk).update(
+            hit_count=F('hit_count') + 1,
+            last_used_at=timezone.now(),
+        )
+        MetricCounter.increment(AnalysisCache.HITS)
+        MetricCounter.increment(AnalysisCache.SAVED_MS, int(entry.analysis_seconds * 1000))
+        logger.info(f"Analisi riutilizzata dalla cache ({key[:12]})")
+        return entry.response
+    
+    @staticmethod
+    def set(key, ai_response, analysis_seconds=0):
+        """Memorizza una risposta valida ed applica la politica di eviction"""
+        try:
+            parse_ai_response(ai_response)
+        except InvalidAIResponse:
+            # Non memorizzare risposte non interpretabili: verrebbero riutilizzate per sempre
+            return
+        
+        AnalysisCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                'model_name': AI_MODEL,
+                'prompt_version': PROMPT_VERSION,
+                'response': ai_response,
+                'size': len(ai_response.encode('utf-8')),
+                'analysis_seconds': analysis_seconds,
+                'created_at': timezone.now(),
+                'last_used_at': timezone.now(),
+            }
+        )
+        AnalysisCache.evict()
+    
+    @staticmethod
+    def evict():
+        """Rimuove le voci scadute e, oltre la dimensione massima, le meno usate di recente"""
+        expired, _ = AnalysisCacheEntry.objects.filter(created_at__lt=AnalysisCache._cutoff()).delete()
+        
+        max_bytes = settings.ANALYSIS_CACHE_MAX_SIZE_MB * 1024 * 1024
+        total = AnalysisCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+        excess = total - max_bytes
+        
+        evicted_ids = []
+        if excess > 0:
+            entries = AnalysisCacheEntry.objects.order_by('last_used_at').values_list('id', 'size')
+            for entry_id, size in entries.iterator():
+                evicted_ids.append(entry_id)
+                excess -= size
+                if excess <= 0:
+                    break
+            AnalysisCacheEntry.objects.filter(id__in=evicted_ids).delete()
+        
+        return expired + len(evicted_ids)
+    
+    @staticmethod
+    def clear():
+        deleted, _ = AnalysisCacheEntry.objects.all().delete()
+        return deleted
+    
+    @staticmethod
+    def stats():
+        """Statistiche di utilizzo: hit/miss, hit ratio e tempo di analisi risparmiato"""
+        hits = MetricCounter.get_value(AnalysisCache.HITS)
+        misses = MetricCounter.get_value(AnalysisCache.MISSES)
+        totals = AnalysisCacheEntry.objects.aggregate(size=Sum('size'))
+        
+        return {
+            'entries': AnalysisCacheEntry.objects.count(),
+            'size_bytes': totals['size'] or 0,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'saved_seconds': round(MetricCounter.get_value(AnalysisCache.SAVED_MS) / 1000, 1),
+        }
\ No newline at end of file
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Contract
+from .search import index_contract
+from .stats import invalidate_dashboard_stats
+
+# Colonne del documento di ricerca che dipendono da ciascun campo del contratto
+# ('analyzed' cambia a ogni analisi, che sostituisce le clausole rischiose)
+SEARCH_FIELDS = {'title': 'title', 'parties': 'parties', 'analyzed': 'clauses', 'extracted_text': 'body'}
+
+
+@receiver(post_init, sender=Contract)
+def remember_indexed_text(sender, instance, **kwargs):
+    """Ricorda il testo caricato, per ristemmarlo solo quando cambia (None se il campo è differito)"""
+    instance._indexed_text = instance.__dict__.get('extracted_text')
+
+
+@receiver(post_save, sender=Contract)
+def update_search_index(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    """Mantiene sincronizzato l'indice full-text al salvataggio del contratto"""
+    if raw:
+        return
+    if update_fields is None:
+        columns = {'title', 'parties', 'clauses', 'body'}
+    else:
+        columns = {SEARCH_FIELDS[field] for field in update_fields if field in SEARCH_FIELDS}
+
+    text = instance.__dict__.get('extracted_text')
+    if not created and text == instance._indexed_text:
+        columns.discard('body')
+    if columns:
+        index_contract(instance, columns)
+        instance._indexed_text = text
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+def clear_dashboard_stats(sender, **kwargs):
+    """Le statistiche della dashboard vanno ricalcolate dopo ogni modifica ai contratti"""
+    invalidate_dashboard_stats()
@@ -0,0 +1,53 @@
+"""Statistiche della dashboard, calcolate con query aggregate e salvate nella cache di Django.
+
+La cache è invalidata al salvataggio/eliminazione di un contratto (signals.py); il timeout
+STATS_CACHE_TIMEOUT limita comunque il ritardo quando le modifiche avvengono in altri processi
+(worker con cache locale) o tramite bulk_create/update, che non emettono segnali.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Contract, AnalysisJob
+
+STATS_CACHE_KEY = 'analyzer:dashboard_stats'
+
+HIGH_RISK_LEVELS = ('high', 'critical')
+PENDING_JOB_STATUSES = ('queued', 'running')
+
+def compute_dashboard_stats():
+    """Tutti i contatori dei contratti in un'unica query aggregata, più quelli dei job"""
+    aggregates = {
+        'total': Count('pk'),
+        'analyzed': Count('pk', filter=Q(analyzed=True)),
+        'high_risk': Count('pk', filter=Q(risk_level__in=HIGH_RISK_LEVELS)),
+    }
+    for level, _ in Contract.RISK_LEVELS:
+        aggregates[f'risk_{level}'] = Count('pk', filter=Q(risk_level=level))
+    for contract_type, _ in Contract.CONTRACT_TYPES:
+        aggregates[f'type_{contract_type}'] = Count('pk', filter=Q(contract_type=contract_type))
+    counts = Contract.objects.aggregate(**aggregates)
+
+    jobs = AnalysisJob.objects.aggregate(
+        pending=Count('pk', filter=Q(status__in=PENDING_JOB_STATUSES)),
+        failed=Count('pk', filter=Q(status='failed')),
+    )
+
+    return {
+        'total_contracts': counts['total'],
+        'analyzed_contracts': counts['analyzed'],
+        'high_risk_contracts': counts['high_risk'],
+        'by_risk_level': {level: counts[f'risk_{level}'] for level, _ in Contract.RISK_LEVELS},
+        'by_contract_type': {
+            contract_type: counts[f'type_{contract_type}'] for contract_type, _ in Contract.CONTRACT_TYPES
+        },
+        'pending_jobs': jobs['pending'],
+        'failed_jobs': jobs['failed'],
+    }
+
+def get_dashboard_stats():
+    """Statistiche dalla cache, ricalcolate se assenti o scadute"""
+    return cache.get_or_set(STATS_CACHE_KEY, compute_dashboard_stats, settings.STATS_CACHE_TIMEOUT)
+
+def invalidate_dashboard_stats():
+    cache.delete(STATS_CACHE_KEY)
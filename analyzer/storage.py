@@ -0,0 +1,77 @@
+"""Archiviazione dei file dei contratti indirizzata per contenuto.
+
+Ogni file viene scritto a blocchi in un file temporaneo calcolandone lo SHA-256 e
+poi spostato (rinomina atomica) in <cartella>/<ab>/<sha256><estensione>: file
+identici caricati più volte occupano lo spazio una sola volta. Più contratti possono
+quindi condividere lo stesso file; Contract.delete lo rimuove solo quando nessun
+altro contratto lo usa e non è stato riscritto da un caricamento negli ultimi
+CONTRACT_FILE_GRACE_PERIOD secondi (il file viene salvato prima della riga del contratto).
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+CHUNK_SIZE = 1024 * 1024
+
+CONTENT_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?:\.\w+)?$')
+
+
+def content_hash(name):
+    """SHA-256 di un file archiviato per contenuto, dal suo nome (None per i nomi non indirizzati)"""
+    match = CONTENT_NAME_RE.search(name or '')
+    return match.group('digest') if match else None
+
+def written_recently(storage, name):
+    """True se il file è stato scritto (o riscritto da un caricamento identico) da meno di
+    CONTRACT_FILE_GRACE_PERIOD secondi: un contratto che lo usa potrebbe non essere ancora salvato"""
+    try:
+        modified = storage.get_modified_time(name)
+    except FileNotFoundError:
+        return False
+    return timezone.now() - modified < timedelta(seconds=settings.CONTRACT_FILE_GRACE_PERIOD)
+
+def content_name(name, digest):
+    """Nome definitivo: cartella del nome richiesto, prime due cifre dell'impronta, impronta ed estensione"""
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(posixpath.dirname(name), digest[:2], f'{digest}{extension}')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage che salva ogni contenuto una sola volta, con nome pari al suo SHA-256"""
+
+    def get_available_name(self, name, max_length=None):
+        # Il nome definitivo dipende dal contenuto: due file con lo stesso nome non si sovrascrivono
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(posixpath.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+
+        # Copia e impronta in un solo passaggio, senza tenere il file in memoria
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+
+            stored_name = content_name(name, digest.hexdigest())
+            stored_path = self.path(stored_name)
+            os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+            # Anche se il contenuto è già presente la rinomina lo ripristina, nel caso sia stato
+            # rimosso nel frattempo dall'eliminazione dell'ultimo contratto che lo usava
+            os.replace(temp_path, stored_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return stored_name
@@ -0,0 +1,316 @@
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AnalysisJob, Contract, RiskClause, Deadline
+from .clause_library import index_clauses, library_enabled, reuse_assessments, sign_clauses
+from .deadlines import extract_deadlines, parse_deadline_text
+from .metrics import StageTimer
+from .prescreen import COUNTER_FOCUSED, COUNTER_FULL, COUNTER_SKIPPED, prescreen_text, record_outcome
+from .response_parser import InvalidAIResponse, parse_ai_response
+from .services import ContractAIService
+from .utils import iter_text_from_file, iter_clean_text
+
+logger = logging.getLogger(__name__)
+
+def run_text_extraction(contract_id):
+    """Estrae e normalizza il testo del file caricato, registrandone i tempi"""
+    contract = Contract.objects.get(id=contract_id)
+
+    contract.extraction_status = 'running'
+    contract.extraction_started_at = timezone.now()
+    contract.save(update_fields=['extraction_status', 'extraction_started_at'])
+
+    started = time.monotonic()
+    timer = StageTimer(contract)
+    # Le pagine vengono normalizzate man mano: il testo grezzo completo non viene mai composto.
+    # Il tempo di lettura del file è misurato a parte e sottratto da quello della normalizzazione
+    with timer.measure('clean'):
+        contract.extracted_text = ''.join(iter_clean_text(
+            timer.timed_iter('extract', iter_text_from_file(contract.file.path)),
+            preserve_structure=settings.TEXT_PRESERVE_STRUCTURE,
+        ))
+    timer.add('clean', -timer.timings.get('extract', 0.0))
+
+    contract.extraction_status = 'done'
+    contract.extraction_finished_at = timezone.now()
+    contract.extraction_seconds = round(time.monotonic() - started, 3)
+    contract.extraction_error = ''
+    contract.save(update_fields=[
+        'extracted_text', 'extraction_status', 'extraction_finished_at',
+        'extraction_seconds', 'extraction_error',
+    ])
+    timer.save()
+    return contract
+
+def record_extraction_failure(contract_id, error):
+    """Registra sul contratto un'estrazione del testo fallita definitivamente"""
+    Contract.objects.filter(id=contract_id).update(
+        extraction_status='failed',
+        extraction_finished_at=timezone.now(),
+        extraction_error=str(error),
+    )
+
+def analyze_contract_ai(contract_id, use_cache=True):
+    """Analizza il contratto con AI, registrando l'errore sul contratto in caso di fallimento"""
+    try:
+        run_contract_analysis(contract_id, use_cache=use_cache)
+    except Exception as e:
+        logger.error(f"Errore nell'analisi AI del contratto {contract_id}: {str(e)}")
+        record_analysis_failure(contract_id, e)
+
+def run_contract_analysis(contract_id, use_cache=True):
+    """Esegue l'analisi AI del contratto, propagando gli errori al chiamante"""
+    contract = Contract.objects.get(id=contract_id)
+
+    if not contract.extracted_text:
+        raise Exception("Testo non disponibile per l'analisi")
+
+    timer = StageTimer(contract)
+
+    # Pre-screening locale: può evitare la chiamata AI o ridurre il testo inviato
+    screening = None
+    library_clauses = []
+    if settings.PRESCREEN_MODE != 'off':
+        with timer.measure('prescreen'):
+            screening = prescreen_text(contract.extracted_text)
+        if library_enabled():
+            # Passaggi quasi identici a clausole già valutate in altri contratti
+            with timer.measure('library'):
+                library_clauses = reuse_assessments(contract, screening)
+    
+    # Analisi AI: l'avanzamento (e con lo streaming ogni clausola) viene salvato man mano
+    progress = AnalysisProgress(contract)
+    progress.save()
+    with timer.measure('ai'):
+        ai_response = request_contract_analysis(
+            contract.extracted_text, screening, use_cache,
+            on_item=sync_to_async(progress.item), on_chunk=sync_to_async(progress.chunk_done),
+            usage=timer.usage,
+        )
+
+    # Salva sempre la risposta grezza per debug
+    contract.ai_analysis = ai_response
+
+    risk_clauses = []
+    deadlines = []
+
+    try:
+        # Parsing della risposta JSON
+        ai_data = parse_ai_response(ai_response)
+
+        # Aggiorna il contratto con i risultati
+        contract.contract_type = ContractAIService.extract_contract_type(contract.extracted_text)
+        contract.parties = ai_data.get('parties', '')
+        contract.duration = ai_data.get('duration', '')
+        contract.key_obligations = ai_data.get('key_obligations', '')
+
+        # Clausole rischiose e scadenze, salvate in blocco più avanti
+        risk_clauses = [build_risk_clause(contract, clause_data) for clause_data in ai_data.get('risk_clauses', [])]
+        risk_clauses += uncovered_clauses(library_clauses, risk_clauses)
+
+        deadlines = [
+            Deadline(
+                contract=contract,
+                description=deadline_data.get('description', '')[:500],
+                **parse_ai_deadline(contract, deadline_data),
+            )
+            for deadline_data in ai_data.get('deadlines', [])
+        ]
+
+        # Calcola livello di rischio in base alle clausole trovate
+        high_risk_count = sum(1 for clause in risk_clauses if clause.severity in ['high', 'critical'])
+        if high_risk_count >= 3:
+            contract.risk_level = 'critical'
+        elif high_risk_count >= 2:
+            contract.risk_level = 'high'
+        elif high_risk_count >= 1:
+            contract.risk_level = 'medium'
+        else:
+            contract.risk_level = 'low'
+
+    except InvalidAIResponse as e:
+        logger.warning(f"Risposta AI non interpretabile per il contratto {contract.id} ({e}): {ai_response[:500]}")
+        # Se la risposta non contiene un'analisi, usa valori di default
+        risk_clauses = list(library_clauses)
+        contract.risk_level = 'medium'
+        contract.contract_type = ContractAIService.extract_contract_type(contract.extracted_text)
+
+    if screening is not None:
+        risk_clauses += prescreen_clauses(contract, screening, risk_clauses)
+
+    deadlines += text_deadlines(contract)
+
+    with timer.measure('persist'):
+        save_analysis_results(contract, risk_clauses, deadlines)
+    timer.save()
+
+def build_risk_clause(contract, clause_data):
+    return RiskClause(
+        contract=contract,
+        clause_text=clause_data.get('clause', ''),
+        risk_description=clause_data.get('risk', ''),
+        severity=clause_data.get('severity', 'low'),
+        recommendation=clause_data.get('recommendation', ''),
+        **locate_clause(contract.extracted_text, clause_data.get('clause', '')),
+    )
+
+class AnalysisProgress:
+    """Avanzamento dell'analisi AI, salvato sul job in esecuzione e trasmesso alla pagina di dettaglio.
+
+    Con le risposte in streaming ogni clausola rischiosa viene salvata appena il modello la
+    completa: alla prima i risultati dell'analisi precedente vengono rimossi, al termine
+    save_analysis_results sostituisce comunque tutte le clausole con l'elenco definitivo. Se
+    l'analisi fallisce definitivamente le clausole parziali sono rimosse da record_analysis_failure.
+    """
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.state = {'chunks_done': 0, 'chunks_total': 0, 'clauses': 0}
+        self.replaced = False
+
+    def save(self):
+        AnalysisJob.objects.filter(
+            contract=self.contract, stage='analyze', status='running',
+        ).update(progress=dict(self.state))
+
+    def chunk_done(self, done, total):
+        self.state.update(chunks_done=done, chunks_total=total)
+        self.save()
+
+    def item(self, field, item):
+        if field != 'risk_clauses':
+            return
+        with transaction.atomic():
+            if not self.replaced:
+                self.contract.risk_clauses.all().delete()
+                self.replaced = True
+            build_risk_clause(self.contract, item).save()
+        self.state['clauses'] += 1
+        self.save()
+
+def deadline_reference_date(contract):
+    # In assenza della data di sottoscrizione, i termini "dalla firma" decorrono dal caricamento
+    return timezone.localdate(contract.uploaded_at)
+
+def parse_ai_deadline(contract, deadline_data):
+    """Data e giorni di preavviso di una scadenza dell'analisi AI, ricavati da descrizione e periodo"""
+    text = f"{deadline_data.get('description', '')}. {deadline_data.get('timeframe', '')}"
+    found_date, days = parse_deadline_text(text, deadline_reference_date(contract))
+    return {'date': found_date, 'days_notice': days}
+
+def text_deadlines(contract):
+    """Scadenze estratte localmente dal testo del contratto"""
+    return [
+        Deadline(
+            contract=contract,
+            description=deadline['description'][:500],
+            date=deadline['date'],
+            days_notice=deadline['days_notice'],
+            source='text',
+        )
+        for deadline in extract_deadlines(contract.extracted_text, deadline_reference_date(contract))
+    ]
+
+def request_contract_analysis(text, screening, use_cache=True, on_item=None, on_chunk=None, usage=None):
+    """Risposta AI per il testo, applicando la modalità di pre-screening configurata"""
+    callbacks = {'on_item': on_item, 'on_chunk': on_chunk, 'usage': usage}
+    if screening is None:
+        return ContractAIService.analyze_contract(text, use_cache=use_cache, **callbacks)
+    
+    if settings.PRESCREEN_MODE == 'focus':
+        if not screening.findings:
+            record_outcome(COUNTER_SKIPPED, len(text))
+            return screening.local_response()
+        excerpt = screening.excerpt(settings.PRESCREEN_HEAD_CHARS)
+        if len(excerpt) < len(text):
+            record_outcome(COUNTER_FOCUSED, len(text) - len(excerpt))
+            return ContractAIService.analyze_contract(excerpt, use_cache=use_cache, excerpt=True, **callbacks)
+    elif screening.is_low_risk(settings.PRESCREEN_SKIP_MAX_SEVERITY):
+        record_outcome(COUNTER_SKIPPED, len(text))
+        return screening.local_response()
+    
+    record_outcome(COUNTER_FULL)
+    return ContractAIService.analyze_contract(text, use_cache=use_cache, **callbacks)
+
+def locate_clause(text, clause_text):
+    """Posizione della clausola nel testo estratto, se il modello l'ha riportata testualmente"""
+    clause_text = clause_text.strip()
+    start = text.find(clause_text) if clause_text else -1
+    if start < 0:
+        return {}
+    return {'start_offset': start, 'end_offset': start + len(clause_text)}
+
+def uncovered_clauses(candidates, clauses):
+    """Clausole candidate che non si sovrappongono nel testo a quelle già trovate"""
+    covered = [(clause.start_offset, clause.end_offset) for clause in clauses if clause.start_offset is not None]
+    return [
+        candidate for candidate in candidates
+        if not any(start < candidate.end_offset and candidate.start_offset < end for start, end in covered)
+    ]
+
+def prescreen_clauses(contract, screening, ai_clauses):
+    """Candidati del pre-screening come RiskClause, esclusi i passaggi già coperti dall'AI"""
+    covered = [
+        (clause.start_offset, clause.end_offset) for clause in ai_clauses
+        if clause.start_offset is not None
+    ]
+    return [
+        RiskClause(
+            contract=contract,
+            clause_text=finding['clause'],
+            risk_description=finding['risk'],
+            severity=finding['severity'],
+            recommendation=finding['recommendation'],
+            source='prescreen',
+            start_offset=finding['start'],
+            end_offset=finding['end'],
+        )
+        for finding in screening.findings
+        if not any(start < finding['end'] and finding['start'] < end for start, end in covered)
+    ]
+
+def save_analysis_results(contract, risk_clauses, deadlines):
+    """Salva contratto, clausole e scadenze in un'unica transazione.
+
+    I risultati precedenti vengono sostituiti, così un job ripetuto dopo un
+    errore o un timeout non duplica le clausole.
+    """
+    contract.analyzed = True
+    contract.analysis_date = timezone.now()
+    # Nuova versione dei risultati: la pagina di dettaglio in cache non è più valida
+    contract.analysis_version = F('analysis_version') + 1
+
+    if library_enabled():
+        sign_clauses(risk_clauses)
+
+    with transaction.atomic():
+        contract.risk_clauses.all().delete()
+        contract.deadlines.all().delete()
+        RiskClause.objects.bulk_create(risk_clauses)
+        if library_enabled():
+            index_clauses(risk_clauses)
+        Deadline.objects.bulk_create(deadlines)
+        contract.save()
+    contract.refresh_from_db(fields=['analysis_version'])
+
+def record_analysis_failure(contract_id, error):
+    """Registra sul contratto l'esito di un'analisi fallita definitivamente, rimuovendo le
+    clausole già salvate durante lo streaming"""
+    try:
+        contract = Contract.objects.get(id=contract_id)
+        contract.ai_analysis = f"Errore nell'analisi automatica: {str(error)}"
+        contract.analyzed = True
+        contract.analysis_date = timezone.now()
+        contract.risk_level = 'medium'
+        contract.contract_type = 'other'
+        contract.analysis_version = F('analysis_version') + 1
+        with transaction.atomic():
+            contract.risk_clauses.all().delete()
+            contract.save()
+    except Contract.DoesNotExist:
+        logger.error(f"Contratto {contract_id} non trovato durante gestione errore")
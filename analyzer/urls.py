@@ -6,5 +6,15 @@ urlpatterns = [
     path('upload/', views.upload_contract, name='upload_contract'),
     path('contracts/', views.ContractListView.as_view(), name='contract_list'),
     path('contracts/<int:pk>/', views.ContractDetailView.as_view(), name='contract_detail'),
+    path('api/contracts/', views.contract_list_api, name='contract_list_api'),
+    path('api/contracts/<int:pk>/', views.contract_detail_api, name='contract_detail_api'),
+    path('deadlines/', views.upcoming_deadlines, name='upcoming_deadlines'),
+    path('api/deadlines/', views.upcoming_deadlines_api, name='upcoming_deadlines_api'),
+    path('stats/', views.dashboard_stats, name='dashboard_stats'),
+    path('metrics', views.metrics, name='metrics'),
+    path('search/', views.search_api, name='search_api'),
+    path('contracts/<int:pk>/status/', views.contract_status, name='contract_status'),
+    path('contracts/<int:pk>/events/', views.contract_events, name='contract_events'),
+    path('contracts/<int:pk>/download/', views.download_contract, name='download_contract'),
     path('contracts/<int:pk>/reanalyze/', views.reanalyze_contract, name='reanalyze_contract'),
 ]
\ No newline at end of file
@@ -1,59 +1,317 @@
+import hashlib
+import multiprocessing
 import os
-from docx import Document
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
 import PyPDF2
+from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 
-def extract_text_from_file(file_path):
-    """Estrae testo da PDF o DOCX"""
+from .docx_text import iter_docx_paragraphs
+
+class ExtractionLimitError(Exception):
+    """Superato il budget di tempo o memoria previsto per un documento"""
+
+
+def extract_text_from_file(file_path, mode=None):
+    """Estrae testo da PDF o DOCX (mode: 'serial', 'parallel' o 'auto' per i PDF)"""
+    return ''.join(iter_text_from_file(file_path, mode=mode))
+
+def iter_text_from_file(file_path, mode=None):
+    """Genera il testo di PDF (per pagina) o DOCX (per paragrafo) senza comporre l'intero documento"""
     
     _, file_extension = os.path.splitext(file_path.lower())
     
     try:
         if file_extension == '.pdf':
-            return extract_text_from_pdf(file_path)
+            for page_text in iter_text_from_pdf(file_path, mode=mode):
+                yield page_text
+                yield "\n"
         elif file_extension == '.docx':
-            return extract_text_from_docx(file_path)
+            yield from iter_text_from_docx(file_path)
         else:
             raise ValueError(f"Formato file non supportato: {file_extension}")
     except Exception as e:
         raise Exception(f"Errore nell'estrazione del testo: {str(e)}")
 
-def extract_text_from_pdf(file_path):
-    """Estrae testo da file PDF"""
-    text = ""
-    
+def iter_pdf_pages(file_path, start=0, stop=None, deadline=None):
+    """Genera il testo delle pagine del PDF una alla volta"""
     with open(file_path, 'rb') as file:
         pdf_reader = PyPDF2.PdfReader(file)
+        page_count = len(pdf_reader.pages)
+        stop = page_count if stop is None else min(stop, page_count)
+        
+        for page_num in range(start, stop):
+            if deadline is not None and time.time() > deadline:
+                raise ExtractionLimitError("Tempo massimo di estrazione superato")
+            yield pdf_reader.pages[page_num].extract_text() or ""
+
+def _extract_pdf_page_range(file_path, start, stop, deadline):
+    """Eseguita nei processi del pool: estrae un intervallo di pagine"""
+    return list(iter_pdf_pages(file_path, start, stop, deadline))
+
+def _iter_pdf_pages_parallel(file_path, page_count, deadline):
+    """Distribuisce gli intervalli di pagine su un pool di processi, restituendoli in ordine"""
+    step = settings.PDF_PARALLEL_PAGES_PER_TASK
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    workers = min(settings.EXTRACTION_WORKERS, len(ranges))
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [
+            executor.submit(_extract_pdf_page_range, file_path, start, stop, deadline)
+            for start, stop in ranges
+        ]
+        try:
+            for future in futures:
+                try:
+                    pages = future.result(timeout=max(deadline - time.time(), 0))
+                except FuturesTimeoutError:
+                    raise ExtractionLimitError("Tempo massimo di estrazione superato")
+                yield from pages
+        finally:
+            for future in futures:
+                future.cancel()
+
+def extract_text_from_pdf(file_path, mode=None):
+    """Estrae testo da file PDF, in serie o con un pool di processi per i documenti grandi"""
+    return "\n".join(iter_text_from_pdf(file_path, mode=mode))
+
+def iter_text_from_pdf(file_path, mode=None):
+    """Genera il testo delle pagine del PDF rispettando i limiti di tempo e dimensione"""
+    mode = mode or settings.PDF_EXTRACTION_MODE
+    deadline = time.time() + settings.EXTRACTION_TIMEOUT
+    max_chars = settings.EXTRACTION_MAX_TEXT_MB * 1024 * 1024
+    
+    if mode == 'serial':
+        pages = iter_pdf_pages(file_path, deadline=deadline)
+    else:
+        with open(file_path, 'rb') as file:
+            page_count = len(PyPDF2.PdfReader(file).pages)
         
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
+        if mode == 'parallel' or page_count >= settings.PDF_PARALLEL_MIN_PAGES:
+            pages = _iter_pdf_pages_parallel(file_path, page_count, deadline)
+        else:
+            pages = iter_pdf_pages(file_path, deadline=deadline)
     
-    return text
+    total_chars = 0
+    try:
+        for page_text in pages:
+            total_chars += len(page_text)
+            if total_chars > max_chars:
+                raise ExtractionLimitError("Testo estratto oltre la dimensione massima consentita")
+            yield page_text
+    finally:
+        pages.close()
 
 def extract_text_from_docx(file_path):
     """Estrae testo da file DOCX"""
-    doc = Document(file_path)
-    text = ""
-    
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
+    return "".join(iter_text_from_docx(file_path))
+
+def iter_text_from_docx(file_path):
+    """Genera i paragrafi del DOCX (tabelle, intestazioni e note comprese) leggendo l'XML in streaming"""
+    deadline = time.time() + settings.EXTRACTION_TIMEOUT
+    max_chars = settings.EXTRACTION_MAX_TEXT_MB * 1024 * 1024
     
-    return text
+    total_chars = 0
+    for paragraph in iter_docx_paragraphs(file_path):
+        if time.time() > deadline:
+            raise ExtractionLimitError("Tempo massimo di estrazione superato")
+        total_chars += len(paragraph) + 1
+        if total_chars > max_chars:
+            raise ExtractionLimitError("Testo estratto oltre la dimensione massima consentita")
+        yield f"{paragraph}\n"
+
+def hash_chunks(chunks):
+    """SHA-256 di un file letto a blocchi, senza caricarlo interamente in memoria"""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_clean_text(file_path):
+    """Estrazione + pulizia del testo con durata; usata dai processi di ingestione"""
+    started = time.monotonic()
+    text = ''.join(iter_clean_text(
+        iter_text_from_file(file_path, mode='serial'),
+        preserve_structure=settings.TEXT_PRESERVE_STRUCTURE,
+    ))
+    return text, round(time.monotonic() - started, 3)
 
-def clean_text(text):
+# Caratteri di controllo che non sono spaziatura: vengono rimossi. Tabulazioni, a capo e
+# separatori (\t \n \v \f \r \x1c-\x1f \x85) sono trattati come spazi da str.split/splitlines
+CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0e-\x1b\x7f-\x84\x86-\x9f]+')
+LINE_BREAKS = ('\n', '\r', '\x0b', '\x0c', '\x1c', '\x1d', '\x1e', '\x85', '\u2028', '\u2029')
+
+# Riga che apre un articolo o una clausola numerata: inizia sempre un nuovo paragrafo
+ARTICLE_HEADING_RE = re.compile(r'\s*(?:art(?:icolo)?\.?\s*\d+|\d+\.\d+(?:\s|$))', re.IGNORECASE)
+
+def clean_text(text, preserve_structure=False):
     """Pulisce e normalizza il testo estratto"""
-    # Rimuove caratteri speciali e normalizza spazi
-    import re
+    return ''.join(iter_clean_text([text], preserve_structure=preserve_structure))
+
+def iter_clean_text(chunks, preserve_structure=False):
+    """Normalizza un flusso di blocchi di testo (pagine, paragrafi) un blocco alla volta.
+
+    In modalità piatta il risultato è una sola riga con spazi singoli; con preserve_structure
+    i paragrafi (righe vuote) e gli articoli restano separati da una riga vuota.
+    """
+    if preserve_structure:
+        return _iter_clean_paragraphs(chunks)
+    return _iter_clean_flat(chunks)
+
+def _iter_clean_flat(chunks):
+    emitted = False
+    pending_space = False
+    for chunk in chunks:
+        chunk = CONTROL_CHARS_RE.sub('', chunk)
+        if not chunk:
+            continue
+        words = ' '.join(chunk.split())
+        if words:
+            # Lo spazio tra due blocchi si emette solo se uno dei due lo conteneva
+            if emitted and (pending_space or chunk[0].isspace()):
+                yield ' '
+            yield words
+            emitted = True
+            pending_space = chunk[-1].isspace()
+        else:
+            pending_space = True
+
+def _iter_clean_paragraphs(chunks):
+    paragraph = []
+    emitted = False
+    carry = ''
     
-    # Rimuove caratteri di controllo
-    text = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', text)
+    def lines_to_paragraphs(lines):
+        nonlocal emitted
+        for line in lines:
+            words = line.split()
+            if (not words or ARTICLE_HEADING_RE.match(line)) and paragraph:
+                yield ('\n\n' if emitted else '') + ' '.join(paragraph)
+                paragraph.clear()
+                emitted = True
+            if words:
+                paragraph.append(' '.join(words))
     
-    # Normalizza spazi multipli
-    text = re.sub(r'\s+', ' ', text)
+    for chunk in chunks:
+        lines = (carry + CONTROL_CHARS_RE.sub('', chunk)).splitlines(keepends=True)
+        carry = ''
+        # L'ultima riga può continuare nel blocco successivo (anche un \r seguito da \n)
+        if lines and (not lines[-1].endswith(LINE_BREAKS) or lines[-1].endswith('\r')):
+            carry = lines.pop()
+        yield from lines_to_paragraphs(lines)
+    
+    yield from lines_to_paragraphs([carry, ''])
+
+# Inizio di un articolo o di una clausola numerata ("Art. 5", "ARTICOLO 12", "12.3 ") a inizio riga
+# o dopo la fine di una frase: i riferimenti nel testo ("ai sensi dell'art. 1341") non dividono
+ARTICLE_BOUNDARY_RE = re.compile(
+    r'(?:^|(?<=[.;:]\s))[ \t]*(?=(?:art(?:icolo)?\.?\s*\d+|\d+\.\d+\s))', re.IGNORECASE | re.MULTILINE
+)
+PARAGRAPH_BOUNDARY_RE = re.compile(r'\n\s*\n')
+# Fine frase (escluse le abbreviazioni "Art." e "n.") o riga vuota
+PASSAGE_BOUNDARY_RE = re.compile(r'(?<!\bart)(?<!\bartt)(?<!\bn)[.;:](?=\s)|\n\s*\n', re.IGNORECASE)
+SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.;:])\s+')
+# Abbreviazioni seguite dal punto che non chiudono la frase ("Art. 5", "lett. b)", "n. 12", "cfr.")
+ABBREVIATIONS = frozenset({
+    'art', 'artt', 'lett', 'n', 'nn', 'co', 'par', 'pag', 'pagg', 'cap', 'all', 'tab', 'cfr', 'es',
+    'ecc', 'rif', 'cod', 'civ', 'proc', 'pen', 'lgs', 'reg', 'sig', 'sigg', 'spett', 'dott', 'avv',
+    'prof', 'ing', 'rag', 'geom', 'vs',
+})
+LAST_WORD_RE = re.compile(r'(\w+)\W*$')
+
+def passage_bounds(text, start, end, max_chars=600):
+    """Frase o paragrafo che contiene text[start:end] (al massimo max_chars), senza spazi ai bordi"""
+    window_start = max(start - max_chars, 0)
+    passage_start = window_start
+    for match in PASSAGE_BOUNDARY_RE.finditer(text, window_start, start):
+        passage_start = match.end()
+    match = PASSAGE_BOUNDARY_RE.search(text, end, end + max_chars)
+    passage_end = match.end() if match else min(end + max_chars, len(text))
     
-    # Rimuove spazi all'inizio e alla fine
-    text = text.strip()
+    # Passaggi molto lunghi (testo senza punteggiatura) vengono ridotti attorno alla corrispondenza
+    if passage_end - passage_start > max_chars:
+        margin = max((max_chars - (end - start)) // 2, 0)
+        passage_start = max(passage_start, start - margin)
+        passage_end = min(passage_end, end + margin)
     
-    return text
\ No newline at end of file
+    passage = text[passage_start:passage_end]
+    passage_start += len(passage) - len(passage.lstrip())
+    passage_end -= len(passage) - len(passage.rstrip())
+    return passage_start, max(passage_end, passage_start)
+
+# Stima approssimativa per testi in italiano
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Stima il numero di token di un testo"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_sentences(text):
+    """Divide il testo dopo '.', ';' e ':' seguiti da spazi, senza dividere dopo le abbreviazioni,
+    le iniziali e i numeri di elenco ("S.p.A.", "Art. 5", "1. Il fornitore")"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY_RE.finditer(text):
+        if text[match.start() - 1] == '.':
+            word = LAST_WORD_RE.search(text, max(start, match.start() - 30), match.start() - 1)
+            token = word.group(1).lower() if word else ''
+            numbering = token.isdigit() and word.start() == start
+            if len(token) == 1 or token in ABBREVIATIONS or numbering:
+                continue
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+def slice_on_whitespace(text, max_chars):
+    """Divide un testo senza punteggiatura in parti di al massimo max_chars, tagliando sugli spazi
+    (a lunghezza fissa solo le parole più lunghe di max_chars)"""
+    pieces = []
+    start = 0
+    while len(text) - start > max_chars:
+        end = max(text.rfind(' ', start, start + max_chars), text.rfind('\n', start, start + max_chars)) + 1
+        if end <= start:
+            end = start + max_chars
+        pieces.append(text[start:end])
+        start = end
+    pieces.append(text[start:])
+    return pieces
+
+def split_into_chunks(text, max_tokens):
+    """Divide il testo in parti di al massimo max_tokens, preferendo i confini di articoli e frasi"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text] if text.strip() else []
+
+    pieces = []
+    for section in ARTICLE_BOUNDARY_RE.split(text):
+        if len(section) <= max_chars:
+            pieces.append(section)
+            continue
+        # Articolo troppo lungo: si divide per paragrafi, per frasi e, in ultima istanza, sugli spazi
+        for paragraph in PARAGRAPH_BOUNDARY_RE.split(section):
+            if len(paragraph) + 2 <= max_chars:
+                pieces.append(paragraph + '\n\n')
+                continue
+            for sentence in split_sentences(paragraph):
+                pieces.extend(slice_on_whitespace(sentence, max_chars))
+            pieces.append('\n\n')
+
+    chunks = []
+    current = []
+    current_len = 0
+    for piece in pieces:
+        if current and current_len + len(piece) > max_chars:
+            chunks.append(''.join(current).strip())
+            current = []
+            current_len = 0
+        current.append(piece)
+        current_len += len(piece)
+    if current:
+        chunks.append(''.join(current).strip())
+
+    return [chunk for chunk in chunks if chunk]
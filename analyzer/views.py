@@ -1,57 +1,65 @@
+import asyncio
 import json
 import logging
+import mimetypes
+import os
+import time
+from datetime import timedelta
+from urllib.parse import quote
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, Http404, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView
-from django.urls import reverse_lazy
+from django.urls import reverse
+from django.conf import settings
+from django.db.models import Case, When
 from django.utils import timezone
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+from django.utils.text import slugify
+from django.db import transaction
 
-from .models import Contract, RiskClause, Deadline
+from .models import Contract, Deadline
+from .detail_cache import cached_detail_content, detail_etag, record as record_detail_cache
 from .forms import ContractUploadForm
-from .utils import extract_text_from_file, clean_text
-from .services import ContractAIService
+from .jobs import enqueue_analysis, enqueue_extraction
+from .search import search_contracts
+from .stats import get_dashboard_stats
+from .metrics import render_prometheus
+from .pagination import InvalidCursor, paginate_by_cursor
 
 logger = logging.getLogger(__name__)
 
 def home(request):
     """Homepage con statistiche rapide"""
-    total_contracts = Contract.objects.count()
-    analyzed_contracts = Contract.objects.filter(analyzed=True).count()
-    high_risk_contracts = Contract.objects.filter(risk_level__in=['high', 'critical']).count()
-    
-    recent_contracts = Contract.objects.order_by('-uploaded_at')[:5]
-    
-    context = {
-        'total_contracts': total_contracts,
-        'analyzed_contracts': analyzed_contracts,
-        'high_risk_contracts': high_risk_contracts,
-        'recent_contracts': recent_contracts,
-    }
+    context = get_dashboard_stats()
+    context['recent_contracts'] = Contract.objects.only(*Contract.LIST_FIELDS).order_by('-uploaded_at')[:5]
     
     return render(request, 'analyzer/home.html', context)
 
+def dashboard_stats(request):
+    """Statistiche della dashboard in formato JSON, per il monitoraggio"""
+    return JsonResponse(get_dashboard_stats())
+
+def metrics(request):
+    """Metriche della pipeline di analisi in formato Prometheus"""
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def upload_contract(request):
     """Upload e analisi automatica del contratto"""
     if request.method == 'POST':
         form = ContractUploadForm(request.POST, request.FILES)
         if form.is_valid():
+            # Contract.save archivia il file per contenuto e ne registra lo SHA-256
             contract = form.save()
             
             try:
-                # Estrazione del testo
-                file_path = contract.file.path
-                extracted_text = extract_text_from_file(file_path)
-                cleaned_text = clean_text(extracted_text)
-                
-                contract.extracted_text = cleaned_text
-                contract.save()
-                
-                # Avvia analisi AI in background (in produzione usare Celery)
-                analyze_contract_ai(contract.id)
+                # Estrazione del testo e analisi AI vengono eseguite dai worker
+                # (manage.py run_analysis_workers): la richiesta salva solo il file
+                enqueue_extraction(contract)
                 
                 messages.success(request, f'Contratto "{contract.title}" caricato con successo! Analisi in corso...')
                 return redirect('contract_detail', pk=contract.pk)
@@ -65,89 +73,6 @@ def upload_contract(request):
     
     return render(request, 'analyzer/upload.html', {'form': form})
 
-def analyze_contract_ai(contract_id):
-    """Analizza il contratto con AI"""
-    try:
-        contract = Contract.objects.get(id=contract_id)
-        
-        if not contract.extracted_text:
-            raise Exception("Testo non disponibile per l'analisi")
-        
-        # Analisi AI
-        ai_response = ContractAIService.analyze_contract(contract.extracted_text)
-        
-        # Salva sempre la risposta grezza per debug
-        contract.ai_analysis = ai_response
-        
-        try:
-            # Rimuovi eventuali markdown wrapper
-            cleaned_response = ai_response.strip()
-            if cleaned_response.startswith('```json'):
-                cleaned_response = cleaned_response.replace('```json', '').replace('```', '').strip()
-            
-            # Parsing della risposta JSON
-            ai_data = json.loads(cleaned_response)
-            
-            # Aggiorna il contratto con i risultati
-            contract.contract_type = ContractAIService.extract_contract_type(contract.extracted_text)
-            contract.parties = ai_data.get('parties', '')
-            contract.duration = ai_data.get('duration', '')
-            contract.key_obligations = ai_data.get('key_obligations', '')
-            
-            # Salva clausole rischiose
-            risk_clauses_data = ai_data.get('risk_clauses', [])
-            for clause_data in risk_clauses_data:
-                RiskClause.objects.create(
-                    contract=contract,
-                    clause_text=clause_data.get('clause', ''),
-                    risk_description=clause_data.get('risk', ''),
-                    severity=clause_data.get('severity', 'low'),
-                    recommendation=clause_data.get('recommendation', '')
-                )
-            
-            # Salva scadenze
-            deadlines_data = ai_data.get('deadlines', [])
-            for deadline_data in deadlines_data:
-                Deadline.objects.create(
-                    contract=contract,
-                    description=deadline_data.get('description', ''),
-                )
-            
-            # Calcola livello di rischio in base alle clausole trovate
-            high_risk_count = sum(1 for clause in risk_clauses_data if clause.get('severity') in ['high', 'critical'])
-            if high_risk_count >= 3:
-                contract.risk_level = 'critical'
-            elif high_risk_count >= 2:
-                contract.risk_level = 'high'
-            elif high_risk_count >= 1:
-                contract.risk_level = 'medium'
-            else:
-                contract.risk_level = 'low'
-            
-        except json.JSONDecodeError as e:
-            print(f"Errore JSON parsing: {e}")
-            print(f"Risposta AI: {ai_response[:500]}...")
-            # Se la risposta non è JSON valido, usa valori di default
-            contract.risk_level = 'medium'
-            contract.contract_type = ContractAIService.extract_contract_type(contract.extracted_text)
-        
-        contract.analyzed = True
-        contract.analysis_date = timezone.now()
-        contract.save()
-        
-    except Exception as e:
-        logger.error(f"Errore nell'analisi AI del contratto {contract_id}: {str(e)}")
-        try:
-            contract = Contract.objects.get(id=contract_id)
-            contract.ai_analysis = f"Errore nell'analisi automatica: {str(e)}"
-            contract.analyzed = True
-            contract.analysis_date = timezone.now()
-            contract.risk_level = 'medium'
-            contract.contract_type = 'other'
-            contract.save()
-        except Contract.DoesNotExist:
-            logger.error(f"Contratto {contract_id} non trovato durante gestione errore")
-
 class ContractListView(ListView):
     model = Contract
     template_name = 'analyzer/contract_list.html'
@@ -155,7 +80,8 @@ class ContractListView(ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        queryset = Contract.objects.all()
+        # Solo le colonne mostrate nell'elenco: testo estratto e analisi AI non vengono letti
+        queryset = Contract.objects.only(*Contract.LIST_FIELDS)
         
         # Filtri
         contract_type = self.request.GET.get('type')
@@ -167,48 +93,367 @@ class ContractListView(ListView):
         if risk_level:
             queryset = queryset.filter(risk_level=risk_level)
         
+        # Ricerca full-text: risultati ordinati per rilevanza
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            ranked_ids = [contract_id for contract_id, _ in search_contracts(query, limit=settings.SEARCH_MAX_RESULTS)]
+            if not ranked_ids:
+                return queryset.none()
+            queryset = queryset.filter(pk__in=ranked_ids).order_by(
+                Case(*[When(pk=pk, then=position) for position, pk in enumerate(ranked_ids)])
+            )
+        
         return queryset
     
+    def paginate_queryset(self, queryset, page_size):
+        # I risultati di ricerca (al massimo SEARCH_MAX_RESULTS, ordinati per rilevanza) usano
+        # la paginazione classica; l'elenco completo usa il cursore su (uploaded_at, id)
+        if self.request.GET.get('q', '').strip():
+            return super().paginate_queryset(queryset, page_size)
+        
+        try:
+            page = paginate_by_cursor(queryset, self.request.GET.get('cursor'), page_size)
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        self.cursor_page = page
+        return None, page, page.object_list, page.has_next or page.has_previous
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['contract_types'] = Contract.CONTRACT_TYPES
         context['risk_levels'] = Contract.RISK_LEVELS
+        context['cursor_page'] = getattr(self, 'cursor_page', None)
+        
+        # Filtri correnti da conservare nei link di paginazione
+        filters = self.request.GET.copy()
+        filters.pop('page', None)
+        filters.pop('cursor', None)
+        context['filter_query'] = filters.urlencode()
         return context
 
 class ContractDetailView(DetailView):
+    """Dettaglio del contratto; per i contratti analizzati il contenuto viene dalla cache
+    (analyzer.detail_cache) e le richieste condizionali ricevono 304"""
     model = Contract
     template_name = 'analyzer/contract_detail.html'
+    content_template_name = 'analyzer/contract_detail_content.html'
     context_object_name = 'contract'
     
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        # Durante l'estrazione e l'analisi la pagina mostra lo stato in corso: nessuna cache
+        if not self.object.analyzed:
+            return self.render_to_response(self.get_context_data(object=self.object))
+        
+        etag = detail_etag(self.object)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            record_detail_cache('not_modified')
+        else:
+            response = self.render_to_response(self.get_context_data(object=self.object))
+        response['ETag'] = etag
+        # Il browser e il proxy rivalidano sempre: la pagina cambia con una nuova analisi
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Query eseguite solo se il contenuto va generato (non è in cache)
         context['risk_clauses'] = self.object.risk_clauses.all()
         context['deadlines'] = self.object.deadlines.all()
+        
+        def render_content():
+            return render_to_string(self.content_template_name, context, self.request)
+        
+        if self.object.analyzed:
+            context['detail_content'] = cached_detail_content(self.object, render_content)
+        else:
+            context['detail_content'] = render_content()
         return context
 
+def search_api(request):
+    """Ricerca full-text in formato JSON (?q=...&limit=...)"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', 20)), settings.SEARCH_MAX_RESULTS)
+    except ValueError:
+        limit = 20
+    
+    ranked = search_contracts(query, limit=limit) if query else []
+    contracts = Contract.objects.only('id', 'title', 'contract_type', 'risk_level', 'analyzed').in_bulk(
+        [contract_id for contract_id, _ in ranked]
+    )
+    
+    results = [
+        {
+            'id': contract_id,
+            'title': contracts[contract_id].title,
+            'contract_type': contracts[contract_id].contract_type,
+            'risk_level': contracts[contract_id].risk_level,
+            'analyzed': contracts[contract_id].analyzed,
+            'rank': rank,
+            'url': reverse('contract_detail', args=[contract_id]),
+        }
+        for contract_id, rank in ranked
+        if contract_id in contracts
+    ]
+    return JsonResponse({'query': query, 'count': len(results), 'results': results})
+
+def _contract_summary(contract):
+    return {
+        'id': contract.pk,
+        'title': contract.title,
+        'uploaded_at': contract.uploaded_at.isoformat(),
+        'contract_type': contract.contract_type,
+        'risk_level': contract.risk_level,
+        'analyzed': contract.analyzed,
+        'parties_summary': contract.parties_summary,
+        'url': reverse('contract_detail_api', args=[contract.pk]),
+    }
+
+def contract_list_api(request):
+    """Elenco contratti in JSON con paginazione a cursore (?cursor=...&limit=...&type=...&risk=...)"""
+    queryset = Contract.objects.only(*Contract.LIST_FIELDS)
+    if request.GET.get('type'):
+        queryset = queryset.filter(contract_type=request.GET['type'])
+    if request.GET.get('risk'):
+        queryset = queryset.filter(risk_level=request.GET['risk'])
+    
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 50)), settings.API_MAX_PAGE_SIZE))
+    except ValueError:
+        limit = 50
+    
+    try:
+        page = paginate_by_cursor(queryset, request.GET.get('cursor'), limit)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    def page_url(cursor):
+        if cursor is None:
+            return None
+        params = request.GET.copy()
+        params['cursor'] = cursor
+        return f"{request.path}?{params.urlencode()}"
+    
+    return JsonResponse({
+        'results': [_contract_summary(contract) for contract in page],
+        'next': page_url(page.next_cursor),
+        'previous': page_url(page.previous_cursor),
+    })
+
+def contract_detail_api(request, pk):
+    """Dettaglio del contratto in JSON, con clausole rischiose e scadenze"""
+    contract = get_object_or_404(
+        Contract.objects.defer('extracted_text', 'ai_analysis').prefetch_related('risk_clauses', 'deadlines'),
+        pk=pk,
+    )
+    data = _contract_summary(contract)
+    data.update({
+        'parties': contract.parties,
+        'duration': contract.duration,
+        'key_obligations': contract.key_obligations,
+        'analysis_date': contract.analysis_date.isoformat() if contract.analysis_date else None,
+        'extraction_status': contract.extraction_status,
+        'risk_clauses': [
+            {
+                'clause_text': clause.clause_text,
+                'risk_description': clause.risk_description,
+                'severity': clause.severity,
+                'recommendation': clause.recommendation,
+                'source': clause.source,
+                'start_offset': clause.start_offset,
+                'end_offset': clause.end_offset,
+            }
+            for clause in contract.risk_clauses.all()
+        ],
+        'deadlines': [
+            {
+                'description': deadline.description,
+                'date': deadline.date.isoformat() if deadline.date else None,
+                'days_notice': deadline.days_notice,
+            }
+            for deadline in contract.deadlines.all()
+        ],
+    })
+    return JsonResponse(data)
+
+def _upcoming_deadlines(request):
+    """Scadenze datate nei prossimi ?days=N giorni, in ordine di data (usa l'indice su Deadline.date)"""
+    try:
+        days = max(1, min(int(request.GET.get('days', settings.UPCOMING_DEADLINES_DAYS)), settings.UPCOMING_DEADLINES_MAX_DAYS))
+    except ValueError:
+        days = settings.UPCOMING_DEADLINES_DAYS
+    
+    today = timezone.localdate()
+    deadlines = (
+        Deadline.objects
+        .filter(date__gte=today, date__lte=today + timedelta(days=days))
+        .select_related('contract')
+        .only('id', 'description', 'date', 'days_notice', 'source', 'contract__id', 'contract__title', 'contract__risk_level')
+        .order_by('date', 'id')
+    )
+    return days, deadlines
+
+def upcoming_deadlines(request):
+    """Pagina delle scadenze imminenti di tutti i contratti"""
+    days, deadlines = _upcoming_deadlines(request)
+    return render(request, 'analyzer/deadlines.html', {'days': days, 'deadlines': deadlines})
+
+def upcoming_deadlines_api(request):
+    """Scadenze imminenti in formato JSON (?days=N)"""
+    days, deadlines = _upcoming_deadlines(request)
+    return JsonResponse({
+        'days': days,
+        'results': [
+            {
+                'contract_id': deadline.contract.pk,
+                'contract_title': deadline.contract.title,
+                'description': deadline.description,
+                'date': deadline.date.isoformat(),
+                'days_notice': deadline.days_notice,
+                'source': deadline.source,
+                'url': reverse('contract_detail_api', args=[deadline.contract.pk]),
+            }
+            for deadline in deadlines
+        ],
+    })
+
+def contract_progress(pk):
+    """Stato di estrazione e analisi del contratto, con l'avanzamento dell'ultimo job"""
+    contract = Contract.objects.only(
+        'id', 'analyzed', 'analysis_date', 'risk_level',
+        'extraction_status', 'extraction_seconds', 'extraction_error',
+    ).get(pk=pk)
+    job = contract.analysis_jobs.order_by('-created_at').values('stage', 'status', 'attempts', 'last_error', 'progress').first()
+    
+    return {
+        'id': contract.pk,
+        'extraction_status': contract.extraction_status,
+        'extraction_seconds': contract.extraction_seconds,
+        'extraction_error': contract.extraction_error,
+        'analyzed': contract.analyzed,
+        'analysis_date': contract.analysis_date.isoformat() if contract.analysis_date else None,
+        'risk_level': contract.risk_level,
+        'job': job,
+    }
+
+def contract_status(request, pk):
+    """Stato leggero di estrazione e analisi, per i client senza server-sent events"""
+    try:
+        return JsonResponse(contract_progress(pk))
+    except Contract.DoesNotExist:
+        raise Http404("Contratto non trovato")
+
+async def contract_events(request, pk):
+    """Avanzamento di estrazione e analisi come server-sent events, su un'unica connessione.
+
+    La vista è asincrona: tra un controllo e l'altro la connessione resta in attesa su
+    asyncio.sleep senza occupare un thread. Un evento viene inviato solo quando lo stato
+    cambia; lo stream termina a elaborazione conclusa o dopo SSE_MAX_SECONDS (il browser
+    si riconnette automaticamente).
+    """
+    try:
+        state = await sync_to_async(contract_progress)(pk)
+    except Contract.DoesNotExist:
+        raise Http404("Contratto non trovato")
+    
+    async def events(state):
+        started = last_sent = time.monotonic()
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        previous = None
+        while True:
+            if state != previous:
+                yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+                previous, last_sent = state, time.monotonic()
+            elif time.monotonic() - last_sent >= settings.SSE_HEARTBEAT_SECONDS:
+                # Commento SSE: mantiene aperta la connessione attraverso i proxy
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            
+            if state['analyzed'] or state['extraction_status'] == 'failed':
+                return
+            if time.monotonic() - started >= settings.SSE_MAX_SECONDS:
+                return
+            
+            await asyncio.sleep(settings.SSE_POLL_INTERVAL)
+            state = await sync_to_async(contract_progress)(pk)
+    
+    response = StreamingHttpResponse(events(state), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Disattiva il buffering di nginx, che altrimenti ritarderebbe gli eventi
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def download_contract(request, pk):
+    """Download del file originale con il nome caricato dall'utente"""
+    contract = get_object_or_404(Contract.objects.only('id', 'title', 'file', 'file_hash', 'original_filename'), pk=pk)
+    if not contract.file:
+        raise Http404("Il contratto non ha un file associato")
+
+    name = contract.file.name
+    filename = contract.original_filename or f"{slugify(contract.title) or 'contratto'}{os.path.splitext(name)[1]}"
+    # Il contenuto di un file archiviato per impronta non cambia mai
+    etag = f'"{contract.file_hash}"' if contract.file_hash else None
+    if etag and request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+
+    prefix = settings.CONTRACT_DOWNLOAD_ACCEL_PREFIX
+    if prefix:
+        # Il proxy invia il file direttamente dal disco (sendfile), senza passare dal worker
+        response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{quote(name)}"
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    else:
+        try:
+            handle = contract.file.storage.open(name, 'rb')
+        except FileNotFoundError:
+            raise Http404("File del contratto non trovato")
+        # FileResponse usa wsgi.file_wrapper (sendfile) quando il server lo supporta
+        response = FileResponse(handle, as_attachment=True, filename=filename)
+
+    if etag:
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
 @csrf_exempt
 def reanalyze_contract(request, pk):
     """Rianalizza un contratto esistente"""
     if request.method == 'POST':
         contract = get_object_or_404(Contract, pk=pk)
         
-        # Cancella analisi precedente
-        contract.risk_clauses.all().delete()
-        contract.deadlines.all().delete()
-        
-        # Reset dei campi di analisi
-        contract.analyzed = False
-        contract.analysis_date = None
-        contract.ai_analysis = ''
-        contract.parties = ''
-        contract.duration = ''
-        contract.key_obligations = ''
-        contract.risk_level = ''
-        contract.save()
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            payload = {}
+        # Con bypass_cache il contratto viene rianalizzato anche se il testo è già in cache
+        bypass_cache = bool(payload.get('bypass_cache', False))
         
-        # Rianalizza
-        analyze_contract_ai(contract.id)
+        # Cancellazione dell'analisi precedente e accodamento in un'unica transazione
+        with transaction.atomic():
+            contract.risk_clauses.all().delete()
+            contract.deadlines.all().delete()
+            
+            # Reset dei campi di analisi
+            contract.analyzed = False
+            contract.analysis_date = None
+            contract.ai_analysis = ''
+            contract.parties = ''
+            contract.duration = ''
+            contract.key_obligations = ''
+            contract.risk_level = ''
+            contract.save(update_fields=[
+                'analyzed', 'analysis_date', 'ai_analysis', 'parties',
+                'duration', 'key_obligations', 'risk_level',
+            ])
+            
+            # Rianalizza in background (ripetendo l'estrazione se non era riuscita)
+            if contract.extraction_status == 'done':
+                enqueue_analysis(contract, use_cache=not bypass_cache)
+            else:
+                enqueue_extraction(contract)
         
-        return JsonResponse({'status': 'success', 'message': 'Rianalisi completata'})
+        return JsonResponse({'status': 'success', 'message': 'Rianalisi avviata'})
     
     return JsonResponse({'status': 'error', 'message': 'Metodo non consentito'})
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""Backend SQLite con impostazioni adatte a più processi concorrenti (web e worker di analisi).
+
+Opzioni aggiuntive in DATABASES['default']['OPTIONS'], applicate a ogni nuova connessione:
+- journal_mode: 'wal' permette letture concorrenti a una scrittura;
+- synchronous: 'normal' è sicuro con WAL ed evita un fsync per ogni commit;
+- transaction_mode: 'immediate' prende il lock di scrittura all'inizio di transaction.atomic(),
+  così un busy timeout attende invece di fallire subito con "database is locked" quando una
+  transazione che ha già letto prova a scrivere mentre un'altra sta scrivendo.
+Il busy timeout è l'opzione standard 'timeout' (secondi) di sqlite3.connect.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_VALUES = {
+    'journal_mode': {'delete', 'truncate', 'persist', 'memory', 'wal', 'off'},
+    'synchronous': {'off', 'normal', 'full', 'extra'},
+}
+TRANSACTION_MODES = {'deferred', 'immediate', 'exclusive'}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in (*PRAGMA_VALUES, 'transaction_mode'):
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        for pragma, allowed in PRAGMA_VALUES.items():
+            value = str(options.get(pragma, '')).lower()
+            if not value:
+                continue
+            if value not in allowed:
+                raise ImproperlyConfigured(f"Valore non valido per {pragma}: {value}")
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    @property
+    def transaction_mode(self):
+        mode = str(self.settings_dict['OPTIONS'].get('transaction_mode', 'deferred')).lower()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"Valore non valido per transaction_mode: {mode}")
+        return mode.upper()
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")